@@ -41,7 +41,14 @@ sync_file() {
     fi
 }
 
+# Gzip the web page and write its ETags into tree/static/ (tools/build_static.py).
+build_static() {
+    debug "Building static assets"
+    python3 tools/build_static.py --tree "${TREE_SRC}" >&2 || debug "Static build failed; the board will serve the page uncompressed"
+}
+
 sync_all() {
+    build_static
     if [ ! -d "$CIRCUITPY" ]; then
         debug "CIRCUITPY not mounted at ${CIRCUITPY}; aborting"
         exit 1
@@ -68,6 +75,10 @@ COPYFILE_DISABLE=1 fswatch -0 ${TREE_SRC} | while IFS= read -r -d '' f; do
     debug "Detected change in: $f"
 
     if [ -f "$f" ]; then
+        if [[ "$f" == "$TREE_SRC_ABS/index.html" ]]; then
+            # Rebuilding writes tree/static/, whose changes this loop then syncs.
+            build_static
+        fi
         if [[ "$f" == "$TREE_SRC_ABS"* ]]; then
             sync_file "${TREE_SRC}" "${CIRCUITPY}" "$f" "$TREE_SRC_ABS"
         fi
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Per-effect render microbenchmarks, compared against a stored baseline.
+
+    venv/bin/python tools/bench.py              # run, compare with tools/bench_baseline.json
+    venv/bin/python tools/bench.py --save       # run and store the result as the new baseline
+    venv/bin/python tools/bench.py --scale 60   # project host timings onto a slower device
+
+Runs on the headless host runtime (tools/headless.py). Times `draw()` for every
+effect in `Tree.EFFECTS` plus sweep, `Transition.update()` in each mode it
+renders (uniform crossfade, bottom-up sprout (`spread`), brightness-only), and the
+output stage's `show()` on its own: plain LUT, dithered, and with the LUT rebuilt
+every frame (a brightness fade). For each case it reports:
+
+  us/frame   median CPU time of one frame (best of several rounds)
+  alloc B    bytes allocated per frame (peak transient heap growth, via tracemalloc;
+             the closest CPython gets to a per-frame allocation count — it is what
+             drives GC pauses on the board)
+  @30/@60    share of a 33.3ms / 16.7ms frame the case uses, after --scale
+
+Host CPUs are far faster than the ESP32-S3, so absolute numbers only mean something
+relative to a baseline taken on the same machine. `--scale` multiplies timings by a
+host->device factor (measure one effect on the board to calibrate it) to estimate
+whether a new effect fits the device's frame. A case slower than the baseline by
+more than `--tolerance` (default 25%), or allocating more, is flagged as a regression.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+import headless
+
+BASELINE = os.path.join(headless.REPO, "tools", "bench_baseline.json")
+FRAME_30 = 1e6 / 30
+FRAME_60 = 1e6 / 60
+ROUNDS = 5
+
+
+def _quiet():
+    """Swallow the effects' MQTT-not-initialized prints while setting cases up."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def effect_cases(tree):
+    """(name, frame_fn) for every effect's draw()."""
+    from effects.timer import Timer
+
+    cases = []
+    for name in list(tree.EFFECTS) + ["sweep"]:
+        with _quiet():
+            anim = tree.load_effect(name)
+            if isinstance(anim, Timer):
+                anim.start()  # an idle timer just fills black; bench the countdown
+        if name == "sweep":
+            def frame(anim=anim):
+                anim.draw()
+                anim.after_draw()
+        else:
+            frame = anim.draw
+        cases.append((f"effect/{name}", frame))
+    return cases
+
+
+def transition_cases(tree):
+    """(name, frame_fn) for Transition.update() in each rendering mode.
+
+    Each transition is given a very long duration and started halfway through, so
+    every timed frame renders mid-fade instead of short-circuiting on completion.
+    """
+    from util.transition import Transition
+
+    string = tree.string
+    n = len(string)
+    long = 1e6
+    snapshot = [(255, (i * 7) % 256, (i * 13) % 256) for i in range(n)]
+
+    def make(brightness, **kw):
+        string.brightness = brightness
+        t = Transition(string, duration=long, **kw)
+        t.start_time = time.monotonic() - long / 2
+        return t
+
+    specs = [
+        ("transition/crossfade", 0.1, dict(
+            start_pixels=snapshot, target_pixels=(0, 255, 0), start_brightness=0.1,
+            target_brightness=0.1, spread=0.0, owns_pixels=True)),
+        ("transition/sprout", 0.1, dict(
+            start_pixels=(0, 0, 0), target_pixels=snapshot, start_brightness=0.1,
+            target_brightness=0.1, spread=0.75, delays=tree._reveal_delays(reverse=False),
+            owns_pixels=True)),
+        ("transition/brightness-only", 0.1, dict(
+            start_pixels=None, target_pixels=None, start_brightness=0.05,
+            target_brightness=0.25, owns_pixels=False)),
+    ]
+    cases = []
+    for name, brightness, kw in specs:
+        t = make(brightness, **kw)
+
+        def frame(t=t, brightness=brightness):
+            if t.owns_pixels:
+                string.brightness = brightness  # a no-op once set
+            else:
+                tree.output.dither = False  # as left by a finished pixel transition
+            t.update()
+            string.show()  # Tree.animate() shows once per frame after updating
+        cases.append((name, frame))
+    return cases
+
+
+def output_cases(tree):
+    """(name, frame_fn) for the output stage (util/output.py) alone."""
+    string, output = tree.string, tree.output
+    for i in range(len(string)):
+        string[i] = (255, (i * 7) % 256, (i * 13) % 256)
+
+    def show(dither):
+        def frame():
+            output.dither = dither
+            string.mark_all()  # a fully repainted frame
+            string.show()
+        return frame
+
+    levels = [0.1, 0.11]
+
+    def fade():
+        levels.reverse()
+        output.dither = False
+        string.brightness = levels[0]  # invalidates the LUT every frame
+        string.show()
+
+    def setup(fn):
+        def frame():
+            if string.brightness not in levels:
+                string.brightness = levels[0]
+            fn()
+        return frame
+
+    return [
+        ("output/lut", setup(show(False))),
+        ("output/dither", setup(show(True))),
+        ("output/lut-rebuild", fade),
+    ]
+
+
+def measure(frame, frames, warmup):
+    for _ in range(warmup):
+        frame()
+
+    # Best median of several rounds: a busy host only ever makes frames slower, so
+    # the quietest round is the most repeatable estimate of the code's own cost.
+    clock = time.thread_time_ns  # CPU time: being descheduled doesn't count
+    per_round = max(1, frames // ROUNDS)
+    medians = []
+    for _ in range(ROUNDS):
+        samples = []
+        for _ in range(per_round):
+            t0 = clock()
+            frame()
+            samples.append(clock() - t0)
+        medians.append(statistics.median(samples))
+    us = min(medians) / 1000
+
+    # Separate pass: tracemalloc slows everything down, so it must not skew timing.
+    tracemalloc.start()
+    alloc = 0
+    for _ in range(frames):
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        frame()
+        _, peak = tracemalloc.get_traced_memory()
+        alloc += peak - base
+    tracemalloc.stop()
+    return {"us_per_frame": round(us, 1), "alloc_bytes_per_frame": alloc // frames}
+
+
+def run(frames, warmup):
+    headless.install(dials=False)
+    from neopixel_write import recording
+
+    with _quiet():
+        from tree import Tree
+        tree = Tree()
+    # Count shows without copying them, so the recorder adds no host-only allocations.
+    recording(tree.strand.pin.pin, keep=0)
+
+    # What measuring an empty frame costs, so it can be taken off every case.
+    overhead = measure(lambda: None, frames, warmup)
+    results = {}
+    for name, frame in effect_cases(tree) + transition_cases(tree) + output_cases(tree):
+        r = measure(frame, frames, warmup)
+        r["alloc_bytes_per_frame"] = max(0, r["alloc_bytes_per_frame"] - overhead["alloc_bytes_per_frame"])
+        results[name] = r
+    return results
+
+
+def report(results, baseline, scale, tolerance):
+    print(f"{'case':34} {'us/frame':>9} {'alloc B':>8} {'@30fps':>7} {'@60fps':>7}  vs baseline")
+    regressions = []
+    for name, r in results.items():
+        us = r["us_per_frame"]
+        dev = us * scale
+        line = (f"{name:34} {us:9.1f} {r['alloc_bytes_per_frame']:8d} "
+                f"{dev / FRAME_30:7.0%} {dev / FRAME_60:7.0%}")
+        base = baseline.get(name)
+        if base:
+            change = us / base["us_per_frame"] - 1 if base["us_per_frame"] else 0.0
+            line += f"  {change:+.0%}"
+            flags = []
+            if change > tolerance:
+                flags.append("SLOWER")
+            if r["alloc_bytes_per_frame"] > base["alloc_bytes_per_frame"] * (1 + tolerance) + 64:
+                flags.append("MORE ALLOC")
+            if flags:
+                line += "  <-- " + ", ".join(flags)
+                regressions.append(name)
+        else:
+            line += "  (new)"
+        print(line)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark effect draw() and Transition.update() per frame.")
+    ap.add_argument("--frames", type=int, default=300, help="timed frames per case")
+    ap.add_argument("--warmup", type=int, default=30)
+    ap.add_argument("--scale", type=float, default=1.0, help="host->device slowdown for the @fps columns")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="slowdown fraction flagged as a regression")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save", action="store_true", help="store this run as the baseline")
+    args = ap.parse_args()
+
+    results = run(args.frames, args.warmup)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    regressions = report(results, baseline, args.scale, args.tolerance)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({"frames": args.frames, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Pre-compress the web page for the tree (served by tree/util/static.py).
+
+    venv/bin/python tools/build_static.py [--tree tree]
+
+Writes `static/<asset>.gz` (gzip level 9, no timestamp, so unchanged input gives
+identical output) for each asset in ASSETS, and `static/manifest.json`, which
+gives each asset's content type, its gzip copy, and strong ETags for both
+representations (derived from a SHA-1 of the source). The board then serves the
+compressed bytes straight from flash and answers a matching If-None-Match with a
+304, without reading the file at all.
+
+deploy.sh runs this before every sync. Without a manifest the board serves the
+uncompressed page, as before.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+
+ASSETS = {
+    "index.html": "text/html",
+}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Gzip the tree's static assets and write their ETags.")
+    ap.add_argument("--tree", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tree"))
+    args = ap.parse_args()
+
+    out_dir = os.path.join(args.tree, "static")
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    for name, content_type in ASSETS.items():
+        with open(os.path.join(args.tree, name), "rb") as f:
+            data = f.read()
+        packed = gzip.compress(data, compresslevel=9, mtime=0)
+        with open(os.path.join(out_dir, name + ".gz"), "wb") as f:
+            f.write(packed)
+        tag = hashlib.sha1(data).hexdigest()[:16]
+        manifest[name] = {
+            "type": content_type,
+            "gzip": name + ".gz",
+            "etag": f'"{tag}"',
+            "etag_gzip": f'"{tag}-gz"',
+        }
+        print(f"{name}: {len(data)} -> {len(packed)} bytes gzipped ({100 * len(packed) / len(data):.0f}%), etag {tag}")
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Check that the state saved to NVM (tree/util/persist.py) comes back as it was.
+
+    venv/bin/python tools/check_persist.py
+
+For each case, sets a tree up on the headless host runtime (tools/headless.py),
+saves its state into a stand-in `microcontroller.nvm`, loads it into a fresh tree
+the way the boot sequence does (the params go through the same steps as code.py's
+apply_state_change()), and compares the two trees' `state()`; with no effect
+shown, the effect-only fields are skipped. Cases: a solid color with no effect
+loaded, a color set over a running effect, an effect with its speed and param, an
+OFF tree, and a paused timer. Prints each case and exits non-zero if any differs.
+"""
+import argparse
+import asyncio
+import sys
+
+import headless
+
+FIELDS = ("state", "effect", "color", "brightness", "speed", "param", "animation_state")
+EFFECT_FIELDS = ("speed", "param", "animation_state")  # meaningless with no effect shown
+
+
+def settle(tree, seconds=1.5):
+    """Render until fades finish, so state() samples the strand, not a fade target."""
+    asyncio.run(headless.run_for(tree.animate(), seconds))
+
+
+def apply(tree, params, timer):
+    """What code.py's handle_boot() + apply_state_change() do with a restored state."""
+    from effects.timer import Timer
+    power = params.pop("state", None)
+    if "effect" in params:
+        tree.set_animation(params["effect"], params.get("effect_params", {}))
+    elif "color" in params:
+        c = params["color"]
+        tree.set_color((c["r"], c["g"], c["b"]))
+    if "brightness" in params:
+        tree.set_brightness(params["brightness"])
+    if "speed" in params:
+        tree.set_speed(float(params["speed"]) / 100)
+    if "param" in params:
+        tree.set_param(float(params["param"]) / 100)
+    if params.get("animation_state") == "paused":
+        tree.pause()
+    elif params.get("animation_state") == "running":
+        tree.resume()
+    if timer["state"] == "paused" and isinstance(tree.animation, Timer):
+        tree.animation.restore_paused(timer["remaining"])
+    if power == "OFF":
+        tree.off()
+
+
+def round_trip(setup):
+    import microcontroller
+    from effects.timer import Timer
+    from tree import Tree
+    from util import binproto
+    from util.persist import StateStore
+
+    microcontroller.nvm[:] = bytes(len(microcontroller.nvm))
+    before = Tree()
+    setup(before)
+    settle(before)
+    timer = before.animation.get_state() if isinstance(before.animation, Timer) else None
+    store = StateStore(microcontroller.nvm)
+    store.update(before.state_into(bytearray(binproto.SIZE)), timer)
+    store.flush(0)
+
+    loaded = StateStore(microcontroller.nvm).load(Tree.EFFECTS)
+    if loaded is None:
+        return before.state(), None
+    after = Tree()
+    apply(after, *loaded)
+    settle(after)
+    return before.state(), after.state()
+
+
+def paused_timer(tree):
+    tree.set_animation("timer", {"duration": 120})
+    tree.animation.start()
+    tree.animation.pause()
+
+
+CASES = {
+    "solid color": lambda t: t.set_color((255, 0, 0)),
+    "color over an effect": lambda t: (t.set_animation("hue_shift"), t.set_color((0, 0, 255))),
+    "effect": lambda t: (t.set_animation("pinwheel"), t.set_speed(0.3), t.set_param(1.0), t.set_brightness(120)),
+    "off": lambda t: (t.set_color((0, 255, 0)), t.off()),
+    "paused timer": paused_timer,
+}
+
+
+def main():
+    argparse.ArgumentParser(description="Save and restore tree states through NVM on the host.").parse_args()
+    headless.install(dials=False)
+    failed = 0
+    for name, setup in CASES.items():
+        before, after = round_trip(setup)
+        if after is None:
+            diffs = ["not restored"]
+        else:
+            keys = FIELDS if before["effect"] else [k for k in FIELDS if k not in EFFECT_FIELDS]
+            diffs = [f"{key}: {before[key]} -> {after[key]}" for key in keys if before[key] != after[key]]
+        failed += bool(diffs)
+        print(f"{'FAIL' if diffs else 'ok':4}  {name}" + (f"  ({'; '.join(diffs)})" if diffs else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
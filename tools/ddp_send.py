@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Stream test patterns to the tree over DDP (tree/util/stream.py).
+
+Sends full RGB frames for the strand at a fixed rate, as a music visualizer or
+xLights would. The tree takes over from its animation on the first frame and hands
+back ~2.5s after the last one.
+
+Usage:
+  python tools/ddp_send.py [--host mr-tree.local] [--port 4048] [--fps 40]
+                           [--seconds 10] [--pattern rainbow|chase|strobe]
+  (--chunk 150 splits each frame over several packets, PUSH on the last;
+   --shuffle sends each frame's packets in reverse, to exercise stale drops)
+
+Packets are numbered with DDP sequence numbers (1-15 cycling). At the end it prints
+how many frames went out and the achieved rate; compare with the device's
+/stream counters.
+"""
+import argparse
+import colorsys
+import socket
+import struct
+import time
+
+HEADER = ">BBBBIH"
+VERSION_1 = 0x40
+FLAG_PUSH = 0x01
+DATA_RGB8 = 0x0B
+DEST_DISPLAY = 1
+
+
+def pattern_frame(name, n, k):
+    """Frame `k` of the named pattern, as n*3 RGB bytes."""
+    out = bytearray(3 * n)
+    for i in range(n):
+        if name == "rainbow":
+            r, g, b = colorsys.hsv_to_rgb(((i / n) + k / 120) % 1.0, 1.0, 1.0)
+            r, g, b = int(r * 255), int(g * 255), int(b * 255)
+        elif name == "chase":
+            r = g = b = 255 if (i - k) % 10 == 0 else 0
+        else:  # strobe
+            r = g = b = 255 if k % 2 == 0 else 0
+        out[3 * i:3 * i + 3] = bytes((r, g, b))
+    return bytes(out)
+
+
+def packets(frame, seq, chunk):
+    """The DDP packets for one frame, numbered on from `seq`; PUSH is set on the last."""
+    result = []
+    for offset in range(0, len(frame), chunk):
+        seq = seq % 15 + 1
+        payload = frame[offset:offset + chunk]
+        last = offset + chunk >= len(frame)
+        flags = VERSION_1 | (FLAG_PUSH if last else 0)
+        result.append(struct.pack(HEADER, flags, seq, DATA_RGB8, DEST_DISPLAY, offset, len(payload)) + payload)
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stream DDP test patterns to Mr Tree.")
+    ap.add_argument("--host", default="mr-tree.local")
+    ap.add_argument("--port", type=int, default=4048)
+    ap.add_argument("--leds", type=int, default=100)
+    ap.add_argument("--fps", type=float, default=40.0)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--pattern", choices=("rainbow", "chase", "strobe"), default="rainbow")
+    ap.add_argument("--chunk", type=int, default=1440, help="payload bytes per packet")
+    ap.add_argument("--shuffle", action="store_true", help="send each frame's packets in reverse")
+    args = ap.parse_args()
+
+    addr = (socket.gethostbyname(args.host), args.port)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    period = 1.0 / args.fps
+    start = time.monotonic()
+    deadline = start
+    k = 0
+    seq = 0
+    while time.monotonic() - start < args.seconds:
+        batch = packets(pattern_frame(args.pattern, args.leds, k), seq, args.chunk)
+        seq = (seq + len(batch) - 1) % 15 + 1
+        if args.shuffle:
+            batch.reverse()
+        for packet in batch:
+            sock.sendto(packet, addr)
+        k += 1
+        deadline += period
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    elapsed = time.monotonic() - start
+    print(f"sent {k} frames in {elapsed:.1f}s ({k / elapsed:.1f} fps) to {addr[0]}:{addr[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Run the tree's render path on this machine against stand-in hardware modules.
+
+    venv/bin/python tools/headless.py [--effect pinwheel] [--seconds 5]
+
+`tools/host/` holds host stand-ins for the CircuitPython modules the tree code
+imports (`board`, `neopixel`, `neopixel_write`, `digitalio`, `busio`, `wifi`,
+`socketpool`, `mdns`, `microcontroller`, `watchdog`, `adafruit_seesaw`). `install()`
+puts them and `tree/` on `sys.path` so `tree.py`, `effects/*` and
+`util/controller.py` import and run unchanged. Pure-Python Adafruit libraries are
+the real ones: `pip install -r tools/host/requirements.txt`.
+
+Every `show()` on the strand is recorded with its timestamp and the exact bytes that
+would go down the wire (`tree.strand.frames`, a `neopixel_write.Recording`), so a
+run can be profiled, benchmarked or diffed frame by frame. Run as a script, it
+animates the tree for a while and prints what the strand received.
+
+Library use (from another tool):
+
+    import headless
+    headless.install()
+    from tree import Tree
+    tree = Tree()
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST = os.path.join(REPO, "tools", "host")
+TREE = os.path.join(REPO, "tree")
+
+DIAL_ADDRESSES = (0x37, 0x38, 0x36)  # util/encoders.py DIAL_ADDRESSES, left -> right
+
+_installed = False
+
+
+def install(dials=True):
+    """Make the device code importable on the host. Safe to call more than once.
+
+    The tree reads coordinates.csv/segments.csv relative to the working directory
+    (CIRCUITPY's root on the board), so this also changes into tree/. With `dials`,
+    three simulated seesaw dials are plugged into the I2C bus; returns them
+    (left, center, right) so a script can turn and press them.
+    """
+    global _installed
+    if not _installed:
+        for path in (TREE, HOST):
+            if path not in sys.path:
+                sys.path.insert(0, path)
+        os.chdir(TREE)
+        _installed = True
+    if dials:
+        from adafruit_seesaw.seesaw import attach_dials
+        return attach_dials(DIAL_ADDRESSES)
+    return []
+
+
+async def run_for(coro, seconds):
+    """Run a never-ending task (e.g. tree.animate()) for `seconds`, then cancel it."""
+    task = asyncio.create_task(coro)
+    await asyncio.sleep(seconds)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+def summarize(recording):
+    """Frame count, rate and interval spread of a neopixel_write.Recording."""
+    frames = list(recording.frames)
+    if len(frames) < 2:
+        return {"frames": len(frames)}
+    gaps = [(b[0] - a[0]) / 1e6 for a, b in zip(frames, frames[1:])]
+    span = (frames[-1][0] - frames[0][0]) / 1e9
+    changed = sum(1 for a, b in zip(frames, frames[1:]) if a[1] != b[1])
+    gaps.sort()
+    return {
+        "frames": len(frames),
+        "fps": round((len(frames) - 1) / span, 1) if span > 0 else None,
+        "interval_ms_median": round(gaps[len(gaps) // 2], 2),
+        "interval_ms_max": round(gaps[-1], 2),
+        "changed_frames": changed,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Animate the tree headless and report what the strand received.")
+    ap.add_argument("--effect", default=None, help="effect to load (default: the plain on() sprout)")
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--no-dials", action="store_true", help="run with no dials on the I2C bus")
+    args = ap.parse_args()
+
+    install(dials=not args.no_dials)
+    from tree import Tree
+
+    tree = Tree()
+    if args.effect:
+        tree.set_animation(args.effect)
+    tree.strand.frames.clear()
+    asyncio.run(run_for(tree.animate(), args.seconds))
+
+    for key, value in summarize(tree.strand.frames).items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Host stand-in for the `adafruit_seesaw` library, driving simulated dials."""
@@ -0,0 +1,14 @@
+"""Host stand-in for `adafruit_seesaw.digitalio` (input pins only; that's all the dials use)."""
+
+
+class DigitalIO:
+    def __init__(self, seesaw, pin):
+        self._seesaw = seesaw
+        self._pin = pin
+
+    @property
+    def value(self):
+        return self._seesaw.digital_read(self._pin)
+
+    def deinit(self):
+        pass
@@ -0,0 +1,47 @@
+"""Host stand-in for `adafruit_seesaw.neopixel.NeoPixel` (the dial's onboard pixel).
+
+Like the real driver, every `show()` writes the pixel buffer and then a SHOW
+command (two I2C transactions), and with `auto_write` on (the default) `fill()`
+shows immediately.
+"""
+
+
+class NeoPixel:
+    def __init__(self, seesaw, pin, n, *, bpp=None, brightness=1.0, auto_write=True, pixel_order="GRB"):
+        self._seesaw = seesaw
+        self._n = n
+        self._colors = [(0, 0, 0)] * n
+        self.brightness = brightness
+        self.auto_write = auto_write
+        seesaw._write()  # NEOPIXEL_PIN
+        seesaw._write()  # NEOPIXEL_BUF_LENGTH
+
+    def __len__(self):
+        return self._n
+
+    def __setitem__(self, index, color):
+        self._colors[index] = tuple(color)
+        if self.auto_write:
+            self.show()
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def fill(self, color):
+        self._colors = [tuple(color)] * self._n
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        self._seesaw._write()  # NEOPIXEL_BUF
+        self._seesaw._write()  # NEOPIXEL_SHOW
+        device = self._seesaw._device
+        r, g, b = self._colors[0]
+        br = self.brightness
+        device.pixel[0] = int(r * br)
+        device.pixel[1] = int(g * br)
+        device.pixel[2] = int(b * br)
+        device.pixel_writes += 1
+
+    def deinit(self):
+        pass
@@ -0,0 +1,15 @@
+"""Host stand-in for `adafruit_seesaw.rotaryio`."""
+
+
+class IncrementalEncoder:
+    def __init__(self, seesaw, encoder=0):
+        self._seesaw = seesaw
+        self._encoder = encoder
+
+    @property
+    def position(self):
+        return self._seesaw.encoder_position(self._encoder)
+
+    @position.setter
+    def position(self, value):
+        self._seesaw.set_encoder_position(value, self._encoder)
@@ -0,0 +1,157 @@
+"""Host stand-in for `adafruit_seesaw.seesaw.Seesaw`.
+
+Talks to a `SimulatedDial` registered in `busio.DEVICES` instead of real hardware.
+Each register access counts as the same number of I2C transactions the real
+library issues (a read is a register write followed by a read) and sleeps the same
+`delay` the real `read()` waits for the seesaw to respond, so host runs see
+realistic dial I/O cost in both bus traffic and blocked time.
+"""
+
+import time
+
+import busio
+
+
+class SimulatedDial:
+    """One seesaw rotary encoder board: a position counter, a button, one pixel.
+
+    Drive it from a host script: `turn(detents)`, `press()` / `release()`.
+    """
+
+    def __init__(self):
+        self.position = 0
+        self.delta_base = 0         # position at the last encoder_delta() read
+        self.pressed = False
+        self.pixel = bytearray(3)   # last color shown on the onboard NeoPixel
+        self.pixel_writes = 0
+        self.encoder_interrupt = False
+        self.gpio_interrupts = 0
+        self.interrupt_flags = 0
+
+    def turn(self, detents):
+        # CW reads as a falling raw position on this hardware (see util/encoders.py).
+        self.position -= detents
+        self._raise(1 << 31)
+
+    def press(self):
+        self.pressed = True
+        self._raise(1 << 24)
+
+    def release(self):
+        self.pressed = False
+        self._raise(1 << 24)
+
+    def _raise(self, bit):
+        if bit == 1 << 31:
+            if self.encoder_interrupt:
+                self.interrupt_flags |= bit
+        elif self.gpio_interrupts & bit:
+            self.interrupt_flags |= bit
+
+    @property
+    def interrupt(self):
+        """The level of the (active-low) INT line: True while a change is pending."""
+        return self.interrupt_flags != 0
+
+
+def attach_dials(addresses=(0x37, 0x38, 0x36)):
+    """Plug a SimulatedDial in at each address; returns them in address order given."""
+    dials = []
+    for addr in addresses:
+        dial = SimulatedDial()
+        busio.DEVICES[addr] = dial
+        dials.append(dial)
+    return dials
+
+
+class Seesaw:
+    INPUT = 0x00
+    OUTPUT = 0x01
+    INPUT_PULLUP = 0x02
+    INPUT_PULLDOWN = 0x03
+
+    def __init__(self, i2c_bus, addr=0x49, drdy=None, reset=True):
+        self.i2c_bus = i2c_bus
+        self.addr = addr
+        self._device = busio.DEVICES.get(addr)
+        if self._device is None:
+            raise ValueError(f"No I2C device at address: 0x{addr:x}")
+        self.chip_id = 0x84
+        if reset:
+            self.sw_reset()
+
+    # ---- transaction accounting ------------------------------------------
+
+    def _write(self):
+        self.i2c_bus.transactions += 1
+
+    def _read(self, delay=0.008):
+        self.i2c_bus.transactions += 2
+        time.sleep(delay)
+
+    # ---- seesaw API --------------------------------------------------------
+
+    def sw_reset(self, post_reset_delay=0.5):
+        self._write()
+        time.sleep(post_reset_delay)
+
+    def pin_mode(self, pin, mode):
+        self._write()
+
+    def pin_mode_bulk(self, pins, mode):
+        self._write()
+
+    def digital_read(self, pin):
+        return self.digital_read_bulk(1 << pin) != 0
+
+    def digital_read_bulk(self, pins, delay=0.008):
+        self._read(delay)
+        # The button pulls its INPUT_PULLUP pin low while pressed.
+        value = 0xFFFFFFFF & ~((1 << 24) if self._device.pressed else 0)
+        return value & pins
+
+    def set_GPIO_interrupts(self, pins, enabled):
+        self._write()
+        if enabled:
+            self._device.gpio_interrupts |= pins
+        else:
+            self._device.gpio_interrupts &= ~pins
+
+    def get_GPIO_interrupt_flag(self, delay=0.008):
+        self._read(delay)
+        flags = self._device.interrupt_flags & ~(1 << 31)
+        self._device.interrupt_flags &= 1 << 31
+        return flags
+
+    def read(self, reg_base, reg, buf, delay=0.008):
+        """Raw register read; only the encoder position register is modelled."""
+        self._read(delay)
+        if (reg_base, reg) != (0x11, 0x30):
+            raise NotImplementedError(f"register 0x{reg_base:02x}/0x{reg:02x}")
+        self._device.interrupt_flags &= ~(1 << 31)
+        buf[0:4] = (self._device.position & 0xFFFFFFFF).to_bytes(4, "big")
+
+    def encoder_position(self, encoder=0):
+        self._read()
+        self._device.interrupt_flags &= ~(1 << 31)
+        return self._device.position
+
+    def set_encoder_position(self, pos, encoder=0):
+        self._write()
+        self._device.position = pos
+
+    def encoder_delta(self, encoder=0):
+        self._read()
+        self._device.interrupt_flags &= ~(1 << 31)
+        device = self._device
+        delta = device.position - device.delta_base
+        device.delta_base = device.position
+        return delta
+
+    def enable_encoder_interrupt(self, encoder=0):
+        self._write()
+        self._device.encoder_interrupt = True
+
+    def disable_encoder_interrupt(self, encoder=0):
+        self._write()
+        self._device.encoder_interrupt = False
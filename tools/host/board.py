@@ -0,0 +1,41 @@
+"""Host stand-in for CircuitPython's `board` module (Feather ESP32-S3 pin names).
+
+Pins are plain named objects; the only behavior is identity, which is all the tree
+code relies on (`board.A1` for the strand, `board.SCL`/`board.SDA` for the dials,
+`getattr(board, "NEOPIXEL", None)` for the onboard status pixel).
+"""
+
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"board.{self.name}"
+
+
+A0 = Pin("A0")
+A1 = Pin("A1")
+A2 = Pin("A2")
+A3 = Pin("A3")
+D5 = Pin("D5")
+D6 = Pin("D6")
+D9 = Pin("D9")
+D10 = Pin("D10")
+D11 = Pin("D11")
+D12 = Pin("D12")
+LED = Pin("LED")
+NEOPIXEL = Pin("NEOPIXEL")
+SCL = Pin("SCL")
+SDA = Pin("SDA")
+
+_i2c = None
+
+
+def I2C():
+    """The board's shared STEMMA-QT bus (a singleton, like the real board.I2C())."""
+    global _i2c
+    if _i2c is None:
+        import busio
+        _i2c = busio.I2C(SCL, SDA)
+    return _i2c
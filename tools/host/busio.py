@@ -0,0 +1,26 @@
+"""Host stand-in for CircuitPython's `busio` (only I2C, for the seesaw dials).
+
+`DEVICES` is the simulated STEMMA-QT chain, shared by every bus object the way the
+physical wires are: code that probes for dials finds exactly the devices attached
+there. Each bus counts its transactions so dial traffic can be measured on the host.
+"""
+
+DEVICES = {}  # address -> simulated device (see adafruit_seesaw.seesaw.SimulatedDial)
+
+
+class I2C:
+    def __init__(self, scl=None, sda=None, *, frequency=100_000, timeout=255):
+        self.frequency = frequency
+        self.transactions = 0   # completed I2C transactions, reads and writes
+
+    def try_lock(self):
+        return True
+
+    def unlock(self):
+        pass
+
+    def scan(self):
+        return sorted(DEVICES)
+
+    def deinit(self):
+        pass
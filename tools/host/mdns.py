@@ -0,0 +1,14 @@
+"""Host stand-in for CircuitPython's `mdns`: accepts a hostname and adverts, does nothing."""
+
+
+class Server:
+    def __init__(self, network_interface):
+        self.hostname = None
+        self.instance_name = None
+        self.services = []
+
+    def advertise_service(self, *, service_type, protocol, port, txt_records=()):
+        self.services.append((service_type, protocol, port))
+
+    def deinit(self):
+        pass
@@ -0,0 +1,49 @@
+"""Host stand-in for CircuitPython's `microcontroller` module.
+
+`watchdog` records arming and feeds without ever firing; `reset()` raises
+`SystemExit` so a host run stops where the board would reboot; `nvm` is an
+in-memory byte array the size of the ESP32-S3's NVM partition.
+"""
+
+import time
+
+from watchdog import WatchDogMode
+
+
+class WatchDogTimer:
+    def __init__(self):
+        self.timeout = 0.0
+        self.mode = None
+        self.feeds = 0
+        self.last_feed = None
+
+    def feed(self):
+        if self.mode is None:
+            raise ValueError("WatchDogTimer is not initialized")
+        self.feeds += 1
+        self.last_feed = time.monotonic()
+
+    def deinit(self):
+        self.mode = None
+
+
+class Processor:
+    frequency = 240_000_000
+    temperature = 40.0
+    uid = b"\x00\x00\x00\x00\x00\x00"
+
+
+watchdog = WatchDogTimer()
+cpu = Processor()
+nvm = bytearray(8192)
+
+
+def reset():
+    raise SystemExit("microcontroller.reset()")
+
+
+def on_next_reset(run_mode):
+    pass
+
+
+__all__ = ["WatchDogMode", "cpu", "nvm", "on_next_reset", "reset", "watchdog"]
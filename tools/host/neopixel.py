@@ -0,0 +1,172 @@
+"""Host stand-in for the `neopixel` library on CircuitPython's native pixelbuf.
+
+Mirrors what the tree code sees on the device, not the pure-Python
+`adafruit_pixelbuf` fallback:
+
+- `pixels[i]` returns a **tuple** holding the value as written (pre-brightness), so
+  `pixels[i] == (0, 0, 0)` comparisons behave as they do on the board.
+- Brightness is applied as `output = int(value * brightness)` into a separate
+  post-brightness buffer, and changing `brightness` rescales the whole buffer.
+- A slice may be assigned one color, a sequence of colors, or a flat sequence of
+  `len(slice) * bpp` channel values (e.g. a `bytearray`), like the native module.
+- `show()` transmits the post-brightness buffer through `neopixel_write`, which on
+  the host records the frame (see `neopixel_write.recording`).
+"""
+
+import digitalio
+from neopixel_write import neopixel_write, recording
+
+RGB = "RGB"
+GRB = "GRB"
+BGR = "BGR"
+RGBW = "RGBW"
+GRBW = "GRBW"
+
+
+class NeoPixel:
+    def __init__(self, pin, n, *, bpp=3, brightness=1.0, auto_write=True, pixel_order=None):
+        if not pixel_order:
+            pixel_order = GRB if bpp == 3 else GRBW
+        self._n = n
+        self._bpp = len(pixel_order)
+        self._order = tuple(pixel_order.index(c) for c in "RGBW" if c in pixel_order)
+        self._byteorder = pixel_order
+        self._pre = bytearray(n * self._bpp)
+        self._post = bytearray(n * self._bpp)
+        self._brightness = 1.0
+        self._scale = bytes(range(256))
+        self.auto_write = False
+        self.brightness = brightness
+        self.auto_write = auto_write
+        self.pin = digitalio.DigitalInOut(pin)
+        self.pin.direction = digitalio.Direction.OUTPUT
+
+    # ---- host-only -------------------------------------------------------
+
+    @property
+    def frames(self):
+        """The `neopixel_write.Recording` of every frame shown on this strand."""
+        return recording(self.pin.pin)
+
+    # ---- pixelbuf API ----------------------------------------------------
+
+    @property
+    def n(self):
+        return self._n
+
+    @property
+    def bpp(self):
+        return self._bpp
+
+    @property
+    def byteorder(self):
+        return self._byteorder
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def brightness(self):
+        return self._brightness
+
+    @brightness.setter
+    def brightness(self, value):
+        value = min(max(value, 0.0), 1.0)
+        if value == self._brightness:
+            return
+        self._brightness = value
+        # int(v * brightness) for every byte value: lets bulk paths scale a whole
+        # buffer with bytes.translate, at roughly the speed the native module does it.
+        self._scale = bytes(int(v * value) for v in range(256))
+        self._post[:] = self._pre.translate(self._scale)
+        if self.auto_write:
+            self.show()
+
+    def _parse(self, value):
+        if isinstance(value, int):
+            return ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF, 0)
+        if len(value) == 3:
+            r, g, b = value
+            w = 0
+        elif len(value) == 4:
+            r, g, b, w = value
+        else:
+            raise ValueError(f"Expected tuple of length {self._bpp}, got {len(value)}")
+        return (int(r), int(g), int(b), int(w))
+
+    def _set(self, index, rgbw):
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("index out of range")
+        base = index * self._bpp
+        br = self._brightness
+        pre, post = self._pre, self._post
+        for c, pos in enumerate(self._order):
+            v = rgbw[c]
+            if not 0 <= v <= 255:
+                raise ValueError("color component out of range")
+            pre[base + pos] = v
+            post[base + pos] = int(v * br)
+
+    def _get(self, index):
+        base = index * self._bpp
+        pre = self._pre
+        return tuple(pre[base + pos] for pos in self._order)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            indices = range(*index.indices(self._n))
+            if isinstance(value, int) or (
+                isinstance(value, tuple) and len(value) in (3, 4) and all(isinstance(c, int) for c in value)
+                and len(indices) * self._bpp != len(value)
+            ):
+                rgbw = self._parse(value)
+                for i in indices:
+                    self._set(i, rgbw)
+            elif (len(value) == len(indices) * self._bpp and len(value) != len(indices)
+                  and indices.step == 1 and self._order == tuple(range(self._bpp))
+                  and isinstance(value, (bytes, bytearray, memoryview))):
+                # Flat bytes already in wire order: bulk copy + scale.
+                lo, hi = indices.start * self._bpp, indices.stop * self._bpp
+                self._pre[lo:hi] = value
+                self._post[lo:hi] = (value if isinstance(value, (bytes, bytearray)) else bytes(value)).translate(self._scale)
+            elif len(value) == len(indices) * self._bpp and len(value) != len(indices):
+                # Flat channel values, bpp per pixel, in R, G, B(, W) order.
+                bpp = self._bpp
+                for k, i in enumerate(indices):
+                    o = k * bpp
+                    self._set(i, (value[o], value[o + 1], value[o + 2], value[o + 3] if bpp == 4 else 0))
+            elif len(value) == len(indices):
+                for k, i in enumerate(indices):
+                    self._set(i, self._parse(value[k]))
+            else:
+                raise ValueError(f"Unmatched number of items on RHS (expected {len(indices)}, got {len(value)})")
+        else:
+            self._set(index, self._parse(value))
+        if self.auto_write:
+            self.show()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(self._n))]
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("index out of range")
+        return self._get(index)
+
+    def fill(self, color):
+        rgbw = self._parse(color)
+        for i in range(self._n):
+            self._set(i, rgbw)
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        neopixel_write(self.pin, self._post)
+
+    def deinit(self):
+        self.fill(0)
+        self.show()
+        self.pin.deinit()
@@ -0,0 +1,49 @@
+"""Host stand-in for CircuitPython's `neopixel_write`: records every transmitted frame.
+
+On the device `neopixel_write(pin, buf)` bit-bangs `buf` (already in wire order and
+brightness-scaled) out of `pin`. Here each call appends `(monotonic_ns, bytes(buf))`
+to the pin's `Recording`, so a host run can inspect exactly what would have reached
+the strand and when.
+"""
+
+import time
+from collections import deque
+
+_recordings = {}
+
+
+class Recording:
+    """Frames transmitted on one pin, oldest first. Keeps the most recent `keep`."""
+
+    def __init__(self, keep=4096):
+        self.frames = deque(maxlen=keep)
+        self.count = 0  # total frames ever written, including ones aged out
+
+    def add(self, buf):
+        self.count += 1
+        if self.frames.maxlen:  # keep=0 counts frames without copying them
+            self.frames.append((time.monotonic_ns(), bytes(buf)))
+
+    @property
+    def last(self):
+        return self.frames[-1] if self.frames else None
+
+    def clear(self):
+        self.frames.clear()
+        self.count = 0
+
+
+def recording(pin, keep=None):
+    """The Recording for a board pin, created on first use.
+
+    Pass `keep` to (re)size the history; doing so starts a fresh recording.
+    """
+    rec = _recordings.get(pin)
+    if rec is None or keep is not None:
+        rec = Recording(4096 if keep is None else keep)
+        _recordings[pin] = rec
+    return rec
+
+
+def neopixel_write(digitalinout, buf):
+    recording(digitalinout.pin).add(buf)
@@ -0,0 +1,13 @@
+"""Host stand-in for CircuitPython's `rainbowio` (imported by adafruit_led_animation.color)."""
+
+
+def colorwheel(color_value):
+    """Packed 0xRRGGBB on a red -> green -> blue -> red wheel, position 0-255."""
+    pos = int(color_value) & 255
+    if pos < 85:
+        return ((255 - pos * 3) << 16) | ((pos * 3) << 8)
+    if pos < 170:
+        pos -= 85
+        return ((255 - pos * 3) << 8) | (pos * 3)
+    pos -= 170
+    return ((pos * 3) << 16) | (255 - pos * 3)
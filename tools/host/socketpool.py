@@ -0,0 +1,34 @@
+"""Host stand-in for CircuitPython's `socketpool`, backed by the host's sockets.
+
+CPython sockets already provide the CircuitPython socket surface the app and the
+Adafruit network libraries use (`recv_into`, `recvfrom_into`, `settimeout`,
+`setblocking`, ...), so the pool hands them out directly.
+"""
+
+import socket as _socket
+
+
+class SocketPool:
+    AF_INET = _socket.AF_INET
+    SOCK_STREAM = _socket.SOCK_STREAM
+    SOCK_DGRAM = _socket.SOCK_DGRAM
+    SOL_SOCKET = _socket.SOL_SOCKET
+    SO_REUSEADDR = _socket.SO_REUSEADDR
+    IPPROTO_TCP = _socket.IPPROTO_TCP
+    TCP_NODELAY = _socket.TCP_NODELAY
+    EAI_NONAME = -2
+    gaierror = _socket.gaierror
+    timeout = _socket.timeout
+
+    def __init__(self, radio):
+        self._radio = radio
+
+    def socket(self, family=AF_INET, type=SOCK_STREAM, proto=0):
+        sock = _socket.socket(family, type, proto)
+        if type == _socket.SOCK_STREAM:
+            # Restarting a host run should rebind the server port immediately.
+            sock.setsockopt(_socket.SOL_SOCKET, _socket.SO_REUSEADDR, 1)
+        return sock
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        return _socket.getaddrinfo(host, port, family, type, proto, flags)
@@ -0,0 +1,10 @@
+"""Host stand-in for CircuitPython's `watchdog` module."""
+
+
+class WatchDogMode:
+    RAISE = "RAISE"
+    RESET = "RESET"
+
+
+class WatchDogTimeout(Exception):
+    pass
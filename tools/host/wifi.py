@@ -0,0 +1,29 @@
+"""Host stand-in for CircuitPython's `wifi` module.
+
+`radio.connect()` succeeds and the radio reports the loopback address, so the
+HTTP server and sockets opened through `socketpool` bind on this machine. Like the
+real one it blocks while it associates: set `radio.connect_delay` (seconds, 0 by
+default) to see what a slow access point does to the rest of boot.
+"""
+
+import time
+
+
+class Radio:
+    def __init__(self):
+        self.connected = False
+        self.ipv4_address = None
+        self.hostname = "mr-tree"
+        self.connect_delay = 0.0
+
+    def connect(self, ssid=None, password=None, *, channel=0, bssid=None, timeout=None):
+        time.sleep(self.connect_delay)
+        self.connected = True
+        self.ipv4_address = "127.0.0.1"
+
+    def stop_station(self):
+        self.connected = False
+        self.ipv4_address = None
+
+
+radio = Radio()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Render a trace recorded on the tree (tree/util/trace.py) as timelines and stalls.
+
+Records a window of the device's trace points, then shows, per task, when it ran,
+how long its runs take, and which runs held the shared asyncio loop long enough to
+delay a frame.
+
+Usage:
+  python tools/trace_view.py [--host mr-tree.local] [--port 7433] [--seconds 5]
+  python tools/trace_view.py --file trace.bin
+  (--save trace.bin keeps the downloaded dump for later)
+
+Against the device it calls /trace/on, waits --seconds, calls /trace/off and
+downloads /trace. Output:
+  timeline    one row per trace point over the last --window ms; '#' where it
+              was running, '|' for instant marks
+  histogram   duration buckets per trace point (count, p50, p95, max)
+  stalls      the --top longest runs, and the longest gaps between frame starts
+              with whatever else was running in that gap
+"""
+import argparse
+import struct
+import sys
+import time
+from urllib.request import urlopen
+
+HEADER = "<4sHHI"
+RECORD = "<BBHI"
+BEGIN, END, MARK = 0, 1, 2
+WRAP = 1 << 32
+BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100)
+
+
+def get(base, path):
+    with urlopen(base + path, timeout=10) as r:
+        return r.read()
+
+
+def parse(data):
+    """-> (names {id: name}, [(id, phase, arg, t_us), ...]) with t unwrapped, oldest first."""
+    size = struct.calcsize(HEADER)
+    magic, count, names_len, now = struct.unpack_from(HEADER, data, 0)
+    if magic != b"MTRC":
+        raise ValueError("not a trace dump (bad magic)")
+    names = {}
+    for item in data[size:size + names_len].decode().split(","):
+        if item:
+            k, v = item.split(":", 1)
+            names[int(k)] = v
+    records = []
+    offset = size + names_len
+    rsize = struct.calcsize(RECORD)
+    base = 0
+    prev = None
+    for k in range(count):
+        point, phase, arg, t = struct.unpack_from(RECORD, data, offset + k * rsize)
+        if prev is not None and t < prev:
+            base += WRAP  # the 32-bit microsecond clock wrapped (~71 minutes)
+        prev = t
+        records.append((point, phase, arg, base + t))
+    return names, records
+
+
+def spans(records):
+    """Pair begin/end records -> {id: [(start_us, end_us, arg), ...]}, plus marks."""
+    open_at = {}
+    runs = {}
+    marks = {}
+    for point, phase, arg, t in records:
+        if phase == BEGIN:
+            open_at[point] = t
+        elif phase == END:
+            start = open_at.pop(point, None)
+            if start is not None:  # an end whose begin was overwritten is dropped
+                runs.setdefault(point, []).append((start, t, arg))
+        else:
+            marks.setdefault(point, []).append(t)
+    return runs, marks
+
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def timeline(names, runs, marks, window_ms, width):
+    ends = [r[-1][1] for r in runs.values() if r] + [m[-1] for m in marks.values() if m]
+    if not ends:
+        print("(no trace records)")
+        return
+    t1 = max(ends)
+    t0 = t1 - window_ms * 1000
+    scale = (t1 - t0) / width
+    label = max(len(n) for n in names.values())
+    print(f"timeline: last {window_ms} ms, {scale / 1000:.2f} ms per column")
+    for point in sorted(names):
+        row = [" "] * width
+        for start, end, _ in runs.get(point, ()):
+            if end < t0:
+                continue
+            a = max(0, int((start - t0) / scale))
+            b = min(width - 1, int((end - t0) / scale))
+            for c in range(a, b + 1):
+                row[c] = "#"
+        for t in marks.get(point, ()):
+            if t >= t0:
+                row[min(width - 1, int((t - t0) / scale))] = "|"
+        print(f"  {names[point]:>{label}} {''.join(row)}")
+
+
+def histogram(names, runs):
+    print("durations (ms):")
+    head = "".join(f"{'<' + str(b):>7}" for b in BUCKETS_MS)
+    label = max(len(n) for n in names.values())
+    print(f"  {'':>{label}} {head} {'more':>6} {'count':>6} {'p50':>7} {'p95':>7} {'max':>7}")
+    for point in sorted(runs):
+        ms = [(end - start) / 1000 for start, end, _ in runs[point]]
+        counts = [0] * (len(BUCKETS_MS) + 1)
+        for d in ms:
+            for k, b in enumerate(BUCKETS_MS):
+                if d < b:
+                    counts[k] += 1
+                    break
+            else:
+                counts[-1] += 1
+        cells = "".join(f"{c:>7}" for c in counts[:-1])
+        print(f"  {names.get(point, point):>{label}} {cells} {counts[-1]:>6} {len(ms):>6}"
+              f" {percentile(ms, 0.5):>7.2f} {percentile(ms, 0.95):>7.2f} {max(ms):>7.2f}")
+
+
+def overlapping(names, runs, start, end, skip):
+    """Names of the runs inside [start, end), longest first, with their duration."""
+    found = []
+    for point, rs in runs.items():
+        if point in skip:
+            continue
+        for s, e, _ in rs:
+            if s < end and e > start:
+                found.append((e - s, names.get(point, str(point))))
+    found.sort(reverse=True)
+    return ", ".join(f"{n} {d / 1000:.1f}ms" for d, n in found[:3]) or "-"
+
+
+def stalls(names, runs, top):
+    every = [(end - start, point, start, end) for point, rs in runs.items() for start, end, _ in rs]
+    every.sort(reverse=True)
+    print("longest runs:")
+    for d, point, start, end in every[:top]:
+        print(f"  {d / 1000:8.2f} ms  {names.get(point, point)}")
+
+    frame = next((k for k, v in names.items() if v == "frame"), None)
+    frames = runs.get(frame, [])
+    if len(frames) < 2:
+        return
+    # A gap between frame starts well over the period is a frame some other task ate.
+    gaps = [(b[0] - a[0], a[1], b[0]) for a, b in zip(frames, frames[1:])]
+    gaps.sort(reverse=True)
+    median = percentile([g[0] for g in gaps], 0.5)
+    print(f"longest frame gaps (median {median / 1000:.1f} ms):")
+    for gap, after, start in gaps[:top]:
+        print(f"  {gap / 1000:8.2f} ms  in the gap: {overlapping(names, runs, after, start, (frame,))}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Render a Mr Tree trace as timelines, histograms and stalls.")
+    ap.add_argument("--host", default="mr-tree.local")
+    ap.add_argument("--port", type=int, default=7433)
+    ap.add_argument("--seconds", type=float, default=5.0, help="how long to record on the device")
+    ap.add_argument("--file", help="read a saved dump instead of recording")
+    ap.add_argument("--save", help="write the downloaded dump here")
+    ap.add_argument("--window", type=int, default=200, help="timeline span, ms")
+    ap.add_argument("--width", type=int, default=100, help="timeline columns")
+    ap.add_argument("--top", type=int, default=5, help="stalls to list")
+    args = ap.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            data = f.read()
+    else:
+        base = f"http://{args.host}:{args.port}"
+        try:
+            get(base, "/trace/on")
+            time.sleep(args.seconds)
+            get(base, "/trace/off")
+            data = get(base, "/trace")
+        except OSError as e:
+            sys.exit(f"Could not reach {base}: {e}")
+        if args.save:
+            with open(args.save, "wb") as f:
+                f.write(data)
+
+    names, records = parse(data)
+    runs, marks = spans(records)
+    print(f"{len(records)} records")
+    timeline(names, runs, marks, args.window, args.width)
+    print()
+    histogram(names, runs)
+    print()
+    stalls(names, runs, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,34 +7,59 @@ import socketpool
 import wifi
 import mdns
 import json
-from microcontroller import watchdog
+from binascii import hexlify
+from microcontroller import watchdog, nvm
 from watchdog import WatchDogMode
-from adafruit_httpserver.server import Server, Request, Response
-from adafruit_minimqtt.adafruit_minimqtt import MQTT
+from adafruit_httpserver.server import Request, Response, NO_REQUEST
 
 from tree import Tree
 from effects.timer import Timer
 from util.encoders import Dials
 from util.controller import Controller
 from util.board_leds import BoardLeds
+from util import trace
+from util.diagnostics import Diagnostics
+from util.stalls import StallMonitor
+from util.mqtt_client import MQTTClient
+from util import clock
+from util import binproto
+from util.stream import StreamReceiver
+from util.live import LiveClients
+from util.static import StaticAssets, not_modified
+from util.http_server import PollingServer
+from util.persist import StateStore
+from util.boot_timeline import BootTimeline
 from util.mqtt import (
-    set_mqtt_client, publish_message,
+    set_mqtt_client, publish_message, drain_messages, forget_sent,
     MQTT_TOPIC_STATE, MQTT_TOPIC_SET, MQTT_TOPIC_AVAILABILITY,
     MQTT_DISCOVERY_PREFIX, MQTT_DISCOVERY_TOPIC, MQTT_TIMER_STATE,
-    MQTT_TIMER_SET, MQTT_TIMER_DISCOVERY_TOPIC
+    MQTT_TIMER_SET, MQTT_TIMER_DISCOVERY_TOPIC, MQTT_DIAGNOSTICS_STATE,
+    MQTT_STALLS_STATE, MQTT_TOPIC_STATE_BIN, MQTT_TOPIC_SET_BIN
 )
 
+# Boot runs as tasks alongside rendering; this records when each part of it ran
+# (see util/boot_timeline.py), served on /boot.
+timeline = BootTimeline()
+timeline.begin("setup")
+
 # Configure the watchdog with a 10 second timeout. It is deliberately NOT armed
-# here: blocking WiFi/MQTT setup during startup can take longer than the timeout,
-# and nothing feeds the watchdog until the feeder task starts. Arming it now would
-# reset (and bootloop) the board whenever the network or broker is slow/absent.
-# It is armed in main() once network setup is complete.
+# here: nothing feeds it until the feeder task starts. main() arms it as it starts
+# the tasks; nothing after that blocks for long (each WiFi attempt is bounded by
+# WIFI_CONNECT_TIMEOUT_S, and the watchdog is fed before it).
 watchdog.timeout = 10.0  # 10 seconds
 
 print("Creating tree...")
 tree = Tree()
 print("Tree created!")
 
+# Event-loop lag monitor; every task in main() is tracked so a stall is charged to
+# the task that blocked the loop (see util/stalls.py).
+stalls = StallMonitor()
+
+# Render/loop/memory/network health, sampled into HA diagnostic sensors on the
+# heartbeat cadence (see util/diagnostics.py).
+diagnostics = Diagnostics(stalls)
+
 # Keep the microcontroller's onboard status LEDs dark, and dark whenever the tree
 # powers off, so nothing on the board glows alongside the strand.
 print("Blanking onboard board LEDs...")
@@ -42,60 +67,75 @@ board_leds = BoardLeds()
 tree.add_power_listener(board_leds.set_power)
 
 # Boot sequence: play a startup rainbow, then fade to the remembered setting. The
-# "memory" is the retained MQTT command HA re-sends to mr_tree/set on reconnect
-# (the light is configured retain=true). Any state change that arrives during the
-# rainbow is captured here and applied once the rainbow finishes.
+# memory is the last applied state, saved in NVM (util/persist.py) and read here,
+# before the network is up. Without a saved state, it's the retained MQTT command HA
+# re-sends to mr_tree/set on reconnect (the light is configured retain=true). Any
+# state change that arrives during the rainbow is held and applied, in order, on
+# top of the saved state once the rainbow finishes.
 BOOT_FILL_S = 2.0   # startup rainbow bottom-up fill time
 BOOT_HOLD_S = 1.0   # hold the full rainbow before restoring
 _booting = True
 _pending_restore = None
-
-print("Connecting to WiFi...")
-for attempt in range(10):
-    try:
-        wifi.radio.connect(os.getenv("WIFI_SSID"), os.getenv("WIFI_PASSWORD"))
-        break
-    except Exception as e:
-        print(f"WiFi connection attempt {attempt + 1}/10 failed: {e}")
-        time.sleep(2)
-print("Connected!", str(wifi.radio.ipv4_address))
-
-# Set up socket pool
+_restore_timer = None
+_boot_changes = []  # state changes deferred during the rainbow
+
+saved_state = StateStore(nvm)
+_saved = saved_state.load(Tree.EFFECTS)
+if _saved is not None:
+    _pending_restore, _restore_timer = _saved
+    print(f"Saved state: {_pending_restore}, timer {_restore_timer}")
+# HA re-sends its last mr_tree/set, retained, on every MQTT connect. The saved state
+# keeps a CRC of the last HA command applied; a replay of that same command is no
+# newer than what we have and is skipped, while anything else is a command HA sent
+# while we were down, and applies.
+_unapplied_command = None  # the HA command payload waiting for the next frame
+
+# WiFi is joined by bring_up_network(), once the tree is already rendering. Each
+# connect attempt blocks everything (the strand holds its frame meanwhile), so it's
+# bounded, and retried with backoff up to WIFI_RETRY_MAX_S apart.
+WIFI_CONNECT_TIMEOUT_S = 5
+WIFI_RETRY_MAX_S = 60
+
+# Set up socket pool. Nothing opens a socket before WiFi is up.
 pool = socketpool.SocketPool(wifi.radio)
 
-print("Starting mDNS...")
-try:
-    mdns_name = os.getenv("MDNS_NAME")
-    mdns_server = mdns.Server(wifi.radio)
-    mdns_server.hostname = mdns_name
-    mdns_server.advertise_service(service_type="_http", protocol="_tcp", port=int(os.getenv("SERVER_PORT")))
-    print(f"mDNS started at {mdns_name}.local")
-except Exception as e:
-    print(f"Failed to start mDNS: {e}")
-    print("Continuing without mDNS...")
-
-# Set up HTTP server
-server = Server(pool, "/static", debug=False)
+# Set up HTTP server. Requests are read a piece at a time as they arrive, so a slow
+# or stalled client never holds the event loop (see util/http_server.py).
+server = PollingServer(pool, "/static", debug=False, budget=0.003)
+# Idle polling backs off from HTTP_IDLE_MIN_S to HTTP_IDLE_MAX_S (seconds); any
+# request or client mid-request brings it back to every pass of the loop.
+HTTP_IDLE_MIN_S = 0.005
+HTTP_IDLE_MAX_S = 0.05
+# The control page, pre-gzipped with an ETag by tools/build_static.py.
+static_assets = StaticAssets()
 
 # Set up MQTT client
 print("Setting up MQTT client...")
-mqtt_client = MQTT(
+mqtt_client = MQTTClient(
     broker=os.getenv("MQTT_BROKER"),
     port=int(os.getenv("MQTT_PORT", "1883")),
     username=os.getenv("MQTT_USERNAME"),
     password=os.getenv("MQTT_PASSWORD"),
     socket_pool=pool,
-    # A poll with no waiting packet blocks for socket_timeout, and asyncio is
-    # cooperative (single-threaded), so this is the longest MQTT can stall an
-    # animation frame. Keep it well under one fade frame (~16ms at 60fps) so fades
-    # don't step; MQTT command/state packets are small and still read fine in 5ms.
-    socket_timeout=0.005,
-    recv_timeout=5  # bound blocking connect/reconnect below the 10s watchdog window
+    connect_timeout=5  # give up on a connection attempt after this long, then retry
 )
+# Longest a single MQTT poll may hold the event loop; well under one fade frame
+# (~16ms at 60fps). Anything left waiting is read on the next pass.
+MQTT_POLL_BUDGET_S = 0.002
+# Likewise for sending queued publishes (serializing + writing) per pass.
+MQTT_PUBLISH_BUDGET_S = 0.002
 
 # Initialize MQTT utilities
 set_mqtt_client(mqtt_client)
 
+# Also publish state in the compact binary format (util/binproto.py) on
+# mr_tree/state/bin. Binary commands on mr_tree/set/bin are always accepted.
+MQTT_BINARY_STATE = bool(int(os.getenv("MQTT_BINARY_STATE", "0")))
+_state_bin = bytearray(binproto.SIZE)  # reused for every binary state record
+
+# Realtime pixel frames over UDP (DDP), shown as they arrive; see util/stream.py.
+stream = StreamReceiver(pool, tree)
+
 # Set up Last Will and Testament
 mqtt_client.will_set(
     topic=MQTT_TOPIC_AVAILABILITY,
@@ -153,16 +193,17 @@ def publish_discovery():
         "payload_not_available": "offline"
     }
 
-    # Timer sensor config
+    # Timer sensor config. The tree publishes the timer state only when it changes,
+    # so the sensor is the end time and HA counts down to it; remaining is an
+    # attribute (the snapshot when paused).
     timer_config = {
         "name": "Timer",
         "unique_id": "timer",
         "state_topic": MQTT_TIMER_STATE,
-        "device_class": "duration",
-        "unit_of_measurement": "s",
-        "value_template": "{{ value_json.remaining }}",
+        "device_class": "timestamp",
+        "value_template": "{{ value_json.ends_at if value_json.ends_at else None }}",
         "json_attributes_topic": MQTT_TIMER_STATE,
-        "json_attributes_template": "{{ {'duration': value_json.duration, 'state': value_json.state} | tojson }}",
+        "json_attributes_template": "{{ {'duration': value_json.duration, 'state': value_json.state, 'remaining': value_json.remaining} | tojson }}",
         "device": device,
         "availability_topic": MQTT_TOPIC_AVAILABILITY,
         "payload_available": "online",
@@ -188,6 +229,37 @@ def publish_discovery():
         "payload_not_available": "offline"
     }
 
+    # Diagnostic sensors, all read from the one mr_tree/diagnostics payload.
+    diagnostic_sensors = [
+        ("fps", "Render FPS", "fps", None, "mdi:speedometer"),
+        ("frame_ms_p95", "Frame Time p95", "ms", "duration", "mdi:timer-sand"),
+        ("stall_ms", "Worst Loop Stall", "ms", "duration", "mdi:timer-alert"),
+        ("mem_free", "Free Memory", "B", "data_size", "mdi:memory"),
+        ("mem_largest", "Largest Free Block", "B", "data_size", "mdi:memory"),
+        ("mqtt_loop_ms", "MQTT Loop Latency", "ms", "duration", "mdi:lan-pending"),
+        ("http_rps", "HTTP Requests", "req/s", None, "mdi:web"),
+        ("dial_i2c_tps", "Dial I2C Transactions", "tx/s", None, "mdi:swap-horizontal"),
+    ]
+    diagnostic_configs = []
+    for key, name, unit, device_class, icon in diagnostic_sensors:
+        config = {
+            "name": name,
+            "unique_id": f"diag_{key}",
+            "state_topic": MQTT_DIAGNOSTICS_STATE,
+            "value_template": f"{{{{ value_json.{key} }}}}",
+            "unit_of_measurement": unit,
+            "state_class": "measurement",
+            "entity_category": "diagnostic",
+            "device": device,
+            "icon": icon,
+            "availability_topic": MQTT_TOPIC_AVAILABILITY,
+            "payload_available": "online",
+            "payload_not_available": "offline"
+        }
+        if device_class:
+            config["device_class"] = device_class
+        diagnostic_configs.append(config)
+
     # Timer control buttons
     timer_buttons = [
         {
@@ -243,24 +315,23 @@ def publish_discovery():
             print(f"Publishing timer button config to {topic}")
             publish_message(topic, button, retain=True)
 
-        print("All discovery configurations published successfully!")
+        # Publish diagnostic sensors
+        for config in diagnostic_configs:
+            topic = f"{MQTT_DISCOVERY_PREFIX}/sensor/mr_tree/{config['unique_id']}/config"
+            print(f"Publishing diagnostic sensor config to {topic}")
+            publish_message(topic, config, retain=True)
+
+        print("All discovery configurations queued")
     except Exception as e:
         print(f"Error publishing discovery config: {e}")
         import traceback
         traceback.print_exc()
 
-def mqtt_connect(mqtt_client, userdata, flags, rc):
-    """Handle MQTT connection."""
-    print(f"Connected to MQTT broker! (rc={rc})")
-    print(f"Subscribing to topics:")
-    print(f"  - {MQTT_TOPIC_SET}")
-    print(f"  - {MQTT_TIMER_SET}")
-    print(f"  - {MQTT_TIMER_SET}/duration")
-
-    mqtt_client.subscribe(MQTT_TOPIC_SET)
-    mqtt_client.subscribe(MQTT_TIMER_SET)  # Subscribe to timer control topic
-    mqtt_client.subscribe(f"{MQTT_TIMER_SET}/duration")  # Subscribe to timer duration topic
+def announce():
+    """Everything sent after (re)connecting: discovery, availability and state.
 
+    These only queue (util/mqtt.py); handle_mqtt() sends them a few at a time.
+    """
     # Clean up old discovery messages first
     print("Cleaning up old discovery messages...")
     cleanup_old_discovery()
@@ -277,20 +348,51 @@ def mqtt_connect(mqtt_client, userdata, flags, rc):
     print("Publishing initial state...")
     publish_state()
 
+def mqtt_connect(mqtt_client, userdata, flags, rc):
+    """Handle MQTT connection."""
+    print(f"Connected to MQTT broker! (rc={rc})")
+    timeline.end("mqtt")
+    timeline.mark("online")
+    print(f"Subscribing to topics:")
+    print(f"  - {MQTT_TOPIC_SET}")
+    print(f"  - {MQTT_TIMER_SET}")
+    print(f"  - {MQTT_TIMER_SET}/duration")
+    print(f"  - {MQTT_TOPIC_SET_BIN}")
+
+    mqtt_client.subscribe(MQTT_TOPIC_SET)
+    mqtt_client.subscribe(MQTT_TIMER_SET)  # Subscribe to timer control topic
+    mqtt_client.subscribe(f"{MQTT_TIMER_SET}/duration")  # Subscribe to timer duration topic
+    mqtt_client.subscribe(MQTT_TOPIC_SET_BIN)  # Binary commands (util/binproto.py)
+
+    # A new session: everything goes out again, even if unchanged since last time.
+    forget_sent()
+    announce()
+
 def handle_state_change(state_params):
     """Handle state changes from any source (MQTT or HTTP).
 
+    Queued on the tree and merged with anything else that arrives before the next
+    frame, which applies them all at once through apply_state_change().
+
+    Args:
+        state_params: dict containing any of: state, brightness, color, effect, effect_params, speed, animation_state
+    """
+    tree.submit(state_params)
+
+def apply_state_change(state_params):
+    """Apply a (merged) state change; called by the tree at the start of a frame.
+
     Args:
         state_params: dict containing any of: state, brightness, color, effect, effect_params, speed, animation_state
     Returns:
         None
     """
-    global _pending_restore
+    global _unapplied_command
     if _booting:
-        # Hold changes (notably the retained MQTT restore) until the startup
-        # rainbow finishes; keep only the latest.
+        # Hold changes (the retained MQTT restore, or anything sent over HTTP,
+        # WebSocket or MQTT) until the startup rainbow finishes.
         print(f"Boot: deferring state change until the rainbow finishes: {state_params}")
-        _pending_restore = state_params
+        _boot_changes.append(state_params)
         return
 
     try:
@@ -331,6 +433,9 @@ def handle_state_change(state_params):
             elif state_params["animation_state"] == "running":
                 tree.resume()
 
+        if _unapplied_command is not None:
+            saved_state.note_command(_unapplied_command)
+            _unapplied_command = None
         publish_state()
         # Keep the dial controller's mode/values coherent with HA commands.
         controller.sync_from_ha(state_params)
@@ -338,6 +443,8 @@ def handle_state_change(state_params):
         print(f"Error handling state change: {e}")
         raise
 
+tree.command_handler = apply_state_change
+
 def start_timer(duration=300):
     """Turn the tree on if needed, then start a fresh timer for `duration` seconds."""
     if not tree.is_on():
@@ -387,11 +494,19 @@ def handle_timer_message(message):
 
 def mqtt_message(mqtt_client, topic, message):
     """Handle incoming MQTT messages."""
+    global _unapplied_command
     print(f"MQTT << {topic}: {message}")
     try:
-        if topic == MQTT_TOPIC_SET:
-            state = json.loads(message)
-            handle_state_change(state)
+        if topic in (MQTT_TOPIC_SET, MQTT_TOPIC_SET_BIN):
+            if mqtt_client.retained and saved_state.is_last_command(message):
+                print("Ignoring the retained command; it's the last one applied")
+                return
+            if topic == MQTT_TOPIC_SET:
+                handle_state_change(json.loads(message))
+            else:
+                handle_state_change(binproto.decode_command(message, Tree.EFFECTS))
+            # Raw topics hand over a view of the receive buffer; keep a copy.
+            _unapplied_command = message if isinstance(message, str) else bytes(message)
         elif topic == f"{MQTT_TIMER_SET}/duration":
             # Handle duration number input - only set duration, don't start or cancel
             duration = int(float(message))  # Handle both integer and float inputs
@@ -412,16 +527,40 @@ def publish_state():
         tree_state = tree.state()
         # Tree state is already in HA format, no need to convert
         publish_message(MQTT_TOPIC_STATE, tree_state)
+        if MQTT_BINARY_STATE:
+            publish_message(MQTT_TOPIC_STATE_BIN, tree.state_into(_state_bin))
+        live.push("state", tree_state)
+        timer = current_timer_state()
+        live.push("timer", timer)
+        if not _booting:
+            saved_state.update(tree.state_into(_state_bin), timer)
     except Exception as e:
         print(f"Error publishing state: {e}")
 
+def current_timer_state():
+    """The timer's state, or an idle one when the timer effect isn't loaded."""
+    if isinstance(tree.animation, Timer):
+        return tree.animation.get_state()
+    return {"remaining": 0, "duration": 0, "state": "idle"}
+
+# Web page clients on /ws get state changes pushed and send commands back (see
+# util/live.py); the timer pushes its own changes.
+live = LiveClients(handle_state_change, lambda: {"state": tree.state(), "timer": current_timer_state()})
+def timer_changed(state):
+    """The timer published a change: push it to the page and note it for NVM."""
+    live.push("timer", state)
+    if not _booting:
+        saved_state.update(tree.state_into(_state_bin), state)
+
+Timer.on_state = timer_changed
+
 # Set up MQTT callbacks
 mqtt_client.on_connect = mqtt_connect
 mqtt_client.on_message = mqtt_message
+mqtt_client.raw_topics.add(MQTT_TOPIC_SET_BIN)
 
 # Set up dials (rotary encoders). Missing/failed dials are skipped so the tree
 # still runs over MQTT without them.
-print("Initializing dials...")
 # Run the seesaw bus at 400kHz so per-poll dial reads are ~4x faster and steal
 # less time from the render loop. Fall back to the default bus if unavailable.
 try:
@@ -429,21 +568,32 @@ try:
 except Exception as e:
     print(f"Fast I2C unavailable ({e}); using default bus")
     i2c = board.I2C()
+# The dials are found and set up by bring_up_dials(), in the encoder task.
 dials = Dials(i2c)
-if dials.any_present:
-    dials.calibrate()
+dials_ready = asyncio.Event()
 controller = Controller(tree, dials, publish_state)
 
+# Dial polling (seconds between controller.poll() calls): fast while the dials are
+# in use (DIAL_ACTIVE_S after the last turn/press) or the controller has LEDs to
+# step, slow when idle. With the INT line an idle tree only polls as a safety net,
+# and a change wakes the encoder task through dial_wake within ~DIAL_INT_CHECK_S.
+DIAL_FAST_S = 0.02
+DIAL_ACTIVE_S = 3.0
+DIAL_IDLE_S = 0.1
+DIAL_INT_IDLE_S = 1.0
+DIAL_INT_CHECK_S = 0.005
+dial_wake = asyncio.Event()
+controller.wake = dial_wake.set
+
 @server.route("/")
 def base(request: Request):
     """
     Serve a static control page
     """
     # The control page is a dev-time convenience (primary control is MQTT/dial),
-    # so read it per request rather than holding it in RAM permanently. The `with`
-    # block closes the file handle, which the previous open().read() leaked.
-    with open("index.html", "r") as f:
-        return Response(request, f.read(), content_type="text/html")
+    # so it is streamed from flash per request rather than held in RAM, and a
+    # browser revalidating its cached copy gets a 304.
+    return static_assets.response(request, "index.html", "text/html")
 
 @server.route("/on")
 def on(request: Request):
@@ -517,19 +667,114 @@ def speed(request: Request, speed: str):
     handle_state_change({"speed": float(speed)})
     return Response(request, f"Tree animation speed set to {speed}")
 
+def state_etag():
+    """ETag for the current state: the binary state record (util/binproto.py) in
+    hex, which covers what state() reports without building it. None while a
+    change is pending (the record doesn't show it yet)."""
+    if tree.has_pending_command():
+        return None
+    return '"' + hexlify(tree.state_into(_state_bin)).decode() + '"'
+
+def timer_etag(state):
+    return f'"{state["state"]}-{state["duration"]}-{state["remaining"]}-{1 if state.get("ends_at") else 0}"'
+
 @server.route("/state")
 def get_state(request: Request):
     """
-    Get the tree state.
+    Get the tree state. Answers If-None-Match with a 304 while it's unchanged.
+    """
+    etag = state_etag()
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"} if etag else None
+    return Response(request, json.dumps(tree.state()), content_type="application/json", headers=headers)
+
+@server.route("/state.bin")
+def get_state_bin(request: Request):
+    """
+    Get the tree state as a binary record (see util/binproto.py).
+    """
+    return Response(request, tree.state_into(_state_bin), content_type="application/octet-stream")
+
+@server.route("/state.bin", methods=["POST"])
+def set_state_bin(request: Request):
+    """
+    Set tree attributes from a binary command record (see util/binproto.py).
+    Returns the new state as a binary record.
+    """
+    try:
+        handle_state_change(binproto.decode_command(request.body, Tree.EFFECTS))
+        return Response(request, tree.state_into(_state_bin), content_type="application/octet-stream")
+    except ValueError as e:
+        return Response(request, f"Error: {str(e)}", status=400)
+
+@server.route("/frames")
+def get_frame_stats(request: Request):
+    """
+    Render-loop pacing: achieved fps, jitter, work time per frame, dropped frames.
+    """
+    return Response(request, json.dumps(tree.frame_stats()), content_type="application/json")
+
+@server.route("/stalls")
+def get_stalls(request: Request):
+    """
+    Event-loop stalls over the threshold, counted per task that caused them.
+    """
+    return Response(request, json.dumps(stalls.stats()), content_type="application/json")
+
+@server.route("/boot")
+def get_boot(request: Request):
+    """
+    Boot timeline: when each bring-up phase ran, and milestones (first light, online).
     """
-    return Response(request, json.dumps(tree.state()), content_type="application/json")
+    return Response(request, json.dumps(timeline.report()), content_type="application/json")
+
+@server.route("/stream")
+def get_stream(request: Request):
+    """
+    Pixel stream (DDP) status: active, fps, frames, packets, dropped packets.
+    """
+    return Response(request, json.dumps(stream.stats()), content_type="application/json")
+
+@server.route("/trace")
+def get_trace(request: Request):
+    """
+    The trace ring buffer as binary (see util/trace.py); render it with
+    tools/trace_view.py.
+    """
+    return Response(request, trace.dump(), content_type="application/octet-stream")
+
+@server.route("/trace/on")
+def trace_on(request: Request):
+    """Start recording trace points (clears the previous recording)."""
+    trace.clear()
+    trace.enable(True)
+    return Response(request, json.dumps({"tracing": True}), content_type="application/json")
+
+@server.route("/trace/off")
+def trace_off(request: Request):
+    """Stop recording; the buffer is kept for GET /trace."""
+    trace.enable(False)
+    return Response(request, json.dumps({"tracing": False}), content_type="application/json")
+
+@server.route("/ws")
+def websocket(request: Request):
+    """
+    Live connection for the web page: state and timer changes are pushed as they
+    happen, and commands (the POST /state JSON) come back (see util/live.py).
+    """
+    try:
+        return live.connect(request)
+    except ValueError as e:
+        return Response(request, f"Error: {str(e)}", status=400)
 
 @server.route("/state", methods=["POST"])
 def set_state(request: Request):
     """
     Set multiple tree attributes at once.
     Accepts JSON body with any of: state, brightness, color, effect, effect_params
-    Returns the new state.
+    Returns the new state (the change itself is applied on the next frame).
     """
     try:
         params = json.loads(request.body.decode())
@@ -605,13 +850,16 @@ def timer_cancel(request: Request):
 @server.route("/timer/state")
 def timer_state(request: Request):
     """
-    Get the current timer state.
+    Get the current timer state. Answers If-None-Match with a 304 while it's unchanged.
     """
     try:
-        if isinstance(tree.animation, Timer):
-            return Response(request, json.dumps(tree.animation.get_state()), content_type="application/json")
-        else:
-            return Response(request, json.dumps({"remaining": 0, "duration": 0, "state": "idle"}), content_type="application/json")
+        state = current_timer_state()
+        etag = timer_etag(state)
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        return Response(request, json.dumps(state), content_type="application/json",
+                        headers={"ETag": etag, "Cache-Control": "no-cache"})
     except Exception as e:
         return Response(request, f"Error: {str(e)}", status=400)
 
@@ -633,7 +881,7 @@ def inspect(request: Request, index: str):
     """Light a single LED and report its stored coordinate."""
     i = int(index)
     _inspect_light([i])
-    x, y, z = tree.coordinates[i]
+    x, y, z = tree.geometry[i]
     return Response(request, json.dumps({"index": i, "x": x, "y": y, "z": z}), content_type="application/json")
 
 @server.route("/inspect/range/<start>/<end>")
@@ -737,82 +985,166 @@ def reboot(request: Request):
     return Response(request, json.dumps({"message": "Rebooting"}), content_type="application/json")
 
 async def handle_requests():
+    idle = 0
     while True:
-        server.poll()
+        trace.begin(trace.HTTP_POLL)
+        try:
+            handled = server.poll() != NO_REQUEST
+        except Exception as e:
+            print(f"HTTP server error: {e}")
+            handled = False
+        trace.end(trace.HTTP_POLL)
+        if handled:
+            diagnostics.http_request()
         if _reboot_at is not None and time.monotonic() >= _reboot_at:
             import microcontroller
             print("Reboot requested via /reboot; resetting now")
+            saved_state.flush(time.monotonic())
             microcontroller.reset()
-        await asyncio.sleep(0)  # Yield control immediately to other tasks
+        if handled or server.busy:
+            idle = 0
+        else:
+            idle = min(HTTP_IDLE_MAX_S, idle * 2 if idle else HTTP_IDLE_MIN_S)
+        await asyncio.sleep(idle)
 
-async def handle_mqtt():
-    """Handle MQTT message loop."""
-    connection_retries = 0
-    max_retries = 5
+async def handle_live():
+    """Greet new web page connections and read their commands."""
+    while True:
+        try:
+            busy = live.poll()
+        except Exception as e:
+            print(f"Error polling WebSocket clients: {e}")
+            busy = False
+        await asyncio.sleep(0 if busy else 0.02)
+
+async def handle_stream():
+    """Show streamed pixel frames as their packets arrive.
 
+    Polls the UDP socket every couple of ms while a stream is live (a frame's
+    latency is at most one poll), and more lazily when idle.
+    """
     while True:
-        # Stand aside while a fade/sprout/drain is rendering: a blocking socket
-        # read on this single-threaded loop would stall the render mid-fade and
-        # make it visibly step. Fades are ~1s; incoming packets wait in the socket
-        # buffer and are picked up right after.
-        if tree.is_transitioning():
-            await asyncio.sleep(0.005)
-            continue
+        try:
+            busy = stream.poll()
+        except Exception as e:
+            print(f"Error handling pixel stream: {e}")
+            busy = False
+        if busy:
+            await asyncio.sleep(0)
+        else:
+            await asyncio.sleep(0.002 if stream.active else 0.02)
+
+async def handle_mqtt():
+    """Handle MQTT message loop.
 
+    Polls the non-blocking client (util/mqtt_client.py): each poll only handles
+    what has already arrived, within a small time budget, so this keeps running
+    through fades and commands are applied mid-sprout/drain. Connecting and
+    reconnecting (with backoff) happen inside poll() too, a step at a time, so a
+    broker outage never freezes the animation.
+    """
+    while True:
+        more = False
         try:
-            mqtt_client.loop(timeout=0.005)  # Must be >= socket_timeout (0.005s)
-            connection_retries = 0  # Reset retry counter on successful loop
+            trace.begin(trace.MQTT_LOOP)
+            started = time.monotonic_ns()
+            try:
+                more = mqtt_client.poll(MQTT_POLL_BUDGET_S)
+            finally:
+                diagnostics.mqtt_loop(time.monotonic_ns() - started)
+                trace.end(trace.MQTT_LOOP)
         except Exception as e:
             print(f"MQTT error: {e}")
-            connection_retries += 1
-
-            if connection_retries <= max_retries:
-                # Try to reconnect with exponential backoff
-                backoff_time = min(2 ** connection_retries, 30)  # Cap at 30 seconds
-                print(f"MQTT reconnection attempt {connection_retries}/{max_retries} in {backoff_time}s")
-                await asyncio.sleep(backoff_time)
-
-                try:
-                    mqtt_client.reconnect()
-                    print("MQTT reconnected successfully")
-                except Exception as reconnect_error:
-                    print(f"MQTT reconnection failed: {reconnect_error}")
-            else:
-                print("MQTT max retries exceeded, continuing with degraded functionality")
-                await asyncio.sleep(30)  # Wait longer before trying again
-                connection_retries = 0  # Reset counter for next batch of attempts
 
-        await asyncio.sleep(0.01)  # Short sleep to allow animation task to run frequently
+        # Send queued publishes: the latest per topic, unchanged ones skipped.
+        try:
+            more = drain_messages(MQTT_PUBLISH_BUDGET_S) or more
+        except Exception as e:
+            print(f"MQTT publish error: {e}")
+
+        # A budget ran out with work still waiting: yield, then come straight back.
+        await asyncio.sleep(0 if more else 0.01)
+
+async def settle_state_change(state_params):
+    """Submit a state change and wait for the tree to take it at a frame start."""
+    handle_state_change(state_params)
+    while tree.has_pending_command():
+        await asyncio.sleep(0.02)
 
 async def handle_boot():
     """Play the startup rainbow, then fade to the remembered setting.
 
     The rainbow fill is kicked off in main() so its first rendered frame is the
-    reveal. Once it finishes and holds, apply whatever state was deferred while it
-    played (the retained MQTT command, or nothing on a fresh/offline boot).
+    reveal. Once it finishes and holds, apply the saved state, then whatever was
+    deferred while it played (the retained MQTT command, or commands sent during
+    boot) on top of it, in the order they arrived.
     """
-    global _booting, _pending_restore
+    global _booting, _pending_restore, _restore_timer, _boot_changes, _unapplied_command
     while tree.is_transitioning():
         await asyncio.sleep(0.05)
     await asyncio.sleep(BOOT_HOLD_S)
 
     restore = _pending_restore
+    timer = _restore_timer
+    deferred = _boot_changes
+    # An HA command deferred here is only applied after the saved state.
+    command = _unapplied_command
     _pending_restore = None
+    _restore_timer = None
+    _boot_changes = []
+    _unapplied_command = None
     _booting = False
 
+    if restore is None and not deferred:
+        print("Boot: no remembered setting received; leaving the startup rainbow")
+        return
     if restore is not None:
         params = dict(restore)
-        # We're already on and showing the rainbow; drop a redundant ON so we
-        # crossfade to the remembered look instead of blanking and re-sprouting.
-        if params.get("state") == "ON":
-            del params["state"]
+        # We're already on and showing the rainbow: crossfade to the remembered look
+        # instead of blanking and re-sprouting, and only then drain if it was off.
+        power = params.pop("state", None)
         print(f"Boot: restoring remembered setting: {params}")
-        handle_state_change(params)
-    else:
-        print("Boot: no remembered setting received; leaving the startup rainbow")
+        if params:
+            await settle_state_change(params)
+        # A paused timer picks up where it was; a running one comes back idle, as
+        # there's no telling how long the tree was down.
+        if timer is not None and timer["state"] == "paused" and isinstance(tree.animation, Timer):
+            tree.animation.restore_paused(timer["remaining"])
+        if power == "OFF":
+            await settle_state_change({"state": "OFF"})
+    for params in deferred:
+        params = dict(params)
+        # An ON while already lit (the rainbow, or a lit saved state) would re-sprout.
+        if params.get("state") == "ON" and tree.is_on():
+            del params["state"]
+        if params:
+            print(f"Boot: applying deferred state change: {params}")
+            await settle_state_change(params)
+    if command is not None:
+        saved_state.note_command(command)
+    timeline.mark("restored")
+
+async def bring_up_dials():
+    """Find and set up the dials, and light them in calibration order."""
+    print("Initializing dials...")
+    timeline.begin("dials")
+    try:
+        await dials.start()
+        if dials.any_present:
+            await dials.calibrate()
+            # The dials' INT pins wired together to a board pin (e.g. "D5"): read the
+            # dials only when one has something to report. Without it, poll adaptively.
+            dial_int_pin = os.getenv("DIAL_INT_PIN")
+            if dial_int_pin:
+                dials.enable_interrupts(getattr(board, dial_int_pin))
+    except Exception as e:
+        print(f"Dial setup failed: {e}")
+    timeline.end("dials")
+    dials_ready.set()
 
 async def handle_encoders():
     """Poll the dials and dispatch turn/press interactions to the controller."""
+    await bring_up_dials()
     if not dials.any_present:
         print("No dials present; encoder task idle")
         return
@@ -823,10 +1155,37 @@ async def handle_encoders():
     controller.start()
     while True:
         try:
+            trace.begin(trace.DIALS_POLL)
             controller.poll()
         except Exception as e:
             print(f"Encoder poll error: {e}")
-        await asyncio.sleep(0.03)  # ~33Hz: responsive for dials, light on the loop
+        trace.end(trace.DIALS_POLL)
+        if controller.busy or time.monotonic() - controller.last_activity < DIAL_ACTIVE_S:
+            wait = DIAL_FAST_S
+        else:
+            wait = DIAL_INT_IDLE_S if dials.has_interrupt else DIAL_IDLE_S
+        dial_wake.clear()
+        try:
+            await asyncio.wait_for(dial_wake.wait(), wait)
+        except asyncio.TimeoutError:
+            pass
+
+async def watch_dial_interrupt():
+    """Wake the encoder task when a dial pulls the shared INT line low."""
+    await dials_ready.wait()
+    if not dials.has_interrupt:
+        return
+    while True:
+        if dials.interrupt_pending():
+            dial_wake.set()
+        await asyncio.sleep(DIAL_INT_CHECK_S)
+
+def _lift_brightness_cap():
+    """Let a capture use the full 0..1 hardware brightness it asks for: the output
+    stage otherwise clamps it to MAX_BRIGHTNESS. Returns the cap to put back."""
+    cap = tree.output.cap
+    tree.output.cap = 1.0
+    return cap
 
 async def run_capture(dur):
     """Play the binary-coded capture sequence (non-blocking via awaits)."""
@@ -834,6 +1193,7 @@ async def run_capture(dur):
     bits = _capture_bits()
     gap, marker = 0.4, 1.0
     prev_brightness = tree.string.brightness
+    prev_cap = _lift_brightness_cap()
     tree.pause()
     tree.cancel_transition()
     tree.string.brightness = _capture_bright
@@ -858,6 +1218,7 @@ async def run_capture(dur):
     fill((0, 0, 0)); await asyncio.sleep(0.4)
 
     tree.string.brightness = prev_brightness
+    tree.output.cap = prev_cap
     controller.set_mode(controller.mode)  # resume normal display
     print("Capture sequence complete")
 
@@ -865,6 +1226,7 @@ async def run_capture_singles(dur, gap, bright):
     """Light each LED alone, with an all-on marker every 10 LEDs (non-blocking)."""
     n = len(tree.string)
     prev_brightness = tree.string.brightness
+    prev_cap = _lift_brightness_cap()
     tree.pause()
     tree.cancel_transition()
     tree.string.brightness = bright
@@ -891,6 +1253,7 @@ async def run_capture_singles(dur, gap, bright):
     one(-1); await asyncio.sleep(0.4)
 
     tree.string.brightness = prev_brightness
+    tree.output.cap = prev_cap
     controller.set_mode(controller.mode)
     print("Singles capture complete")
 
@@ -925,80 +1288,163 @@ async def handle_watchdog():
             print(f"Watchdog feed error: {e}")
         await asyncio.sleep(1)
 
+async def handle_persist():
+    """Write the last applied state to NVM, when it changed (rate-limited)."""
+    while True:
+        try:
+            saved_state.poll(time.monotonic())
+        except Exception as e:
+            print(f"Error saving state: {e}")
+        await asyncio.sleep(1)
+
 async def handle_timer_updates():
-    """Handle periodic timer state updates via MQTT."""
+    """Keep the wall clock synced for the timer's end time (util/clock.py).
+
+    The timer publishes its own state on start/pause/resume/cancel/completion;
+    this only republishes a running timer once the clock first syncs, so its
+    end time goes out.
+    """
     while True:
         try:
-            if isinstance(tree.animation, Timer):
-                publish_message(MQTT_TIMER_STATE, tree.animation.get_state())
+            if clock.poll() and isinstance(tree.animation, Timer) and tree.animation.is_running:
+                tree.animation.publish_state()
         except Exception as e:
-            print(f"Error publishing timer state: {e}")
-        await asyncio.sleep(1)  # Update every second
+            print(f"Error syncing clock: {e}")
+        await asyncio.sleep(0.5)
 
 async def handle_availability_heartbeat():
-    """Send periodic availability heartbeat to maintain online status."""
+    """Send periodic availability heartbeat to maintain online status.
+
+    The diagnostic sensors ride the same 30 second cadence.
+    """
     while True:
         try:
             # Send availability heartbeat every 30 seconds
-            publish_message(MQTT_TOPIC_AVAILABILITY, "online", retain=True)
-            print("Sent availability heartbeat")
+            publish_message(MQTT_TOPIC_AVAILABILITY, "online", retain=True, force=True)
+            print("Queued availability heartbeat")
         except Exception as e:
             print(f"Error sending availability heartbeat: {e}")
+        try:
+            sample = diagnostics.sample(tree.frame_stats())
+            sample["dial_i2c_tps"] = dials.transaction_rate()
+            publish_message(MQTT_DIAGNOSTICS_STATE, sample)
+            publish_message(MQTT_STALLS_STATE, stalls.stats())
+        except Exception as e:
+            print(f"Error publishing diagnostics: {e}")
         await asyncio.sleep(30)
 
-async def main():
-    print("Starting server")
-    server.start(str(wifi.radio.ipv4_address), 7433)
-    print("Connecting to MQTT broker...")
+async def connect_wifi():
+    """Join WiFi, retrying with backoff until it works.
 
-    # Try to connect to MQTT with retries
-    mqtt_connected = False
-    for attempt in range(3):
+    With CIRCUITPY_WIFI_SSID / CIRCUITPY_WIFI_PASSWORD in settings.toml the
+    supervisor has usually joined before code.py starts, and this returns at once.
+    """
+    delay = 2
+    attempt = 0
+    while wifi.radio.ipv4_address is None:
+        attempt += 1
         try:
-            mqtt_client.connect()
-            mqtt_connected = True
-            print("Successfully connected to MQTT broker!")
-            break
+            watchdog.feed()
+            wifi.radio.connect(os.getenv("WIFI_SSID"), os.getenv("WIFI_PASSWORD"),
+                               timeout=WIFI_CONNECT_TIMEOUT_S)
         except Exception as e:
-            print(f"MQTT connection attempt {attempt + 1}/3 failed: {e}")
-            if attempt < 2:  # Don't sleep on the last attempt
-                await asyncio.sleep(2)
+            print(f"WiFi connection attempt {attempt} failed: {e}; retrying in {delay}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WIFI_RETRY_MAX_S)
+    print("Connected!", str(wifi.radio.ipv4_address))
+
+def start_mdns():
+    print("Starting mDNS...")
+    try:
+        mdns_name = os.getenv("MDNS_NAME")
+        mdns_server = mdns.Server(wifi.radio)
+        mdns_server.hostname = mdns_name
+        mdns_server.advertise_service(service_type="_http", protocol="_tcp", port=int(os.getenv("SERVER_PORT")))
+        print(f"mDNS started at {mdns_name}.local")
+    except Exception as e:
+        print(f"Failed to start mDNS: {e}")
+        print("Continuing without mDNS...")
 
-    if not mqtt_connected:
-        print("WARNING: Failed to connect to MQTT broker after 3 attempts")
-        print("Device will continue with degraded functionality (no Home Assistant integration)")
+async def bring_up_network():
+    """Join WiFi, then start everything that needs it, then serve HTTP.
 
-    # Network setup is done: arm the watchdog now. From here the feeder task keeps
-    # it alive, and recv_timeout bounds any single blocking network call below 10s.
+    Runs alongside rendering and the dials, so a slow access point or an absent
+    broker only delays the network side of the tree.
+    """
+    timeline.begin("wifi")
+    await connect_wifi()
+    timeline.end("wifi")
+    ip = str(wifi.radio.ipv4_address)
+
+    timeline.begin("mdns")
+    start_mdns()
+    timeline.end("mdns")
+
+    print("Starting server")
+    timeline.begin("http")
+    server.start(ip, 7433)
+    timeline.end("http")
+    # The MQTT connection is made by handle_mqtt's polls, a step at a time, so a
+    # slow or absent broker delays nothing here. Without one the tree keeps working
+    # (HTTP and dials), and the client keeps retrying with backoff.
+    print("Connecting to MQTT broker in the background...")
+    timeline.begin("mqtt")  # ends in mqtt_connect
+    mqtt_client.start()
+    # Wall-clock time (for the timer's end time) is fetched the same way.
+    clock.start(pool)
+    # Listen for realtime pixel frames (tools/ddp_send.py).
+    stream.start(ip)
+
+    print("Creating server task")
+    server_task = asyncio.create_task(stalls.track("server", handle_requests()))
+    await server_task
+
+async def main():
+    timeline.end("setup")
+    # Arm the watchdog first: from here the feeder task keeps it alive, and nothing
+    # blocks for longer than its timeout (see WIFI_CONNECT_TIMEOUT_S).
     watchdog.mode = WatchDogMode.RESET
     watchdog.feed()
 
-    print("Creating server task")
-    server_task = asyncio.create_task(handle_requests())
-    # Kick off the startup rainbow now (network setup is done, so its fill time
-    # isn't eaten by a blocking connect) so the animation task's first frame is the
-    # reveal rather than a stale sprout.
+    # Render first: kick off the startup rainbow and the animation task, and let it
+    # show its first frame before anything else gets a turn. WiFi, MQTT and the
+    # dials come up in their own tasks while it plays.
     print("Starting boot rainbow")
     tree.rainbow_fill(BOOT_FILL_S)
     print("Creating animation task")
-    animation_task = asyncio.create_task(tree.animate())
+    animation_task = asyncio.create_task(stalls.track("animation", tree.animate()))
+    await asyncio.sleep(0)
+    timeline.mark("first_light")
     print("Creating boot task")
-    boot_task = asyncio.create_task(handle_boot())
+    boot_task = asyncio.create_task(stalls.track("boot", handle_boot()))
     print("Creating encoder task")
-    encoder_task = asyncio.create_task(handle_encoders())
+    encoder_task = asyncio.create_task(stalls.track("encoders", handle_encoders()))
+    dial_int_task = asyncio.create_task(stalls.track("dial_int", watch_dial_interrupt()))
     print("Creating MQTT task")
-    mqtt_task = asyncio.create_task(handle_mqtt())
-    print("Creating timer updates task")
-    timer_task = asyncio.create_task(handle_timer_updates())
+    mqtt_task = asyncio.create_task(stalls.track("mqtt", handle_mqtt()))
+    print("Creating clock/timer task")
+    timer_task = asyncio.create_task(stalls.track("timer", handle_timer_updates()))
+    print("Creating state saving task")
+    persist_task = asyncio.create_task(stalls.track("persist", handle_persist()))
     print("Creating availability heartbeat task")
-    heartbeat_task = asyncio.create_task(handle_availability_heartbeat())
+    heartbeat_task = asyncio.create_task(stalls.track("heartbeat", handle_availability_heartbeat()))
     print("Creating capture task")
-    capture_task = asyncio.create_task(handle_capture())
+    capture_task = asyncio.create_task(stalls.track("capture", handle_capture()))
     print("Creating watchdog task")
-    watchdog_task = asyncio.create_task(handle_watchdog())
+    watchdog_task = asyncio.create_task(stalls.track("watchdog", handle_watchdog()))
+    print("Creating WebSocket task")
+    live_task = asyncio.create_task(stalls.track("live", handle_live()))
+    print("Creating pixel stream task")
+    stream_task = asyncio.create_task(stalls.track("stream", handle_stream()))
+    # Last, so every other task has taken its first step (the dials have been reset,
+    # say) before a WiFi connect attempt holds the loop.
+    print("Creating network task")
+    network_task = asyncio.create_task(stalls.track("network", bring_up_network()))
+    print("Creating stall monitor task")
+    stall_task = asyncio.create_task(stalls.run())
     print("Starting tasks")
     try:
-        await asyncio.gather(server_task, animation_task, boot_task, encoder_task, mqtt_task, timer_task, heartbeat_task, capture_task, watchdog_task)
+        await asyncio.gather(network_task, animation_task, boot_task, encoder_task, dial_int_task, mqtt_task, timer_task, persist_task, heartbeat_task, capture_task, watchdog_task, live_task, stream_task, stall_task)
     except Exception as e:
         print(f"Critical error in main loop: {e}")
         # Feed watchdog one more time before potentially restarting
@@ -4,6 +4,7 @@ import random
 
 from util.tree_animation import TreeAnimation
 from util.smoothed import Smoothed
+from util.palette import blossom
 
 TWO_PI = 2 * math.pi
 
@@ -16,20 +17,12 @@ BRANCH_COLOR = (255, 197, 143)  # warm white (~3000K)
 PINK = (255, 40, 110)           # bright, saturated pink
 
 
-def _lerp(a, b, f):
-    return (
-        int(a[0] + (b[0] - a[0]) * f),
-        int(a[1] + (b[1] - a[1]) * f),
-        int(a[2] + (b[2] - a[2]) * f),
-    )
-
-
 class CherryBlossom(TreeAnimation):
     """Trunk in brown, branches in warm white, with a fraction of branch LEDs
     gently twinkling pink (fading white<->pink, staggered out of phase)."""
 
-    def __init__(self, pixel_object, coordinates, speed, name, twinkle_speed=0.5, pink_fraction=0.4):
-        super().__init__(pixel_object=pixel_object, coordinates=coordinates, speed=speed, color=PINK, name=name)
+    def __init__(self, pixel_object, geometry, speed, name, twinkle_speed=0.5, pink_fraction=0.4):
+        super().__init__(pixel_object=pixel_object, geometry=geometry, speed=speed, color=PINK, name=name)
         self._twinkle_speed = Smoothed(twinkle_speed, tau=0.35)   # 0-1 -> fade rate
         self._pink_fraction = Smoothed(pink_fraction, tau=0.35)   # 0-1 of branch LEDs
         # Accumulate the twinkle phase incrementally so a speed change doesn't jump it.
@@ -38,15 +31,18 @@ class CherryBlossom(TreeAnimation):
 
         # Per-LED random rank (which branch LEDs turn pink as the fraction grows)
         # and a phase offset so the twinkles are staggered, not synchronized.
-        n = len(self._coordinates)
+        n = len(geometry)
         self._rank = [random.random() for _ in range(n)]
         self._phase = [random.uniform(0, TWO_PI) for _ in range(n)]
 
         # Trunk = the lowest TRUNK_LED_COUNT LEDs by height.
-        order = sorted(range(n), key=lambda i: self._coordinates[i][2])
-        self._is_trunk = [False] * n
-        for i in order[:TRUNK_LED_COUNT]:
-            self._is_trunk[i] = True
+        self._trunk = list(geometry.height_order()[:TRUNK_LED_COUNT])
+        trunk = set(self._trunk)
+        self._branches = [i for i in range(n) if i not in trunk]
+        self._pink = bytearray(n)  # 1 where the LED was last painted pink
+
+        # White->pink twinkle blend, looked up instead of lerped per LED.
+        self._blossom = blossom(BRANCH_COLOR, PINK)
 
     @property
     def twinkle_speed(self):
@@ -75,11 +71,47 @@ class CherryBlossom(TreeAnimation):
         self._wt = (self._wt + freq * TWO_PI * dt) % TWO_PI
         pink_fraction = self._pink_fraction.get()
 
-        for i in range(len(self._coordinates)):
-            if self._is_trunk[i]:
-                self.pixel_object[i] = TRUNK_COLOR
-            elif self._rank[i] < pink_fraction:
-                osc = (math.sin(self._wt + self._phase[i]) + 1) * 0.5
-                self.pixel_object[i] = _lerp(BRANCH_COLOR, PINK, osc)
+        # The trunk and the plain white branch LEDs never change, so only repaint
+        # them when something else drew over the frame (or a LED stops being pink);
+        # otherwise only the twinkling LEDs are written and marked dirty.
+        full = not self.owns_frame()
+        buf = self.pixel_object.buf  # util/framebuffer.py: write channel bytes directly
+        wt = self._wt
+        colors, scale = self._blossom.colors, self._blossom.last * 0.5
+        if full:
+            tr, tg, tb = TRUNK_COLOR
+            for i in self._trunk:
+                o = 3 * i
+                buf[o] = tr
+                buf[o + 1] = tg
+                buf[o + 2] = tb
+        br, bg, bb = BRANCH_COLOR
+        rank, phase, pink = self._rank, self._phase, self._pink
+        lo, hi = len(pink), -1
+        for i in self._branches:
+            o = 3 * i
+            if rank[i] < pink_fraction:
+                # sin in -1..1 -> blend index 0..last
+                c = colors[int((math.sin(wt + phase[i]) + 1) * scale)]
+                buf[o] = c >> 16
+                buf[o + 1] = (c >> 8) & 0xFF
+                buf[o + 2] = c & 0xFF
+                pink[i] = 1
+            elif full or pink[i]:
+                buf[o] = br
+                buf[o + 1] = bg
+                buf[o + 2] = bb
+                pink[i] = 0
             else:
-                self.pixel_object[i] = BRANCH_COLOR
+                continue
+            if i < lo:
+                lo = i
+            if i > hi:
+                hi = i
+
+        if full:
+            self.mark_dirty()
+        elif hi >= lo:
+            self.mark_dirty(lo, hi + 1)
+        else:
+            self.frame_unchanged()
@@ -1,13 +1,11 @@
 import time
 import math
 import random
-from colorsys import hsv_to_rgb
 
 from util.tree_animation import TreeAnimation
-from util.dither import put_dithered
+from util.palette import hue_wheel
 
 MAX_MODES = 5
-_GOLDEN = 0.6180339887498949  # low-discrepancy per-pixel dither offset
 _FOLLOW_TAU = 0.35            # seconds for a segment to ease onto its group's color
 
 
@@ -28,53 +26,37 @@ class HueShift(TreeAnimation):
     Colors never travel across the tree; each group melts in place. Every color
     change is eased, and switching modes re-groups without snapping — each segment
     keeps its current on-screen color and eases toward its new group's, so the
-    tree always transitions smoothly. Output is dithered so slow fades don't band
-    at low brightness.
+    tree always transitions smoothly. Output is dithered (`dither = True`, see
+    util/output.py) so slow fades don't band at low brightness.
 
     `shift_speed` (0-1) sets how fast the colors change.
     """
 
-    def __init__(self, pixel_object, coordinates, segments, speed, name, mode=1, shift_speed=0.5):
-        super().__init__(pixel_object=pixel_object, coordinates=coordinates, speed=speed, color=(255, 0, 0), name=name)
+    dither = True
+
+    def __init__(self, pixel_object, geometry, speed, name, mode=1, shift_speed=0.5):
+        super().__init__(pixel_object=pixel_object, geometry=geometry, speed=speed, color=(255, 0, 0), name=name)
         self.shift_speed = shift_speed  # 0-1, sampled when each group picks a new target
 
-        n = len(self._coordinates)
-        # Per-LED segment id: 0 = trunk, 1..4 = branches (parallel to coordinates).
-        self._seg = [int(segments[i]) if i < len(segments) else 0 for i in range(n)]
-        self._dither = [(i * _GOLDEN) % 1.0 for i in range(n)]
+        # Per-LED segment id: 0 = trunk, 1..4 = branches.
+        self._seg = geometry.segments
 
-        # Order the branch segment ids by their angle around the trunk axis so we
-        # can talk about "opposite" pairs (index i and i+2) regardless of how the
-        # segmentation happened to number them.
-        self._branch_order = self._order_branches()
+        # Branch segment ids ordered by their angle around the trunk axis, so we
+        # can talk about "opposite" pairs (index i and i+2).
+        self._branch_order = geometry.branch_order()
 
         # Per-segment currently-shown hue (index by segment id 0..4). This is the
         # continuity layer: it always eases toward its group's color, so nothing
         # snaps when a group's hue changes or when the mode re-groups segments.
         self._seg_disp = [0.0] * 5
+        self._seg_rgb = [(0, 0, 0)] * 5
+        self._wheel = hue_wheel()
         self._last = time.monotonic()
 
         self._mode = 0
         self._set_mode(mode, seed=True)
 
-    # ---- geometry -----------------------------------------------------
-
-    def _order_branches(self):
-        """Branch segment ids sorted by angle around the trunk's x-y centroid."""
-        n = len(self._coordinates)
-        trunk = [i for i in range(n) if self._seg[i] == 0]
-        ref = trunk if trunk else list(range(n))
-        tx = sum(self._coordinates[i][0] for i in ref) / len(ref)
-        ty = sum(self._coordinates[i][1] for i in ref) / len(ref)
-
-        branches = sorted({self._seg[i] for i in range(n) if self._seg[i] > 0})
-        angle = {}
-        for b in branches:
-            members = [i for i in range(n) if self._seg[i] == b]
-            cx = sum(self._coordinates[i][0] for i in members) / len(members)
-            cy = sum(self._coordinates[i][1] for i in members) / len(members)
-            angle[b] = math.atan2(cy - ty, cx - tx)
-        return sorted(branches, key=lambda b: angle[b])
+    # ---- grouping -----------------------------------------------------
 
     def _grouping_for(self, mode):
         """Map each segment id (0..4) to a group index for the given mode.
@@ -193,9 +175,17 @@ class HueShift(TreeAnimation):
             tgt = self._anchor[self._group_of[s]]
             self._seg_disp[s] = (self._seg_disp[s] + self._shortest(tgt - self._seg_disp[s]) * k) % 1.0
 
-        # 3. Paint every LED with its segment's current color.
-        px = self.pixel_object
-        seg, disp, dither = self._seg, self._seg_disp, self._dither
-        for i in range(len(seg)):
-            r, g, b = hsv_to_rgb(disp[seg[i]], 1.0, 1.0)
-            put_dithered(px, i, (int(r * 255), int(g * 255), int(b * 255)), dither[i])
+        # 3. Paint every LED with its segment's current color. There are only five
+        #    colors per frame, so look each up once (interpolated, so slow fades
+        #    stay smooth) rather than per LED.
+        rgb = self._seg_rgb
+        for s in range(5):
+            rgb[s] = self._wheel.sample(self._seg_disp[s])
+        buf = self.pixel_object.buf  # util/framebuffer.py: write channel bytes directly
+        o = 0
+        for s in self._seg:
+            r, g, b = rgb[s]
+            buf[o] = r
+            buf[o + 1] = g
+            buf[o + 2] = b
+            o += 3
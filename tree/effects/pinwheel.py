@@ -1,12 +1,9 @@
 import time
-import math
 import adafruit_led_animation.color as color
-from colorsys import hsv_to_rgb
 
 from util.tree_animation import TreeAnimation
 from util.smoothed import Smoothed
-
-TWO_PI = 2 * math.pi
+from util.palette import hue_wheel
 
 
 class Pinwheel(TreeAnimation):
@@ -18,22 +15,18 @@ class Pinwheel(TreeAnimation):
     seamless wrap); `rotation_speed` sets how fast it spins.
     """
 
-    def __init__(self, pixel_object, coordinates, speed, name, rotation_speed=0.5, repeats=1):
-        super().__init__(pixel_object=pixel_object, coordinates=coordinates, speed=speed, color=color.RAINBOW, name=name)
+    def __init__(self, pixel_object, geometry, speed, name, rotation_speed=0.5, repeats=1):
+        super().__init__(pixel_object=pixel_object, geometry=geometry, speed=speed, color=color.RAINBOW, name=name)
         self._rotation_speed = Smoothed(rotation_speed, tau=0.35)  # 0-1, smoothed
         self.repeats = repeats                  # color cycles around the circle
         # Accumulate the rotation offset incrementally so a speed change alters only
         # the future slope instead of jumping the whole offset (= elapsed * rate).
         self._offset = 0.0
         self._last = time.monotonic()
-
-        # Central vertical axis = centroid of the LEDs in the x-y plane.
-        xs = [c[0] for c in self._coordinates]
-        ys = [c[1] for c in self._coordinates]
-        cx = sum(xs) / len(xs)
-        cy = sum(ys) / len(ys)
-        # Precompute each LED's normalized angle (0-1) around that axis.
-        self._angle = [(math.atan2(c[1] - cy, c[0] - cx) / TWO_PI) % 1.0 for c in self._coordinates]
+        # Each LED's normalized angle (0-1) around the central vertical axis (the
+        # centroid of the LEDs in the x-y plane), shared via the geometry index.
+        self._angle = geometry.angle()
+        self._wheel = hue_wheel()
 
     @property
     def rotation_speed(self):
@@ -53,6 +46,14 @@ class Pinwheel(TreeAnimation):
         rot = self._rotation_speed.get()
         self._offset = (self._offset + (0.05 + rot * 0.45) * dt) % 1.0  # revolutions/sec
         reps = self.repeats
-        for i in range(len(self._coordinates)):
-            hue = (self._angle[i] * reps + self._offset) % 1.0
-            self.pixel_object[i] = [int(c * 255) for c in hsv_to_rgb(hue, 1.0, 1.0)]
+        offset = self._offset
+        buf = self.pixel_object.buf  # util/framebuffer.py: write channel bytes directly
+        colors, size = self._wheel.colors, self._wheel.size
+        o = 0
+        for a in self._angle:
+            hue = (a * reps + offset) % 1.0
+            c = colors[int(hue * size) % size]
+            buf[o] = c >> 16
+            buf[o + 1] = (c >> 8) & 0xFF
+            buf[o + 2] = c & 0xFF
+            o += 3
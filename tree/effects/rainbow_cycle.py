@@ -1,14 +1,13 @@
 import time
 import adafruit_led_animation.color as color
 
-from colorsys import hsv_to_rgb
-
 from util.tree_animation import TreeAnimation
 from util.smoothed import Smoothed
+from util.palette import hue_wheel
 
 class RainbowCycle(TreeAnimation):
-    def __init__(self, pixel_object, coordinates, speed, frequency, name, bandwidth=1.0):
-        super().__init__(pixel_object=pixel_object, coordinates=coordinates, speed=speed, color=color.RAINBOW, name=name)
+    def __init__(self, pixel_object, geometry, speed, frequency, name, bandwidth=1.0):
+        super().__init__(pixel_object=pixel_object, geometry=geometry, speed=speed, color=color.RAINBOW, name=name)
         # Scroll rate (cycles/sec) and how many color cycles span the tree height.
         # Both are smoothed so dial/HA changes glide instead of snapping.
         self._frequency = Smoothed(frequency, tau=0.35)
@@ -17,6 +16,7 @@ class RainbowCycle(TreeAnimation):
         # so a rate change only alters the future slope — it can't jump the phase.
         self._phase = 0.0
         self._last = time.monotonic()
+        self._wheel = hue_wheel()
 
     @property
     def frequency(self):
@@ -44,10 +44,15 @@ class RainbowCycle(TreeAnimation):
         freq = self._frequency.get()
         bw = self._bandwidth.get()
         self._phase = (self._phase + freq * dt) % 1.0
-
-        z_min, z_max = self._bounds[2]
-        span = (z_max - z_min) or 1
-        for i, coord in enumerate(self._coordinates):
-            z = (coord[2] - z_min) / span
-            hue = (z * bw - self._phase) % 1.0
-            self.pixel_object[i] = [int(c * 255) for c in hsv_to_rgb(hue, 1.0, 1.0)]
+        phase = self._phase
+
+        buf = self.pixel_object.buf  # util/framebuffer.py: write channel bytes directly
+        colors, size = self._wheel.colors, self._wheel.size
+        o = 0
+        for z in self._geometry.height():
+            hue = (z * bw - phase) % 1.0
+            c = colors[int(hue * size) % size]
+            buf[o] = c >> 16
+            buf[o + 1] = (c >> 8) & 0xFF
+            buf[o + 2] = c & 0xFF
+            o += 3
@@ -6,29 +6,29 @@ Infinity = float('inf')
 
 class Sweep(TreeAnimation):
 
-  def __init__(self, pixel_object, coordinates, color, speed, lead, lag, name, step=2, axes=[Axis.X, Axis.Y, Axis.Z]):
-    super().__init__(pixel_object=pixel_object, coordinates=coordinates, speed=speed, color=color, name=name)
+  def __init__(self, pixel_object, geometry, color, speed, lead, lag, name, step=2, axes=[Axis.X, Axis.Y, Axis.Z]):
+    super().__init__(pixel_object=pixel_object, geometry=geometry, speed=speed, color=color, name=name)
 
     self.axes = axes
     self.step = max(step, 1)
     self.lead = self._clamp(lead, 1, Infinity)
     self.lag = self._clamp(lag, 1, Infinity)
     self._bounds = [[x - self.lead, y + self.lag] for x, y in self._bounds]
-    self._colors = [BLACK for _ in self._coordinates]
+    self._colors = [BLACK for _ in range(len(geometry))]
 
     self.reset()
 
   def draw(self):
-    coordinates = self._coordinates
     axis = self._axis
+    column = self._geometry.axis(axis)
     location = self._location
     lead = self.lead
     lag = self.lag
     base_color = self._color
     pixels = self.pixel_object
 
-    for i in range(len(coordinates)):
-        diff = coordinates[i][axis] - location
+    for i in range(len(column)):
+        diff = column[i] - location
 
         # Scale cleanup window with step size to ensure we catch all pixels
         cleanup_window = max(5, self.step + 2)
@@ -2,24 +2,26 @@ import time
 import math
 import json
 import adafruit_led_animation.color as color
-from colorsys import hsv_to_rgb
 from util.tree_animation import TreeAnimation
+from util.palette import hue_wheel, timer_ramp, unpack
 from util.mqtt import publish_message, MQTT_TIMER_STATE
+from util import clock
 
 class Timer(TreeAnimation):
     _duration = 300  # Default 5 minutes (class variable for storing default)
+    on_state = None  # fn(state) also told of each published change; set by code.py
 
-    def __init__(self, pixel_object, coordinates, speed, duration, name):
+    def __init__(self, pixel_object, geometry, speed, duration, name):
         """Initialize the timer effect.
 
         Args:
             pixel_object: The NeoPixel object
-            coordinates: List of (x,y,z) coordinates for each LED
+            geometry: The tree's util.geometry.GeometryIndex
             speed: Animation speed
             duration: Timer duration in seconds
             name: Name of the effect
         """
-        super().__init__(pixel_object=pixel_object, coordinates=coordinates, speed=speed, color=color.GREEN, name=name)
+        super().__init__(pixel_object=pixel_object, geometry=geometry, speed=speed, color=color.GREEN, name=name)
         self.duration = duration or self._duration
         self._duration = self.duration  # Store for future instances
         self.fade_duration = self.duration * 0.05  # 5% of timer duration
@@ -35,7 +37,20 @@ class Timer(TreeAnimation):
         self.last_fill_height = None
         self.fade_start_times = {}  # Dictionary to track when each LED starts fading
         self.was_lit = set()  # Track which LEDs were lit in previous frame
-        self._last_state_update = 0  # Track when we last published state
+        # The frame on the strand is a still one: the idle dark frame, or the full
+        # completion rainbow held between waves. Kept apart so leaving one for the
+        # other always redraws.
+        self._idle_shown = False
+        self._hold_shown = False
+        self._ramp = timer_ramp()  # countdown color by remaining fraction
+        # Completion rainbow: each LED's color is fixed by its height, so look it up
+        # once. Bottom is cyan (0.5), wrapping through blue, purple, red, orange and
+        # yellow to green (0.33) — 0.83 of the color wheel.
+        wheel = hue_wheel()
+        self._completion_frame = bytearray(3 * len(geometry))
+        for i, h in enumerate(geometry.height()):
+            c = wheel.at(0.5 + (h * 0.83) % 1.0)
+            self._completion_frame[3 * i:3 * i + 3] = bytes((c >> 16, (c >> 8) & 0xFF, c & 0xFF))
 
     def get_state(self):
         """Get the current state of the timer.
@@ -45,20 +60,24 @@ class Timer(TreeAnimation):
                 - remaining: seconds remaining (or 0 if not running)
                 - duration: total duration in seconds
                 - state: "active", "idle", or "paused" (HA standard states)
+                - ends_at: ISO 8601 UTC time the running timer ends, else None
+                  (also None until the wall clock has synced, see util/clock.py)
         """
         if self.is_paused:
             remaining = self.duration - self.elapsed_at_pause
             return {
                 "remaining": int(remaining),
                 "duration": self.duration,
-                "state": "paused"
+                "state": "paused",
+                "ends_at": None
             }
 
         if not self.is_running:
             return {
                 "remaining": 0,
                 "duration": self.duration,
-                "state": "idle"
+                "state": "idle",
+                "ends_at": None
             }
 
         elapsed = time.monotonic() - self.start_time
@@ -67,9 +86,22 @@ class Timer(TreeAnimation):
         return {
             "remaining": int(remaining),
             "duration": self.duration,
-            "state": "active"
+            "state": "active",
+            "ends_at": clock.iso(clock.now() + int(remaining + 0.5)) if clock.synced() else None
         }
 
+    def publish_state(self):
+        """Publish the timer state. Only called when it changes (start, pause,
+        resume, cancel, duration, completion): while running, HA counts down to
+        `ends_at` itself."""
+        try:
+            state = self.get_state()
+            publish_message(MQTT_TIMER_STATE, state)
+            if Timer.on_state is not None:
+                Timer.on_state(state)
+        except Exception as e:
+            print(f"Error publishing timer state: {e}")
+
     def _get_pulse_brightness(self, z, z_max, z_min, fill_height):
         """Calculate brightness for pulse wave effect."""
         # Wave moves down every 2.5 seconds (1.5s for wave + 1s pause at bottom)
@@ -143,11 +175,7 @@ class Timer(TreeAnimation):
         self.resume()
 
         # Publish initial state
-        try:
-            publish_message(MQTT_TIMER_STATE, self.get_state())
-            self._last_state_update = time.monotonic()
-        except Exception as e:
-            print(f"Error publishing timer state: {e}")
+        self.publish_state()
 
     def resume(self):
         """Resume the timer from paused state."""
@@ -156,11 +184,7 @@ class Timer(TreeAnimation):
             pause_duration = time.monotonic() - self.pause_time
             self.start_time += pause_duration
             self.is_paused = False
-            try:
-                publish_message(MQTT_TIMER_STATE, self.get_state())
-                self._last_state_update = time.monotonic()
-            except Exception as e:
-                print(f"Error publishing timer state: {e}")
+            self.publish_state()
 
         # Always call parent class resume method to ensure animation is unfrozen
         super().resume()
@@ -172,11 +196,7 @@ class Timer(TreeAnimation):
         self.fade_duration = duration * 0.05  # 5% of timer duration
         # If timer is not running, publish the new state
         if not self.is_running:
-            try:
-                publish_message(MQTT_TIMER_STATE, self.get_state())
-                self._last_state_update = time.monotonic()
-            except Exception as e:
-                print(f"Error publishing timer state: {e}")
+            self.publish_state()
 
     def pause(self):
         """Pause the timer."""
@@ -186,11 +206,19 @@ class Timer(TreeAnimation):
             self.elapsed_at_pause = time.monotonic() - self.start_time
             # Call parent class pause method
             self.freeze()
-            try:
-                publish_message(MQTT_TIMER_STATE, self.get_state())
-                self._last_state_update = time.monotonic()
-            except Exception as e:
-                print(f"Error publishing timer state: {e}")
+            self.publish_state()
+
+    def restore_paused(self, remaining):
+        """Come back paused with `remaining` seconds left (a timer saved at shutdown)."""
+        now = time.monotonic()
+        self.elapsed_at_pause = max(0, self.duration - remaining)
+        self.start_time = now - self.elapsed_at_pause
+        self.pause_time = now
+        self.is_running = True
+        self.is_paused = True
+        self.completion_start = None
+        self.freeze()
+        self.publish_state()
 
     def cancel(self):
         """Cancel the timer."""
@@ -202,26 +230,27 @@ class Timer(TreeAnimation):
         self.completion_start = None
         # Call parent class pause method to stop animation
         self.freeze()
-        try:
-            publish_message(MQTT_TIMER_STATE, self.get_state())
-            self._last_state_update = time.monotonic()
-        except Exception as e:
-            print(f"Error publishing timer state: {e}")
+        self.publish_state()
 
     def draw(self):
         if not self.is_running:
             if self.completion_start is not None:
                 self._draw_completion_effect()
+            elif self.owns_frame() and self._idle_shown:
+                self.frame_unchanged()  # idle: the dark frame is already up
             else:
                 self.pixel_object.fill(color.BLACK)
+                self.pixel_object.owner = self
+                self._idle_shown = True
+                self._hold_shown = False
             return
+        self.owns_frame()
+        self._idle_shown = self._hold_shown = False
 
         elapsed = time.monotonic() - self.start_time
         remaining = max(0, self.duration - elapsed)
         progress = remaining / self.duration
 
-        # NOTE: Removed MQTT publishing from draw() to prevent blocking during animation
-        # State updates are now handled by the main loop polling get_state() periodically
 
         # Get z-coordinate bounds
         z_min, z_max = self._bounds[2]
@@ -230,23 +259,12 @@ class Timer(TreeAnimation):
         # Calculate the current fill level
         fill_height = z_min + (z_range * progress)
 
-        # Smooth color transitions between green->yellow->red
-        if progress > 0.5:
-            # Fade from green (0.33) to yellow (0.17) between 100% and 50%
-            t = (progress - 0.5) * 2  # t goes from 0 to 1
-            hue = 0.17 + (t * 0.16)   # interpolate between 0.17 and 0.33
-        elif progress > 0.2:
-            # Fade from yellow (0.17) to red (0.0) between 50% and 20%
-            t = (progress - 0.2) / 0.3  # t goes from 0 to 1
-            hue = t * 0.17  # interpolate between 0.0 and 0.17
-        else:
-            # Stay red
-            hue = 0.0
-
-        # Convert current color to RGB once
-        current_rgb = [int(c * 255) for c in hsv_to_rgb(hue, 1.0, 1.0)]
+        # Smooth color transitions green->yellow->red (see util/palette.timer_ramp)
+        r, g, b = unpack(self._ramp.at(progress))
 
-        for i, (x, y, z) in enumerate(self._coordinates):
+        buf = self.pixel_object.buf  # util/framebuffer.py: write channel bytes directly
+        for i, z in enumerate(self._geometry.z):
+            o = 3 * i
             # Get fade-out brightness for this LED
             fade_brightness = self._get_fadeout_brightness(i, z, fill_height)
 
@@ -258,9 +276,16 @@ class Timer(TreeAnimation):
 
                 # Combine fade and pulse brightness
                 final_brightness = fade_brightness * pulse_brightness
-                self.pixel_object[i] = [int(c * final_brightness) for c in current_rgb]
+                if final_brightness >= 1.0:
+                    buf[o] = r
+                    buf[o + 1] = g
+                    buf[o + 2] = b
+                else:
+                    buf[o] = int(r * final_brightness)
+                    buf[o + 1] = int(g * final_brightness)
+                    buf[o + 2] = int(b * final_brightness)
             else:
-                self.pixel_object[i] = color.BLACK
+                buf[o] = buf[o + 1] = buf[o + 2] = 0
 
         # Store current fill height for next frame
         self.last_fill_height = fill_height
@@ -269,7 +294,7 @@ class Timer(TreeAnimation):
         if remaining <= 0:
             self.is_running = False
             self.completion_start = time.monotonic()
-            # Let the main loop handle state publishing instead of doing it here
+            self.publish_state()  # only queues (util/mqtt.py); sent by the MQTT task
 
     def _draw_completion_effect(self):
         """Draw a continuous rainbow wave moving up the tree, pausing when fully lit."""
@@ -280,27 +305,31 @@ class Timer(TreeAnimation):
         # Complete cycle is 3 seconds: 2s for wave + 1s pause
         cycle_time = elapsed % 3.0
 
+        frame = self._completion_frame
+        buf = self.pixel_object.buf
+        owned = self.owns_frame()
         if cycle_time >= 2.0:
-            # During pause, keep tree fully illuminated
-            for i, (x, y, z) in enumerate(self._coordinates):
-                # Map height to hue: bottom is cyan (0.5), wraps through blue, purple, red, orange, yellow to green (0.33)
-                # This gives us 0.83 of the color wheel to work with
-                hue = 0.5 + ((z - z_min) / z_range * 0.83) % 1.0
-                rgb = [int(c * 255) for c in hsv_to_rgb(hue, 1.0, 1.0)]
-                self.pixel_object[i] = rgb
+            # During pause, keep tree fully illuminated (one write, then unchanged)
+            if owned and self._hold_shown:
+                self.frame_unchanged()
+            else:
+                buf[:] = frame
+                self._hold_shown = True
         else:
+            self._hold_shown = False
             # During wave animation
             wave_position = (cycle_time * z_range / 2.0)
             wave_height = z_min + wave_position
 
-            for i, (x, y, z) in enumerate(self._coordinates):
+            for i, z in enumerate(self._geometry.z):
+                o = 3 * i
                 if z <= wave_height:
-                    # Map height to hue: bottom is cyan (0.5), wraps through blue, purple, red, orange, yellow to green (0.33)
-                    hue = 0.5 + ((z - z_min) / z_range * 0.83) % 1.0
-                    rgb = [int(c * 255) for c in hsv_to_rgb(hue, 1.0, 1.0)]
-                    self.pixel_object[i] = rgb
+                    buf[o] = frame[o]
+                    buf[o + 1] = frame[o + 1]
+                    buf[o + 2] = frame[o + 2]
                 else:
-                    self.pixel_object[i] = color.BLACK
+                    buf[o] = buf[o + 1] = buf[o + 2] = 0
+        self._idle_shown = False
 
     @classmethod
     def get_duration(cls):
@@ -1,6 +1,5 @@
 import board
 import neopixel
-import asyncio
 from colorsys import hsv_to_rgb
 
 import adafruit_led_animation.color as color
@@ -12,6 +11,12 @@ from effects.cherry_blossom import CherryBlossom
 from effects.pinwheel import Pinwheel
 from effects.hue_shift import HueShift
 from util.transition import Transition
+from util.geometry import GeometryIndex
+from util.framebuffer import FrameBuffer
+from util.output import Output
+from util.scheduler import FrameScheduler
+from util import trace
+from util import binproto
 
 # Default transition durations (seconds). None passed to a setter uses these;
 # pass 0 for an instant, snap change (used by the high-frequency dial handlers so
@@ -21,6 +26,15 @@ SPROUT_S = 1.2    # turning on: light sprouts from the bottom up
 DRAIN_S = 1.0     # turning off: light drains from the branches down the trunk
 SPREAD = 0.75     # fraction of a sprout/drain that is spatially staggered
 
+# Frame periods (seconds) the render loop paces itself to; see util/scheduler.py.
+# Fades are subtle, so they run fast: at ~30fps a sprout only gets a handful of
+# frames per pixel and the steps are visible. Position is time-based, so a higher
+# rate just means finer, smoother steps. ~30fps is plenty for LED animations, and
+# an idle tree only needs to notice new work.
+FADE_PERIOD = 1 / 60
+ANIMATE_PERIOD = 1 / 30
+IDLE_PERIOD = 0.3
+
 # The 0-255 HA/API brightness maps onto 0..MAX_BRIGHTNESS of the NeoPixel hardware
 # range. The cap bounds current draw (and limits the color distortion/voltage droop
 # a 100-LED strand shows at full drive); a higher cap also means more distinct output
@@ -36,6 +50,11 @@ SPREAD = 0.75     # fraction of a sprout/drain that is spatially staggered
 #   scratch/power_budget.py. Lower this if the strand ever browns out the board.
 MAX_BRIGHTNESS = 0.30
 
+# Gamma applied by the output stage (util/output.py) on top of brightness: None for
+# the linear response the strand has always had, ~2.2 for a perceptual curve
+# (darker low end, so dim colors and slow fades look more even).
+GAMMA = None
+
 class Position:
   LEFT = 0
   CENTER = 1
@@ -45,14 +64,26 @@ class Tree:
   EFFECTS = ["hue_shift", "rainbow_cycle", "cherry_blossom", "pinwheel", "timer"]
 
   def __init__(self):
-    self.string = neopixel.NeoPixel(board.A1, 100, brightness=0.2, auto_write=False, pixel_order=neopixel.RGB)
-    self.coordinates = self.read_coordinates()
-    self.segments = self.read_segments()
-    self._z_order = None  # pixel indices sorted bottom-to-top, computed on demand
+    self.strand = neopixel.NeoPixel(board.A1, 100, brightness=1.0, auto_write=False, pixel_order=neopixel.RGB)
+    # Brightness, the cap and gamma are applied by a lookup table on the way out;
+    # the strand's own brightness stays at 1.0 (see util/output.py).
+    self.output = Output(self.strand, cap=MAX_BRIGHTNESS, gamma=GAMMA, brightness=0.2)
+    # Everything renders into this byte buffer; show() blits it to the strand in one
+    # go (see util/framebuffer.py). It speaks the NeoPixel API for casual callers.
+    self.string = FrameBuffer(self.output)
+    # LED positions, segmentation and derived features, built once and shared by
+    # every effect (see util/geometry.py).
+    self.geometry = GeometryIndex.load('coordinates.csv', 'segments.csv')
     self._sprout_delays = None  # per-pixel wavefront delays (bottom-up), computed on demand
     self._drain_delays = None   # per-pixel wavefront delays (top-down), computed on demand
     self.animation = None
+    self._solid = False         # showing a set_color() color; any animation is paused under it
     self._transition = None     # active Transition, stepped by animate()
+    self._pending_command = None  # merged state change for the next frame (see submit())
+    self._stream = None           # external pixel source holding the buffer (see util/stream.py)
+    self._stream_resume = False   # whether to resume the animation when the stream ends
+    self.command_handler = None   # fn(params) that applies a state change; set by code.py
+    self._scheduler = FrameScheduler(IDLE_PERIOD)  # paces animate() to frame deadlines
     self._power_listeners = []  # fn(on) called when the tree powers on/off
     self._is_on = True          # logical power state (independent of mid-fade brightness)
     self._on_brightness = 0.2   # hardware brightness (0..MAX_BRIGHTNESS) to restore when on
@@ -89,6 +120,7 @@ class Tree:
     blank) at the on-brightness, revealing them low-to-high along the z axis. Pass
     duration=0 to snap on instantly.
     """
+    self._take_buffer()
     self._is_on = True
     self._notify_power(True)
     if self.animation:
@@ -99,7 +131,7 @@ class Tree:
     dur = SPROUT_S if duration is None else duration
 
     # Snapshot the colors to reveal before we blank the buffer for the sprout.
-    if all(self.string[i] == (0, 0, 0) for i in range(len(self.string))):
+    if not any(self.string.buf):
       target_pixels = (51, 51, 51)  # blank buffer -> default 20% white
       report = (51, 51, 51)
     else:
@@ -135,6 +167,7 @@ class Tree:
     — the colors don't move, the tree just fills in bottom-to-top like the normal
     sprout. Used as the power-on boot effect before the remembered setting fades in.
     """
+    self._take_buffer()
     self._is_on = True
     if self.animation:
       self.pause()
@@ -144,7 +177,7 @@ class Tree:
 
     # Target color per pixel: hue 0.0 (red) at the lowest LED climbing to 0.83
     # (purple) at the top, ranked by height so the gradient is even across LEDs.
-    order = self._height_order()
+    order = self.geometry.height_order()
     n = len(order)
     target_pixels = [(0, 0, 0)] * n
     for rank, idx in enumerate(order):
@@ -166,6 +199,7 @@ class Tree:
     Preserves the current colors in the buffer (invisible at brightness 0) so the
     next on() re-reveals them. Pass duration=0 to snap off instantly.
     """
+    self._take_buffer()
     self._is_on = False
     self._notify_power(False)
     if self.animation:
@@ -203,7 +237,9 @@ class Tree:
 
   def set_color(self, color, duration=None):
     """Crossfade the whole strand to a uniform color. Pass duration=0 to snap."""
+    self._take_buffer()
     self.pause()
+    self._solid = True
     dur = FADE_S if duration is None else duration
 
     if dur <= 0 or not self._is_on:
@@ -226,21 +262,16 @@ class Tree:
     tree's non-uniform vertical LED spacing (ranking by z, not a z threshold).
     Stops any running animation so the fill stays put until the timer starts.
     """
+    self._take_buffer()
     self.pause()
     self._transition = None
-    order = self._height_order()
+    order = self.geometry.height_order()
     n = max(0, min(int(n), len(order)))
     self.string.fill((0, 0, 0))
     for idx in order[:n]:
       self.string[idx] = color
     self.string.show()
 
-  def _height_order(self):
-    """Pixel indices sorted bottom-to-top by z height; computed once."""
-    if self._z_order is None:
-      self._z_order = sorted(range(len(self.coordinates)), key=lambda i: self.coordinates[i][2])
-    return self._z_order
-
   def _reveal_delays(self, reverse):
     """Per-pixel wavefront delays (0..1) for a sprout/drain, keyed by z height.
 
@@ -252,12 +283,8 @@ class Tree:
     if not reverse and self._sprout_delays is not None:
       return self._sprout_delays
 
-    order = self._height_order()
-    n = len(order)
-    delays = [0.0] * n
-    for rank, idx in enumerate(order):
-      u = rank / (n - 1) if n > 1 else 0.0
-      delays[idx] = (1.0 - u) if reverse else u
+    rank = self.geometry.height_rank()
+    delays = [(1.0 - u) if reverse else u for u in rank]
 
     if reverse:
       self._drain_delays = delays
@@ -315,6 +342,7 @@ class Tree:
       self.set_animation(self.EFFECTS[next])
 
   def set_animation(self, effect, params=None):
+    self._take_buffer()
     self.pause()
     self._transition = None  # an animation owns the buffer; drop any color fade
     self.animation = self.load_effect(effect, params or {})
@@ -324,6 +352,37 @@ class Tree:
     if self.animation:
       self.animation.freeze()
 
+  def start_stream(self, source):
+    """Hand the frame buffer to an external pixel stream (util/stream.py).
+
+    The animation is frozen and any fade dropped; `source` writes and shows frames
+    itself until end_stream(), or until a local change takes the buffer back.
+    """
+    if self._stream is None:
+      self._transition = None
+      self._stream_resume = self.animation is not None and not self.animation.frozen
+      self.pause()
+    self._stream = source
+
+  def end_stream(self):
+    """The stream stopped: resume the animation it interrupted."""
+    if self._stream is None:
+      return
+    self._stream = None
+    self.string.owner = None  # the animation must repaint the whole frame
+    self.string.mark_all()
+    if self._stream_resume:
+      self.resume()
+
+  def is_streaming(self):
+    return self._stream is not None
+
+  def _take_buffer(self):
+    """A local change (command, dial) ends any pixel stream; it's not resumed."""
+    if self._stream is not None:
+      self._stream.preempt()
+      self._stream = None
+
   def cancel_transition(self):
     """Drop any in-flight fade so a caller can take over the buffer immediately."""
     self._transition = None
@@ -331,14 +390,14 @@ class Tree:
   def is_transitioning(self):
     """Whether a fade/sprout/drain is currently rendering.
 
-    asyncio is cooperative and single-threaded, so any task that blocks (notably
-    the MQTT socket read) stalls the render loop mid-fade and makes the fade step.
-    The MQTT task uses this to stand aside for the ~1s a transition takes.
+    The boot sequence uses this to wait out the startup rainbow's fill before it
+    restores the remembered setting.
     """
     return self._transition is not None
 
   def resume(self):
     if self.animation:
+      self._solid = False
       self.animation.resume()
 
   def set_speed(self, speed: float):
@@ -394,6 +453,24 @@ class Tree:
     elif isinstance(self.animation, Pinwheel):
       self.animation.repeats = 1 + int(round(value * 3))     # 1..4 arms
 
+  def _speed_value(self):
+    """The current effect speed as set_speed() took it, 0..1.
+
+    set_speed() maps it onto each effect's own rate and pins the frame `speed` at
+    0.01, so it's read back from there (the inverse of each mapping)."""
+    a = self.animation
+    if isinstance(a, RainbowCycle):
+      return (a.frequency - 0.1) / 1.9
+    elif isinstance(a, Sweep):
+      return (a.step - 1) / 9
+    elif isinstance(a, CherryBlossom):
+      return a.twinkle_speed
+    elif isinstance(a, Pinwheel):
+      return a.rotation_speed
+    elif isinstance(a, HueShift):
+      return a.shift_speed
+    return a.speed
+
   def _param_value(self):
     """The current secondary parameter normalized to 0..1 (0.5 if the effect has none)."""
     a = self.animation
@@ -410,33 +487,75 @@ class Tree:
   def load_effect(self, effect_name: str, params=None):
       params = params or {}
       if effect_name == 'hue_shift':
-          return HueShift(self.string, self.coordinates, self.segments, speed=0.01, name='hue_shift', mode=1, shift_speed=0.5)
+          return HueShift(self.string, self.geometry, speed=0.01, name='hue_shift', mode=1, shift_speed=0.5)
       elif effect_name == 'rainbow_cycle':
           # Start with medium speed (frequency = 1.0)
-          return RainbowCycle(self.string, self.coordinates, speed=0.01, frequency=1.0, name='rainbow_cycle')
+          return RainbowCycle(self.string, self.geometry, speed=0.01, frequency=1.0, name='rainbow_cycle')
       elif effect_name == "sweep":
           # Start with medium speed (step = 5, lag = 80)
-          return Sweep(self.string, coordinates=self.coordinates, color=color.BLUE, speed=0.01, lead=20, lag=80, step=5, name='sweep')
+          return Sweep(self.string, geometry=self.geometry, color=color.BLUE, speed=0.01, lead=20, lag=80, step=5, name='sweep')
       elif effect_name == "cherry_blossom":
-          return CherryBlossom(self.string, self.coordinates, speed=0.01, name='cherry_blossom', twinkle_speed=0.5, pink_fraction=0.4)
+          return CherryBlossom(self.string, self.geometry, speed=0.01, name='cherry_blossom', twinkle_speed=0.5, pink_fraction=0.4)
       elif effect_name == "pinwheel":
-          return Pinwheel(self.string, self.coordinates, speed=0.01, name='pinwheel', rotation_speed=0.5, repeats=1)
+          return Pinwheel(self.string, self.geometry, speed=0.01, name='pinwheel', rotation_speed=0.5, repeats=1)
       elif effect_name == "timer":
           # Default 5 minute timer if not specified
           duration = int(params.get('duration', 300))
-          timer = Timer(self.string, self.coordinates, speed=0.01, duration=duration, name='timer')
+          timer = Timer(self.string, self.geometry, speed=0.01, duration=duration, name='timer')
           # Don't auto-start the timer - let it be started explicitly
           return timer
       else:
           raise ValueError(f"Unknown effect: {effect_name}")
 
+  def submit(self, params):
+    """Queue a state change (HA/API fields) to apply at the start of the next frame.
+
+    Changes arriving before then are merged, last writer wins per field, so a
+    burst (a dragged slider, an HA automation) costs one `command_handler` call
+    (one transition setup, one state publish) per frame instead of one per
+    message. A color replaces a queued effect and vice versa, a new effect drops
+    the old effect's params, and an OFF drops anything queued before it.
+    """
+    pending = self._pending_command
+    if pending is None or params.get("state") == "OFF":
+      pending = self._pending_command = {}
+    if "effect" in params:
+      pending.pop("color", None)
+      pending.pop("effect_params", None)
+    elif "color" in params:
+      pending.pop("effect", None)
+      pending.pop("effect_params", None)
+    pending.update(params)
+
+  def has_pending_command(self):
+    """Whether a submitted change is waiting for the next frame."""
+    return self._pending_command is not None
+
+  def _apply_command(self):
+    command = self._pending_command
+    self._pending_command = None
+    if self.command_handler is None:
+      return
+    try:
+      self.command_handler(command)
+    except Exception as e:
+      print(f"Error applying state change {command}: {e}")
+
   async def animate(self):
+    scheduler = self._scheduler
     while True:
+      scheduler.begin()
+      trace.begin(trace.FRAME)
+      if self._pending_command is not None:
+        self._apply_command()
       transitioning = False
 
       if self._transition is not None:
         transitioning = True
-        if self._transition.update():
+        trace.begin(trace.TRANSITION)
+        finished = self._transition.update()
+        trace.end(trace.TRANSITION)
+        if finished:
           on_done = self._transition.on_done
           self._transition = None
           if on_done:
@@ -444,43 +563,35 @@ class Tree:
 
       # A pixel-owning transition freezes the animation (they share the buffer); a
       # brightness-only transition can run concurrently with a live animation.
-      animating = self.animation and not self.animation.frozen
+      # While a pixel stream holds the buffer it writes and shows its own frames,
+      # so this loop only steps brightness fades (shown with the next streamed frame).
+      streaming = self._stream is not None
+      animating = self.animation and not self.animation.frozen and not streaming
       if animating:
-        self.animation.animate()
+        self.output.dither = self.animation.dither
+        trace.begin(trace.DRAW)
+        self.animation.animate(show=False)
+        trace.end(trace.DRAW)
+
+      # One show per frame for the transition and animation together; skipped
+      # when neither changed a pixel or the brightness (util/framebuffer.py).
+      if not streaming:
+        trace.begin(trace.SHOW)
+        shown = self.string.show()
+        trace.end(trace.SHOW, shown)
+      trace.end(trace.FRAME)
 
       if transitioning:
-        # Fades are subtle, so run them fast: at ~30fps a sprout only gets a
-        # handful of frames per pixel and the steps are visible. Position is
-        # time-based, so a higher rate just means finer, smoother steps.
-        await asyncio.sleep(0.012)  # ~50-60fps
+        scheduler.period = FADE_PERIOD
       elif animating:
-        await asyncio.sleep(0.033)  # ~30fps is plenty smooth for LED animations
+        scheduler.period = ANIMATE_PERIOD
       else:
-        await asyncio.sleep(0.3)
-
-  def read_coordinates(self):
-      coordinates = []
-      with open('coordinates.csv', 'r') as file:
-          for line in file:
-              values = line.split(',')
-              coordinates.append((int(values[0]), int(values[1]), int(values[2])))
-      return coordinates
-
-  def read_segments(self):
-      """Per-LED segment id (0 = trunk, 1..4 = branches), parallel to coordinates.
-
-      Precomputed by tools/gen_segments.py into segments.csv. Falls back to all-trunk
-      if the file is missing so hue_shift still renders (as a single-color tree)."""
-      segments = []
-      try:
-          with open('segments.csv', 'r') as file:
-              for line in file:
-                  line = line.strip()
-                  if line:
-                      segments.append(int(line))
-      except OSError:
-          segments = [0] * len(self.coordinates)
-      return segments
+        scheduler.period = IDLE_PERIOD
+      await scheduler.wait()
+
+  def frame_stats(self):
+    """Achieved render-loop pacing: fps, interval jitter, work time, dropped frames."""
+    return self._scheduler.stats()
 
   def calculate_perceived_color(self, pixels):
     """Calculate the perceived dominant color using brightness-weighted average of top 25% brightest pixels.
@@ -523,6 +634,35 @@ class Tree:
 
     return (0, 0, 0)
 
+  def _report_color(self):
+    # While a color transition is mid-fade the buffer holds intermediate values, so
+    # report its target; otherwise sample the strand for the perceived color.
+    if self._transition is not None and self._transition.report_color is not None:
+      return self._transition.report_color
+    # Get current color from pixels - avoid creating new list to prevent memory fragmentation
+    # Sample a few pixels instead of all 100 to reduce memory usage
+    sample_pixels = []
+    for i in range(0, len(self.string), max(1, len(self.string) // 10)):  # Sample every 10th pixel
+        sample_pixels.append(self.string[i])
+    return self.calculate_perceived_color(sample_pixels)
+
+  def state_into(self, buf):
+    """Write the current state as a binary record into `buf` (see util/binproto.py).
+
+    The same values as `state()` (minus the effect list), without building the dict.
+    """
+    r, g, b = self._report_color()
+    animation = self.animation
+    name = animation.name if animation else None
+    binproto.pack_state(
+      buf, self._is_on, r, g, b,
+      int(self._target_brightness / MAX_BRIGHTNESS * 255),
+      self.EFFECTS.index(name) if name in self.EFFECTS and not self._solid else binproto.NO_EFFECT,
+      int(round(self._speed_value() * 100)) if animation else 50,
+      int(round(self._param_value() * 100)) if animation else 50,
+      bool(animation and animation.frozen))
+    return buf
+
   def state(self):
     """Get the current state of the tree.
 
@@ -531,24 +671,15 @@ class Tree:
             - state: "ON" or "OFF"
             - brightness: 0-255
             - color: dict with r, g, b keys (0-255)
-            - effect: current effect name or None
+            - effect: current effect name, or None while showing a solid color
             - speed: current animation speed (0-100)
             - available_effects: list of available effects
             - animation_state: "paused" or "running"
+
+    Fields of a submitted change not yet applied are reported as their new values.
     """
-    # While a color transition is mid-fade the buffer holds intermediate values, so
-    # report its target; otherwise sample the strand for the perceived color.
-    if self._transition is not None and self._transition.report_color is not None:
-      perceived_color = self._transition.report_color
-    else:
-      # Get current color from pixels - avoid creating new list to prevent memory fragmentation
-      # Sample a few pixels instead of all 100 to reduce memory usage
-      sample_pixels = []
-      for i in range(0, len(self.string), max(1, len(self.string) // 10)):  # Sample every 10th pixel
-          sample_pixels.append(self.string[i])
-      perceived_color = self.calculate_perceived_color(sample_pixels)
-
-    return {
+    perceived_color = self._report_color()
+    state = {
       "state": "ON" if self._is_on else "OFF",
       "brightness": int(self._target_brightness / MAX_BRIGHTNESS * 255),  # hw -> 0-255
       "color": {
@@ -557,9 +688,20 @@ class Tree:
         "b": perceived_color[2]
       },
       "color_mode": "rgb",
-      "effect": self.animation.name if self.animation else None,
-      "speed": int(self.animation.speed * 100) if self.animation else 50,
+      "effect": self.animation.name if self.animation and not self._solid else None,
+      "speed": int(round(self._speed_value() * 100)) if self.animation else 50,
       "param": int(round(self._param_value() * 100)) if self.animation else 50,
       "available_effects": self.EFFECTS,
       "animation_state": "paused" if self.animation and self.animation.frozen else "running"
-    }
\ No newline at end of file
+    }
+    pending = self._pending_command
+    if pending:
+      for key in ("state", "brightness", "color", "effect", "animation_state"):
+        if key in pending:
+          state[key] = pending[key]
+      if "color" in pending and "effect" not in pending:
+        state["effect"] = None
+      for key in ("speed", "param"):
+        if key in pending:
+          state[key] = int(float(pending[key]))
+    return state
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""Compact fixed-layout binary encoding of tree commands and state.
+
+JSON stays the format for Home Assistant, but every JSON message costs a string,
+a parsed dict and its keys on the CircuitPython heap. Clients that don't need JSON
+(scripts, other microcontrollers, a busy dashboard) can use this 11-byte record on
+mr_tree/set/bin and mr_tree/state/bin over MQTT, or `/state.bin` over HTTP:
+
+    offset  field       meaning
+    0       version     VERSION (1)
+    1       mask        which fields below are set (a state record sets all)
+    2       power       0 off, 1 on                               mask POWER
+    3-5     r, g, b     color, 0-255 each                          mask COLOR
+    6       brightness  0-255                                      mask BRIGHTNESS
+    7       effect      index into Tree.EFFECTS; NO_EFFECT = a     mask EFFECT
+                        solid color (no effect running)
+    8       speed       0-100                                      mask SPEED
+    9       param       0-100                                      mask PARAM
+    10      paused      0 running, 1 paused                        mask PAUSED
+
+`pack_state()` writes a state record into a caller's preallocated buffer with
+`struct.pack_into`. `decode_command()` reads a record straight out of whatever
+holds it (the MQTT receive buffer, a request body) with `struct.unpack_from`. It
+returns the same field dict a JSON command parses to, so both formats go through
+the one `handle_state_change()`.
+"""
+
+import struct
+
+VERSION = 1
+SIZE = 11
+FORMAT = "<BBBBBBBBBBB"
+
+POWER = 0x01
+COLOR = 0x02
+BRIGHTNESS = 0x04
+EFFECT = 0x08
+SPEED = 0x10
+PARAM = 0x20
+PAUSED = 0x40
+ALL = 0x7F
+
+NO_EFFECT = 0xFF
+
+
+def pack_state(buf, on, r, g, b, brightness, effect_id, speed, param, paused):
+    """Write a full state record into `buf` (at least SIZE bytes)."""
+    struct.pack_into(FORMAT, buf, 0, VERSION, ALL, 1 if on else 0, r, g, b,
+                     brightness, effect_id, speed, param, 1 if paused else 0)
+
+
+def decode_command(data, effects):
+    """The HA/API field dict for the command record in `data`.
+
+    `effects` is Tree.EFFECTS, for the effect id. NO_EFFECT leaves `effect` out, so
+    the record's color is what gets applied. Raises ValueError on a short or
+    unknown-version record, or an effect id out of range."""
+    if len(data) < SIZE or data[0] != VERSION:
+        raise ValueError("not a version 1 binary command")
+    _, mask, power, r, g, b, brightness, effect, speed, param, paused = struct.unpack_from(FORMAT, data, 0)
+    params = {}
+    if mask & POWER:
+        params["state"] = "ON" if power else "OFF"
+    if mask & EFFECT and effect != NO_EFFECT:
+        if effect >= len(effects):
+            raise ValueError(f"unknown effect id {effect}")
+        params["effect"] = effects[effect]
+    if mask & COLOR:
+        params["color"] = {"r": r, "g": g, "b": b}
+    if mask & BRIGHTNESS:
+        params["brightness"] = brightness
+    if mask & SPEED:
+        params["speed"] = speed
+    if mask & PARAM:
+        params["param"] = param
+    if mask & PAUSED:
+        params["animation_state"] = "paused" if paused else "running"
+    return params
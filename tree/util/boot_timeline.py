@@ -0,0 +1,69 @@
+"""When each part of bring-up ran, from code.py's start to the tree being online.
+
+code.py starts rendering first and brings WiFi, mDNS, the HTTP server, MQTT and
+the dials up in asyncio tasks alongside it, so boot is no longer one sequence
+whose total says it all. This records each phase's start and end and a few
+milestones, so time-to-first-light and time-to-online can be read (and
+improved) separately:
+
+    timeline = BootTimeline()
+    timeline.begin("wifi")
+    ...
+    timeline.end("wifi")           # prints "Boot: wifi 1834ms (done at 2210ms)"
+    timeline.mark("first_light")   # a moment, no duration
+
+Times are ms since the timeline was created (the top of code.py). `since_reset_ms`
+is when that was on the board's clock, which counts from reset, so it covers the
+supervisor, boot.py and the imports.
+
+`report()` is the JSON for `/boot`:
+
+    {"since_reset_ms": 812, "now_ms": 9321,
+     "phases": {"wifi": {"start_ms": 376, "end_ms": 2210, "ms": 1834}, ...},
+     "milestones": {"first_light": 371, "online": 3022, ...}}
+
+A phase still running has no `end_ms`/`ms` yet.
+"""
+
+import time
+
+
+class BootTimeline:
+    def __init__(self):
+        self._origin = time.monotonic_ns()
+        self._phases = {}       # name -> [start_ms, end_ms or None], in start order
+        self._order = []
+        self._milestones = {}
+
+    def _now_ms(self):
+        return (time.monotonic_ns() - self._origin) // 1_000_000
+
+    def begin(self, name):
+        if name not in self._phases:
+            self._order.append(name)
+        self._phases[name] = [self._now_ms(), None]
+
+    def end(self, name):
+        phase = self._phases.get(name)
+        if phase is None or phase[1] is not None:
+            return
+        phase[1] = self._now_ms()
+        print(f"Boot: {name} {phase[1] - phase[0]}ms (done at {phase[1]}ms)")
+
+    def mark(self, name):
+        """Record a milestone, the first time only."""
+        if name not in self._milestones:
+            self._milestones[name] = self._now_ms()
+            print(f"Boot: {name} at {self._milestones[name]}ms")
+
+    def report(self):
+        phases = {}
+        for name in self._order:
+            start, end = self._phases[name]
+            phases[name] = {"start_ms": start} if end is None else {"start_ms": start, "end_ms": end, "ms": end - start}
+        return {
+            "since_reset_ms": self._origin // 1_000_000,
+            "now_ms": self._now_ms(),
+            "phases": phases,
+            "milestones": dict(self._milestones),
+        }
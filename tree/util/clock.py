@@ -0,0 +1,109 @@
+"""Wall-clock time from SNTP, fetched without blocking the event loop.
+
+The board has no battery-backed clock, and everything else here runs on
+`time.monotonic()`. Anything that tells the outside world *when* something happens
+— the timer's end time, so HA can count it down itself — needs the real time. This
+asks an NTP server for it with one UDP packet and keeps the offset between
+monotonic time and the Unix epoch:
+
+    clock.start(pool)      # once, after WiFi is up
+    clock.poll()           # from a task, often; cheap when nothing is due
+    if clock.synced():
+        ends_at = clock.iso(clock.now() + 300)
+
+`poll()` never waits: it sends a request when one is due and reads the reply on a
+later call, with the socket non-blocking. It re-syncs every `RESYNC_S`, and retries
+after `RETRY_S` when a request goes unanswered for `TIMEOUT_S`. Only the first DNS
+lookup of the server blocks, and its result is cached.
+
+Time is kept in integer nanoseconds and whole seconds: CircuitPython floats are
+single precision, so a float epoch (~1.8e9) is only good to a couple of minutes.
+"""
+
+import struct
+import time
+
+NTP_SERVER = "pool.ntp.org"
+RESYNC_S = 6 * 3600
+RETRY_S = 60
+TIMEOUT_S = 5
+
+_NTP_TO_UNIX = 2208988800  # seconds from 1900-01-01 to 1970-01-01
+
+_pool = None
+_server = NTP_SERVER
+_addr = None
+_sock = None
+_offset_ns = None       # Unix time minus monotonic time, ns; None until synced
+_sent_ns = None         # monotonic_ns the outstanding request went out
+_due_ns = 0             # monotonic_ns the next request is due
+_packet = bytearray(48)
+
+
+def start(pool, server=NTP_SERVER):
+    """Set the socket pool (and server) and make a first request due now."""
+    global _pool, _server, _due_ns
+    _pool = pool
+    _server = server
+    _due_ns = time.monotonic_ns()
+
+
+def synced():
+    return _offset_ns is not None
+
+
+def now():
+    """Unix time in whole seconds (only meaningful once `synced()`)."""
+    return (time.monotonic_ns() + (_offset_ns or 0)) // 1_000_000_000
+
+
+def iso(ts):
+    """ISO 8601 UTC string for Unix time `ts` (seconds), as HA timestamps expect."""
+    t = time.localtime(int(ts))
+    return f"{t[0]:04d}-{t[1]:02d}-{t[2]:02d}T{t[3]:02d}:{t[4]:02d}:{t[5]:02d}+00:00"
+
+
+def poll():
+    """Send a due request or read a waiting reply. Returns True when this call synced."""
+    global _addr, _sock, _sent_ns, _due_ns, _offset_ns
+    if _pool is None:
+        return False
+    now_ns = time.monotonic_ns()
+    if _sent_ns is None:
+        if now_ns < _due_ns:
+            return False
+        try:
+            if _addr is None:
+                _addr = _pool.getaddrinfo(_server, 123)[0][4]
+            if _sock is None:
+                _sock = _pool.socket(_pool.AF_INET, _pool.SOCK_DGRAM)
+                _sock.setblocking(False)
+            _packet[0] = 0x1B  # LI 0, version 3, mode 3 (client)
+            for k in range(1, 48):
+                _packet[k] = 0
+            _sock.sendto(_packet, _addr)
+            _sent_ns = now_ns
+        except Exception as e:
+            print(f"NTP request failed: {e}")
+            _due_ns = now_ns + RETRY_S * 1_000_000_000
+        return False
+
+    try:
+        n, _ = _sock.recvfrom_into(_packet)
+    except OSError:
+        n = 0
+    if n < 48:
+        if now_ns - _sent_ns > TIMEOUT_S * 1_000_000_000:
+            print("NTP request timed out")
+            _sent_ns = None
+            _due_ns = now_ns + RETRY_S * 1_000_000_000
+        return False
+
+    seconds, fraction = struct.unpack_from(">II", _packet, 40)  # transmit timestamp
+    unix_ns = (seconds - _NTP_TO_UNIX) * 1_000_000_000 + (fraction * 1_000_000_000 >> 32)
+    # The server stamped its reply about halfway through the round trip.
+    _offset_ns = unix_ns - (_sent_ns + now_ns) // 2
+    _sent_ns = None
+    _due_ns = now_ns + RESYNC_S * 1_000_000_000
+    print(f"NTP synced: {iso(now())}")
+    return True
@@ -93,6 +93,11 @@ class Controller:
         self._led_current = [(0, 0, 0), (0, 0, 0), (0, 0, 0)]
         self._led_fade = None
 
+        # Last time a dial was turned or pressed (the encoder task polls fast for a
+        # while after), and a callable that wakes that task early; set by code.py.
+        self.last_activity = 0.0
+        self.wake = None
+
         # Dial LEDs follow the main strand: dark while the tree is off.
         tree.add_power_listener(self._on_power)
 
@@ -110,19 +115,22 @@ class Controller:
     def poll(self):
         """Read all dials once and dispatch events. Call from the encoder task."""
         now = time.monotonic()
+        pending = self.dials.interrupt_pending()
         right = self.dials.get(RIGHT)
         right_held = right.pressed if right else False
 
         for pos, dial in enumerate(self.dials.dials):
             if dial is None:
                 continue
-            delta = dial.read_delta()
+            delta, event = dial.poll(pending)
             if delta != 0:
+                self.last_activity = now
                 self._on_turn(pos, delta, right_held)
-            event = dial.poll_button()
             if event == "press":
+                self.last_activity = now
                 self._on_press(pos, right_held)
             elif event == "release":
+                self.last_activity = now
                 self._on_release(pos)
 
         if self.mode == TIMER and self._timer_editing and (now - self._last_input) >= TIMER_AUTOSTART_S:
@@ -133,6 +141,12 @@ class Controller:
         self._tick_leds(now)
         self._flush_publish(now)
 
+    @property
+    def busy(self):
+        """Whether poll() has work of its own pending: an LED fade or blink to step,
+        or a throttled publish to flush."""
+        return self._led_fade is not None or bool(self._blink_until) or self._publish_dirty
+
     def _tick_leds(self, now):
         """Drive any active limit-cue blinks; restore the normal LED when done."""
         if not self._blink_until:
@@ -249,6 +263,8 @@ class Controller:
             "dur": duration,
         }
         self._blink_until = {}  # a power fade owns the LEDs; drop any limit blink
+        if self.wake is not None:
+            self.wake()  # the encoder task may be idling; the fade needs its polls
 
     def _tick_led_fade(self, now):
         """Advance an in-progress power fade; called every poll()."""
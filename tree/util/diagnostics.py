@@ -0,0 +1,92 @@
+"""Cheap runtime health counters, sampled into Home Assistant diagnostic sensors.
+
+The existing tasks feed this as they run, each at the cost of a clock read or a
+counter bump:
+
+    diagnostics.mqtt_loop(ns)        # handle_mqtt, how long mqtt_client.poll took
+    diagnostics.http_request()       # handle_requests, when poll() served a request
+
+`sample(frame_stats)` is called on the heartbeat cadence (every 30s) and turns them
+into one flat dict for the mr_tree/diagnostics topic:
+
+    fps            achieved render rate (from the frame scheduler)
+    frame_ms_p95   95th percentile render+show time per frame
+    stall_ms       worst event-loop stall over the last two samples (~a minute),
+                   as measured by the lag monitor (util/stalls.py)
+    mem_free       gc.mem_free()
+    mem_largest    largest of 64, 32, 16, 8, 4, 2 and 1 KB that allocates right now,
+                   0 if none does (heap fragmentation shows up here long before
+                   mem_free runs out; past 64 KB there's nothing to worry about)
+    mqtt_loop_ms   mean and worst time inside mqtt_client.poll() since the last sample
+    http_rps       HTTP requests served per second since the last sample
+
+code.py adds `dial_i2c_tps`, the dials' own count (Dials.transaction_rate()).
+
+The memory probe is the only costly part: each failed allocation runs a full GC
+and each successful one zeroes its block, so it tries a few fixed sizes
+largest-first and stops at the first that fits, on the sample cadence only.
+"""
+
+import gc
+import time
+
+
+PROBE_SIZES = (65536, 32768, 16384, 8192, 4096, 2048, 1024)
+
+
+def largest_free_block(limit):
+    """Largest of PROBE_SIZES (up to `limit`) that can be allocated right now, or 0."""
+    for size in PROBE_SIZES:
+        if size > limit:
+            continue
+        try:
+            block = bytearray(size)
+            del block
+            return size
+        except MemoryError:
+            pass
+    return 0
+
+
+class Diagnostics:
+    def __init__(self, stalls):
+        self._stalls = stalls      # util/stalls.py StallMonitor
+        self._stall_prev = 0       # worst loop lag last interval, ns
+        self._mqtt_total = 0       # ns inside mqtt_client.poll() this interval
+        self._mqtt_max = 0
+        self._mqtt_count = 0
+        self._requests = 0
+        self._since = time.monotonic_ns()
+
+    def mqtt_loop(self, ns):
+        self._mqtt_total += ns
+        self._mqtt_count += 1
+        if ns > self._mqtt_max:
+            self._mqtt_max = ns
+
+    def http_request(self):
+        self._requests += 1
+
+    def sample(self, frame_stats):
+        """Current readings (see the module docstring); starts a new interval."""
+        now = time.monotonic_ns()
+        elapsed = (now - self._since) / 1e9
+        mem_free = gc.mem_free() if hasattr(gc, "mem_free") else 0
+        stall = self._stalls.take_recent_lag()
+        result = {
+            "fps": frame_stats.get("fps", 0.0),
+            "frame_ms_p95": frame_stats.get("work_ms_p95", 0.0),
+            "stall_ms": round(max(stall, self._stall_prev) / 1e6, 1),
+            "mem_free": mem_free,
+            "mem_largest": largest_free_block(mem_free) if mem_free else 0,
+            "mqtt_loop_ms": round(self._mqtt_total / self._mqtt_count / 1e6, 2) if self._mqtt_count else 0.0,
+            "mqtt_loop_ms_max": round(self._mqtt_max / 1e6, 2),
+            "http_rps": round(self._requests / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+        self._stall_prev = stall
+        self._mqtt_total = 0
+        self._mqtt_max = 0
+        self._mqtt_count = 0
+        self._requests = 0
+        self._since = now
+        return result
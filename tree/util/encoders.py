@@ -3,13 +3,25 @@
 Wraps the three Adafruit I2C QT seesaw rotary encoders behind a small, robust API.
 A missing or failed dial is skipped so the tree still runs (over MQTT) without it.
 See project/dials.md for the interaction model.
+
+Each seesaw can also pull an INT line low when its encoder turns or its button
+changes. With the three boards' INT pins wired together to one board GPIO (open
+drain, active low), `Dials.enable_interrupts(pin)` turns that on, and the dials
+only need reading when `interrupt_pending()` — a GPIO read, not I2C.
+
+`Dial` does its own register reads (with a short reply wait, see READ_DELAY_S)
+rather than going through the library's IncrementalEncoder / DigitalIO, skips LED
+writes that wouldn't change the color, and counts its I2C transactions;
+`Dials.transaction_rate()` reports them per second.
 """
 
+import asyncio
+import struct
 import time
 
+import digitalio
+
 from adafruit_seesaw.seesaw import Seesaw
-from adafruit_seesaw.rotaryio import IncrementalEncoder
-from adafruit_seesaw.digitalio import DigitalIO
 from adafruit_seesaw.neopixel import NeoPixel as SeesawNeoPixel
 
 # Physical positions.
@@ -22,49 +34,103 @@ RIGHT = 2
 DIAL_ADDRESSES = [0x37, 0x38, 0x36]
 
 _BUTTON_PIN = 24  # onboard push-button
+_BUTTON_MASK = 1 << _BUTTON_PIN
 _PIXEL_PIN = 6    # onboard NeoPixel
 
+_ENCODER_BASE = 0x11
+_ENCODER_POSITION = 0x30
+
+# A seesaw register read writes the register address, waits for the chip to
+# prepare the reply, then reads it. Adafruit's CircuitPython library waits 8ms
+# (and IncrementalEncoder/DigitalIO use that default), the Arduino library 250us.
+# The encoder and GPIO registers answer well within 1ms, so every read here waits
+# that: 8x less time with the event loop blocked, per read.
+READ_DELAY_S = 0.001
+
+# A seesaw needs this long after a software reset before it answers.
+RESET_S = 0.5
+
 
 class Dial:
-    """One rotary encoder: relative turn delta, debounced button edges, onboard LED."""
+    """One rotary encoder: relative turn delta, debounced button edges, onboard LED.
 
-    def __init__(self, i2c, address):
+    All I/O goes through here, and `io` counts the I2C transactions it costs (a
+    register read is two: the address write and the read; a write is one).
+    """
+
+    def __init__(self, seesaw, address):
+        """Set up the dial on `seesaw`, a `Seesaw` that has finished its reset."""
         self.address = address
-        self._seesaw = Seesaw(i2c, address)
+        self._seesaw = seesaw
         self._seesaw.pin_mode(_BUTTON_PIN, self._seesaw.INPUT_PULLUP)
-        self._encoder = IncrementalEncoder(self._seesaw)
-        self._button = DigitalIO(self._seesaw, _BUTTON_PIN)
         self.pixel = SeesawNeoPixel(self._seesaw, _PIXEL_PIN, 1)
         self.pixel.brightness = 0.4
+        self.io = 0
+        self._buf = bytearray(4)
+        self._interrupts = False
+        self._settling = False     # a button change is waiting out the debounce
+        self._led = None           # last color written to the LED
 
         # CW = increase (the raw position counts the other way).
-        self._last_position = -self._encoder.position
+        self._last_position = -self._read_position()
         self._pressed = self._is_down()
         self._last_change = time.monotonic()
 
-    def _is_down(self):
-        return not self._button.value  # pressed == value False (INPUT_PULLUP)
+    def enable_interrupt(self):
+        """Pull INT low on an encoder turn or a button change."""
+        self._seesaw.enable_encoder_interrupt()
+        self._seesaw.set_GPIO_interrupts(_BUTTON_MASK, True)
+        self.io += 2
+        self._interrupts = True
+
+    def _read_position(self):
+        self._seesaw.read(_ENCODER_BASE, _ENCODER_POSITION, self._buf, delay=READ_DELAY_S)
+        self.io += 2
+        return struct.unpack_from(">i", self._buf)[0]
 
-    def read_delta(self):
-        """Detents turned since the last call (CW positive)."""
-        position = -self._encoder.position
+    def _is_down(self):
+        self.io += 2
+        # pressed == pin low (INPUT_PULLUP)
+        return not self._seesaw.digital_read_bulk(_BUTTON_MASK, delay=READ_DELAY_S)
+
+    def poll(self, pending=True, debounce=0.03):
+        """Read the dial: (detents turned since the last poll, CW positive;
+        'press' / 'release' / None).
+
+        With interrupts on, the dial is only read when `pending` (INT is low) or a
+        button change is still settling, and its GPIO interrupt flag (read first,
+        which also releases INT) says whether the button needs reading at all. A
+        turn is released by reading the position. Without interrupts, it's the
+        position and the button every time.
+        """
+        check_button = True
+        if self._interrupts:
+            if not pending and not self._settling:
+                return 0, None
+            flags = self._seesaw.get_GPIO_interrupt_flag(delay=READ_DELAY_S)
+            self.io += 2
+            check_button = self._settling or bool(flags & _BUTTON_MASK)
+        position = -self._read_position()
         delta = position - self._last_position
         self._last_position = position
-        return delta
+        return delta, self._poll_button(debounce) if check_button else None
 
-    def poll_button(self, debounce=0.03):
-        """Return 'press', 'release', or None.
-
-        Edge-triggered: a state change is reported on the first poll that sees it
+    def _poll_button(self, debounce):
+        """Edge-triggered: a state change is reported on the first poll that sees it
         (so a brief press caught in a single poll still registers), then further
         changes are ignored for `debounce` seconds to reject mechanical bounce.
         """
         raw = self._is_down()
         now = time.monotonic()
-        if raw != self._pressed and (now - self._last_change) >= debounce:
-            self._pressed = raw
-            self._last_change = now
-            return "press" if raw else "release"
+        if raw != self._pressed:
+            if (now - self._last_change) >= debounce:
+                self._pressed = raw
+                self._last_change = now
+                self._settling = False
+                return "press" if raw else "release"
+            self._settling = True  # look again: the INT for it has been consumed
+        else:
+            self._settling = False
         return None
 
     @property
@@ -72,8 +138,14 @@ class Dial:
         return self._pressed
 
     def set_led(self, color):
+        """Show `color` on the dial LED; a repeat of the color shown costs nothing."""
+        color = tuple(color)
+        if color == self._led:
+            return
         try:
             self.pixel.fill(color)
+            self.io += 2  # pixel buffer write + show
+            self._led = color
         except Exception:
             pass  # LED feedback is best-effort; never let it break control
 
@@ -82,23 +154,78 @@ class Dials:
     """The set of dials, indexed by physical position. Missing dials are None."""
 
     def __init__(self, i2c, addresses=DIAL_ADDRESSES):
-        self.dials = []
-        for pos, addr in enumerate(addresses):
+        """No I/O here: every dial is None until `start()` brings them up."""
+        self._i2c = i2c
+        self._addresses = addresses
+        self.dials = [None] * len(addresses)
+        self._int = None  # shared INT line, when wired (see enable_interrupts)
+        self._io_last = 0
+        self._io_since = time.monotonic()
+
+    async def start(self):
+        """Find, reset and set up the dials. Missing/failed ones stay None.
+
+        The library's reset sleeps RESET_S per board, blocking; here all of them
+        are reset first and waited on once, with the event loop free meanwhile.
+        """
+        found = []
+        for pos, addr in enumerate(self._addresses):
+            try:
+                seesaw = Seesaw(self._i2c, addr, reset=False)
+                seesaw.sw_reset(post_reset_delay=0)
+                found.append((pos, addr, seesaw))
+            except Exception as e:
+                print(f"Dial {pos} at {hex(addr)} not available: {e}")
+        if found:
+            await asyncio.sleep(RESET_S)
+        for pos, addr, seesaw in found:
             try:
-                self.dials.append(Dial(i2c, addr))
+                self.dials[pos] = Dial(seesaw, addr)
                 print(f"Dial {pos} initialized at {hex(addr)}")
             except Exception as e:
-                self.dials.append(None)
                 print(f"Dial {pos} at {hex(addr)} not available: {e}")
 
     @property
     def any_present(self):
         return any(d is not None for d in self.dials)
 
+    @property
+    def has_interrupt(self):
+        return self._int is not None
+
+    def enable_interrupts(self, pin):
+        """Watch the dials' shared INT line on board `pin`. Returns whether it's in use."""
+        try:
+            for dial in self.dials:
+                if dial:
+                    dial.enable_interrupt()
+            line = digitalio.DigitalInOut(pin)
+            line.switch_to_input(pull=digitalio.Pull.UP)
+            self._int = line
+            print(f"Dial interrupts on {pin}")
+            return True
+        except Exception as e:
+            print(f"Dial interrupts unavailable: {e}")
+            return False
+
+    def interrupt_pending(self):
+        """Whether a dial has pulled INT low (a change waiting to be read)."""
+        return self._int is not None and not self._int.value
+
+    def transaction_rate(self):
+        """I2C transactions per second spent on the dials since the last call."""
+        now = time.monotonic()
+        total = sum(dial.io for dial in self.dials if dial)
+        elapsed = now - self._io_since
+        rate = (total - self._io_last) / elapsed if elapsed > 0 else 0.0
+        self._io_last = total
+        self._io_since = now
+        return round(rate, 1)
+
     def get(self, position):
         return self.dials[position] if 0 <= position < len(self.dials) else None
 
-    def calibrate(self, duration=1.5):
+    async def calibrate(self, duration=1.5):
         """Light each present dial L=red, C=green, R=blue and log position->address.
 
         Watch the physical dials once: leftmost should be red. If not, reorder
@@ -110,7 +237,7 @@ class Dials:
             if dial:
                 dial.set_led(colors[pos])
                 print(f"Calibration: {names[pos]} -> {hex(dial.address)}")
-        time.sleep(duration)
+        await asyncio.sleep(duration)
         for dial in self.dials:
             if dial:
                 dial.set_led((0, 0, 0))
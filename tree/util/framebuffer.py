@@ -0,0 +1,151 @@
+"""A plain byte buffer that effects and transitions render into, blitted once per frame.
+
+Writing `pixels[i] = color` goes through pixelbuf's `__setitem__` for every LED:
+parse the value (tuple, list or int), range-check it, multiply each channel by the
+brightness and store it in two buffers. At 100 LEDs that is most of a frame's
+render cost once the color math itself is table lookups (see util/palette.py).
+
+`FrameBuffer` holds the frame as one `bytearray`, three bytes per LED in R, G, B
+order — the strand's wire order (it's built with `pixel_order=neopixel.RGB`).
+Hot loops write channel bytes straight into `buf`:
+
+    buf = self.pixel_object.buf
+    o = 3 * i
+    buf[o] = r; buf[o + 1] = g; buf[o + 2] = b
+
+and `show()` hands the whole frame to the output stage (util/output.py), which
+applies brightness and writes it to the strand in one `neopixel_write`.
+
+It also mimics the NeoPixel API the rest of the code uses — `len()`, indexing and
+slicing (reads return tuples, like native pixelbuf), `fill()`, `show()` and
+`brightness` (passed through to the output stage) — so code that touches a handful of
+pixels (inspect, capture, `Tree.fill_count`) doesn't need to change. Writes are
+never shown until `show()`, whatever `auto_write` says.
+
+**Dirty tracking.** The buffer keeps the span of pixels written since the last
+`show()`. Writes through the NeoPixel-style API mark themselves; code writing `buf`
+directly calls `mark(lo, hi)` / `mark_all()` (TreeAnimation does this for effects
+that don't report their own changes). `show()` does nothing when nothing is dirty
+and the output stage has no new brightness to apply, and otherwise only re-maps
+the dirty span — so a static frame costs neither CPU nor a strand write.
+
+`owner` is whoever last rendered the whole buffer (an effect, a Transition, or
+None after a casual write). An effect that only repaints the pixels it changes
+checks it to know when something else has drawn over its frame and it must
+repaint everything.
+"""
+
+
+class FrameBuffer:
+    def __init__(self, output):
+        self.output = output
+        self.n = len(output)
+        self.bpp = 3
+        self.buf = bytearray(self.n * 3)
+        self._zeros = bytes(self.n * 3)
+        self.auto_write = False  # set by Animation; output only happens on show()
+        self.owner = None
+        self._lo = 0             # dirty pixel span [lo, hi), empty when lo >= hi
+        self._hi = self.n
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def brightness(self):
+        return self.output.brightness
+
+    @brightness.setter
+    def brightness(self, value):
+        self.output.brightness = value
+
+    @property
+    def dirty(self):
+        return self._lo < self._hi
+
+    def mark(self, lo, hi):
+        """Record that pixels [lo, hi) changed."""
+        if lo < self._lo:
+            self._lo = lo
+        if hi > self._hi:
+            self._hi = hi
+
+    def mark_all(self):
+        self._lo = 0
+        self._hi = self.n
+
+    @staticmethod
+    def _rgb(value):
+        if isinstance(value, int):
+            return ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
+        return (int(value[0]), int(value[1]), int(value[2]))
+
+    def __setitem__(self, index, value):
+        buf = self.buf
+        if isinstance(index, slice):
+            indices = range(*index.indices(self.n))
+            self.owner = None
+            if len(indices):
+                self.mark(min(indices[0], indices[-1]), max(indices[0], indices[-1]) + 1)
+            flat = not isinstance(value, int) and len(value) == 3 * len(indices) and isinstance(value[0], int)
+            if flat and indices.step == 1:
+                # Flat channel values (e.g. another frame's bytes): one bulk copy.
+                buf[3 * indices.start:3 * indices.stop] = bytes(value) if isinstance(value, list) else value
+                return
+            single = isinstance(value, int) or (len(value) == 3 and isinstance(value[0], int) and not flat)
+            if single:
+                r, g, b = self._rgb(value)
+            for k, i in enumerate(indices):
+                if flat:
+                    r, g, b = value[3 * k], value[3 * k + 1], value[3 * k + 2]
+                elif not single:
+                    r, g, b = self._rgb(value[k])
+                o = 3 * i
+                buf[o] = r
+                buf[o + 1] = g
+                buf[o + 2] = b
+            return
+        if index < 0:
+            index += self.n
+        if not 0 <= index < self.n:
+            raise IndexError("index out of range")
+        r, g, b = self._rgb(value)
+        self.owner = None
+        self.mark(index, index + 1)
+        o = 3 * index
+        buf[o] = r
+        buf[o + 1] = g
+        buf[o + 2] = b
+
+    def __getitem__(self, index):
+        buf = self.buf
+        if isinstance(index, slice):
+            return [(buf[3 * i], buf[3 * i + 1], buf[3 * i + 2]) for i in range(*index.indices(self.n))]
+        if index < 0:
+            index += self.n
+        if not 0 <= index < self.n:
+            raise IndexError("index out of range")
+        o = 3 * index
+        return (buf[o], buf[o + 1], buf[o + 2])
+
+    def fill(self, color):
+        r, g, b = self._rgb(color)
+        buf = self.buf
+        self.owner = None
+        self.mark_all()
+        if r == g == b == 0:
+            buf[:] = self._zeros
+            return
+        for o in range(0, len(buf), 3):
+            buf[o] = r
+            buf[o + 1] = g
+            buf[o + 2] = b
+
+    def show(self):
+        """Send the frame if anything changed; returns whether it was sent."""
+        if self._lo >= self._hi and not self.output.changed:
+            return False
+        self.output.show(self.buf, self._lo, self._hi)
+        self._lo = self.n
+        self._hi = 0
+        return True
@@ -0,0 +1,174 @@
+"""The tree's LED positions and the spatial features effects derive from them.
+
+Every effect used to re-derive geometry from a list of (x, y, z) tuples in its
+constructor — re-sorting by height, recomputing the trunk centroid and an `atan2`
+per LED — so switching effects repeated the same work, and each tuple list cost
+~100 small heap objects. `GeometryIndex` is built once by `Tree` from
+coordinates.csv / segments.csv and handed to every effect instead.
+
+Positions are stored as three compact `array('h')` columns (`x`, `y`, `z`) plus a
+per-LED segment id column (`segments`: 0 = trunk, 1..4 = branches). Derived
+features are computed on first use and cached:
+
+  height()           z normalized to 0..1 across the tree's z range
+  height_order()     LED indices sorted bottom-to-top
+  height_rank()      each LED's height rank normalized to 0..1 (even spacing,
+                     regardless of how unevenly the LEDs are spread in z)
+  angle()            angle around the x-y centroid axis, normalized to 0..1
+  radius()           distance from that axis
+  segment_members()  LED indices per segment id
+  branch_order()     branch segment ids sorted by angle around the trunk
+
+`geometry[i]` still returns an (x, y, z) tuple for the odd caller (e.g. /inspect)
+that wants one LED's position.
+"""
+
+import math
+from array import array
+
+TWO_PI = 2 * math.pi
+
+
+class GeometryIndex:
+    def __init__(self, xs, ys, zs, segments=None):
+        n = len(xs)
+        self.x = array('h', xs)
+        self.y = array('h', ys)
+        self.z = array('h', zs)
+        if segments is None or len(segments) < n:
+            # Missing/short segments.csv: treat the rest as trunk so hue_shift
+            # still renders (as a single-color tree).
+            segments = list(segments or []) + [0] * (n - len(segments or []))
+        self.segments = array('B', segments[:n])
+        self.bounds = (
+            (min(self.x), max(self.x)),
+            (min(self.y), max(self.y)),
+            (min(self.z), max(self.z)),
+        )
+        self._cache = {}
+
+    @classmethod
+    def load(cls, coordinates_path='coordinates.csv', segments_path='segments.csv'):
+        """Read the LED positions and segmentation (relative to CIRCUITPY's root).
+
+        segments.csv is precomputed by tools/gen_segments.py; it's optional.
+        """
+        xs, ys, zs = [], [], []
+        with open(coordinates_path, 'r') as file:
+            for line in file:
+                values = line.split(',')
+                if len(values) < 3:
+                    continue
+                xs.append(int(values[0]))
+                ys.append(int(values[1]))
+                zs.append(int(values[2]))
+        segments = []
+        try:
+            with open(segments_path, 'r') as file:
+                for line in file:
+                    line = line.strip()
+                    if line:
+                        segments.append(int(line))
+        except OSError:
+            segments = None
+        return cls(xs, ys, zs, segments)
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, i):
+        return (self.x[i], self.y[i], self.z[i])
+
+    def axis(self, axis):
+        """The coordinate column for an `util.axis.Axis` value (0 = x, 1 = y, 2 = z)."""
+        return (self.x, self.y, self.z)[axis]
+
+    def centroid(self, members=None):
+        """Mean (x, y) of the given LED indices (default: every LED)."""
+        if members is None:
+            members = range(len(self))
+        count = len(members) or 1
+        return (sum(self.x[i] for i in members) / count,
+                sum(self.y[i] for i in members) / count)
+
+    # ---- cached features ----------------------------------------------
+
+    def height(self):
+        """Per-LED z, normalized to 0..1 between the lowest and highest LED."""
+        h = self._cache.get('height')
+        if h is None:
+            z_min, z_max = self.bounds[2]
+            span = (z_max - z_min) or 1
+            h = array('f', ((z - z_min) / span for z in self.z))
+            self._cache['height'] = h
+        return h
+
+    def height_order(self):
+        """LED indices sorted bottom-to-top by z height."""
+        order = self._cache.get('height_order')
+        if order is None:
+            z = self.z
+            order = array('H', sorted(range(len(self)), key=lambda i: z[i]))
+            self._cache['height_order'] = order
+        return order
+
+    def height_rank(self):
+        """Per-LED height rank, normalized to 0..1 (lowest LED 0, highest 1)."""
+        rank = self._cache.get('height_rank')
+        if rank is None:
+            order = self.height_order()
+            n = len(order)
+            rank = array('f', [0.0] * n)
+            for r, i in enumerate(order):
+                rank[i] = r / (n - 1) if n > 1 else 0.0
+            self._cache['height_rank'] = rank
+        return rank
+
+    def angle(self):
+        """Per-LED angle (0..1 turns) around the vertical axis through the x-y centroid."""
+        a = self._cache.get('angle')
+        if a is None:
+            cx, cy = self.centroid()
+            x, y = self.x, self.y
+            a = array('f', ((math.atan2(y[i] - cy, x[i] - cx) / TWO_PI) % 1.0 for i in range(len(self))))
+            self._cache['angle'] = a
+        return a
+
+    def radius(self):
+        """Per-LED distance from the vertical axis through the x-y centroid."""
+        r = self._cache.get('radius')
+        if r is None:
+            cx, cy = self.centroid()
+            x, y = self.x, self.y
+            r = array('f', (math.sqrt((x[i] - cx) ** 2 + (y[i] - cy) ** 2) for i in range(len(self))))
+            self._cache['radius'] = r
+        return r
+
+    def segment_members(self):
+        """{segment id: [LED indices]}, for every segment id present."""
+        members = self._cache.get('segment_members')
+        if members is None:
+            members = {}
+            for i, s in enumerate(self.segments):
+                members.setdefault(s, []).append(i)
+            self._cache['segment_members'] = members
+        return members
+
+    def branch_order(self):
+        """Branch segment ids (> 0) sorted by angle around the trunk's x-y centroid.
+
+        Lets effects talk about "opposite" branches (index i and i+2) regardless of
+        how the segmentation happened to number them.
+        """
+        order = self._cache.get('branch_order')
+        if order is None:
+            members = self.segment_members()
+            tx, ty = self.centroid(members.get(0))
+            angle = {}
+            for b, idx in members.items():
+                if b > 0:
+                    cx, cy = self.centroid(idx)
+                    angle[b] = math.atan2(cy - ty, cx - tx)
+            order = sorted(angle, key=lambda b: angle[b])
+            self._cache['branch_order'] = order
+        return order
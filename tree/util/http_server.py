@@ -0,0 +1,162 @@
+"""An adafruit_httpserver `Server` whose `poll()` never waits on a client.
+
+The stock `poll()` accepts a connection and then reads the whole request with a
+blocking socket and a 1s timeout (`socket_timeout`), per `recv`. A browser that
+opens a speculative connection and sends nothing, a half-open client, or a slow
+upload therefore holds the one event loop — and the render loop with it — for up
+to a second at a time.
+
+`PollingServer` keeps the routes, handlers and responses of the stock server and
+replaces only the receive side:
+
+* Accepted sockets are made non-blocking, and a request is assembled over as many
+  polls as it takes: each poll reads whatever has already arrived (a would-block
+  error is the readiness check) and moves on.
+* Each `poll()` has a time budget (`budget`, seconds) and reads at most
+  `READ_LIMIT` bytes per client; connections beyond `MAX_CLIENTS` wait in the
+  listen backlog.
+* A client that hasn't sent a complete request within `CLIENT_TIMEOUT_S` is
+  closed, and one that sends more than `REQUEST_LIMIT` bytes gets a 413.
+* Once a request is complete it is routed and answered as before (in the same
+  poll, unless the budget is already spent).
+
+`poll()` returns the stock result strings, so `server.poll() != NO_REQUEST` still
+means a request was handled; `busy` says whether any client is part-way through
+a request (the caller should poll again soon).
+"""
+
+import errno
+import time
+
+from adafruit_httpserver.server import (
+    Server, NO_REQUEST, REQUEST_HANDLED_NO_RESPONSE, REQUEST_HANDLED_RESPONSE_SENT,
+)
+from adafruit_httpserver.request import Request
+from adafruit_httpserver.response import Response
+from adafruit_httpserver.status import Status
+
+MAX_CLIENTS = 4
+READ_LIMIT = 2048           # bytes read per client per poll
+REQUEST_LIMIT = 8192        # largest request (headers + body) accepted
+CLIENT_TIMEOUT_S = 3.0
+
+PAYLOAD_TOO_LARGE_413 = Status(413, "Payload Too Large")
+
+_WOULD_BLOCK = (errno.EAGAIN, getattr(errno, "EWOULDBLOCK", errno.EAGAIN), errno.ETIMEDOUT)
+
+
+class _Client:
+    def __init__(self, conn, address, now):
+        self.conn = conn
+        self.address = address
+        self.since = now
+        self.data = b""
+        self.need = None        # total request length, once the headers are in
+
+
+def _content_length(header_bytes):
+    for line in header_bytes.split(b"\r\n"):
+        if line[:15].lower() == b"content-length:":
+            return int(line[15:].strip())
+    return 0
+
+
+class PollingServer(Server):
+    def __init__(self, *args, budget=0.003, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.budget = budget
+        self._clients = []
+        self.timeouts = 0       # clients closed for stalling
+
+    @property
+    def busy(self):
+        return bool(self._clients)
+
+    def _close(self, client):
+        try:
+            client.conn.close()
+        except OSError:
+            pass
+        self._clients.remove(client)
+
+    def _accept(self, now):
+        while len(self._clients) < MAX_CLIENTS:
+            try:
+                conn, address = self._sock.accept()
+            except OSError as e:
+                if e.args and e.args[0] in _WOULD_BLOCK:
+                    return
+                raise
+            conn.setblocking(False)
+            self._clients.append(_Client(conn, address, now))
+
+    def _read(self, client):
+        """Read what has arrived; True when the request is complete."""
+        got = 0
+        while got < READ_LIMIT:
+            try:
+                n = client.conn.recv_into(self._buffer, len(self._buffer))
+            except OSError as e:
+                if e.args and e.args[0] in _WOULD_BLOCK:
+                    break
+                raise
+            if n == 0:
+                raise OSError(errno.ENOTCONN)  # the client closed the connection
+            client.data += self._buffer[:n]
+            got += n
+            if client.need is None:
+                end = client.data.find(b"\r\n\r\n")
+                if end >= 0:
+                    client.need = end + 4 + _content_length(client.data[:end])
+            if client.need is not None and len(client.data) >= client.need:
+                return True
+            if len(client.data) > REQUEST_LIMIT:
+                return True
+        return False
+
+    def _respond(self, client):
+        """Route a complete request and send the response (as the stock poll does)."""
+        self._clients.remove(client)
+        conn = client.conn
+        request = Request(self, conn, client.address, client.data[:client.need or len(client.data)])
+        if client.need is None or client.need > REQUEST_LIMIT:
+            response = Response(request, "Request too large", status=PAYLOAD_TOO_LARGE_413)
+        else:
+            response = self._handle_request(request, self._find_handler(request.method, request.path))
+        if response is None:
+            conn.close()
+            return REQUEST_HANDLED_NO_RESPONSE
+        self._set_default_server_headers(response)
+        response._send()
+        return REQUEST_HANDLED_RESPONSE_SENT
+
+    def poll(self):
+        """Accept, read and answer what's ready, within `budget` seconds."""
+        if self.stopped:
+            return super().poll()  # raises ServerStoppedError
+        start = time.monotonic_ns()
+        deadline = start + int(self.budget * 1e9)
+        timeout_ns = int(CLIENT_TIMEOUT_S * 1e9)
+        self._accept(start)
+        result = NO_REQUEST
+        for client in self._clients[:]:
+            now = time.monotonic_ns()
+            if now > deadline:
+                break
+            try:
+                if self._read(client):
+                    result = self._respond(client)
+                elif now - client.since > timeout_ns:
+                    self.timeouts += 1
+                    self._close(client)
+            except Exception as e:
+                if client in self._clients:
+                    self._close(client)
+                else:
+                    try:
+                        client.conn.close()
+                    except OSError:
+                        pass
+                if not (isinstance(e, OSError) and e.args and e.args[0] in (errno.ENOTCONN, errno.ECONNRESET)):
+                    print(f"HTTP request from {client.address[0]} failed: {e}")
+        return result
@@ -0,0 +1,135 @@
+"""Push state to the web control page over WebSockets, and take its commands back.
+
+The page used to poll `/state` every 4s and `/timer/state` every second, so each
+open tab cost a steady stream of HTTP parses and JSON dumps on the one event loop,
+and still showed state up to 4s old. Instead the page opens one WebSocket on `/ws`
+(served by the existing adafruit_httpserver `Server`) and:
+
+* receives `{"state": {...}}` / `{"timer": {...}}` messages only when something
+  changes — the full state when it connects, then just the fields that differ
+  from the last message of that kind;
+* sends commands (slider drags, buttons) as the same JSON object `POST /state`
+  takes, handed to `handle_state_change()`.
+
+Changes are pushed from the places that already announce them: code.py's
+`publish_state()` and `Timer.publish_state()`. Each change is serialized once,
+whatever the number of clients.
+
+    live = LiveClients(handle_state_change, snapshot)   # snapshot() -> {kind: state}
+
+    @server.route("/ws")
+    def ws(request):
+        return live.connect(request)
+
+    live.push("state", tree.state())   # on a change
+    live.poll()                        # from a task, often
+
+Sending writes a few hundred bytes on a non-blocking socket, which goes straight
+into the TCP send buffer; a client whose connection fails is dropped.
+"""
+
+import json
+
+from adafruit_httpserver import Websocket
+
+MAX_CLIENTS = 4
+MAX_MESSAGES = 4        # commands read per client per poll()
+
+
+class LiveClients:
+    def __init__(self, command_handler, snapshot, max_clients=MAX_CLIENTS):
+        self._handler = command_handler
+        self._snapshot = snapshot
+        self._max = max_clients
+        self._clients = []
+        self._fresh = []        # connected since the last poll(); need the full state
+        self._last = {}         # kind -> last pushed dict
+
+    @property
+    def count(self):
+        return len(self._clients)
+
+    def connect(self, request):
+        """The route handler's response for a WebSocket upgrade request.
+
+        Over `max_clients`, the oldest connection is closed (a tab left open)."""
+        ws = Websocket(request)
+        if len(self._clients) >= self._max:
+            self._drop(self._clients[0])
+        self._clients.append(ws)
+        self._fresh.append(ws)
+        return ws
+
+    def _drop(self, ws):
+        try:
+            ws.close()
+        except Exception:
+            pass
+        if ws in self._clients:
+            self._clients.remove(ws)
+        if ws in self._fresh:
+            self._fresh.remove(ws)
+
+    def _send(self, ws, message):
+        try:
+            ws.send_message(message, fail_silently=True)
+        except Exception as e:
+            print(f"WebSocket client dropped: {e}")
+            self._drop(ws)
+
+    def push(self, kind, state):
+        """Send the fields of `state` that changed since the last push of `kind`."""
+        last = self._last.get(kind)
+        self._last[kind] = state
+        if not self._clients:
+            return
+        if last is None:
+            delta = state
+        else:
+            delta = {key: value for key, value in state.items() if last.get(key) != value}
+            if not delta:
+                return
+        message = json.dumps({kind: delta})
+        for ws in self._clients[:]:
+            if ws not in self._fresh:
+                self._send(ws, message)
+
+    def poll(self):
+        """Greet new clients, read their commands, forget closed ones.
+
+        Returns True if any command arrived."""
+        if not self._clients:
+            return False
+        if self._fresh:
+            # Their upgrade response went out after connect() returned. Anything
+            # that changed unannounced goes to the others as a delta first, so
+            # everyone agrees on what was last sent.
+            snapshot = self._snapshot()
+            for kind, state in snapshot.items():
+                self.push(kind, state)
+            for ws in self._fresh[:]:
+                for kind, state in snapshot.items():
+                    self._send(ws, json.dumps({kind: state}))
+            self._fresh.clear()
+
+        got = False
+        for ws in self._clients[:]:
+            for _ in range(MAX_MESSAGES):
+                if ws.closed:
+                    break
+                try:
+                    message = ws.receive(fail_silently=True)
+                except Exception as e:
+                    print(f"WebSocket client dropped: {e}")
+                    self._drop(ws)
+                    break
+                if message is None:
+                    break
+                got = True
+                try:
+                    self._handler(json.loads(message))
+                except Exception as e:
+                    print(f"Error handling WebSocket command {message}: {e}")
+            if ws.closed and ws in self._clients:
+                self._clients.remove(ws)
+        return got
@@ -1,19 +1,31 @@
 """MQTT utilities and state management."""
 
 import json
+import time
+
+from util import trace
 
 # Global MQTT client instance, to be set by code.py
 mqtt_client = None
 
+# Outbound queue: topic -> (message, retain, force), latest message per topic.
+_pending = {}
+# topic -> hash of the payload last sent on it, to skip unchanged republishes.
+_sent = {}
+
 # MQTT topics
 MQTT_TOPIC_STATE = "mr_tree/state"
 MQTT_TOPIC_SET = "mr_tree/set"
+MQTT_TOPIC_STATE_BIN = "mr_tree/state/bin"  # binary protocol (util/binproto.py)
+MQTT_TOPIC_SET_BIN = "mr_tree/set/bin"
 MQTT_TOPIC_AVAILABILITY = "mr_tree/status"
 MQTT_DISCOVERY_PREFIX = "homeassistant"
 MQTT_DISCOVERY_TOPIC = f"{MQTT_DISCOVERY_PREFIX}/light/mr_tree/config"
 MQTT_TIMER_STATE = "mr_tree/timer/state"
 MQTT_TIMER_SET = "mr_tree/timer/set"
 MQTT_TIMER_DISCOVERY_TOPIC = f"{MQTT_DISCOVERY_PREFIX}/sensor/mr_tree_timer/config"
+MQTT_DIAGNOSTICS_STATE = "mr_tree/diagnostics"
+MQTT_STALLS_STATE = "mr_tree/stalls"
 
 def set_mqtt_client(client):
     """Set the global MQTT client instance.
@@ -24,24 +36,63 @@ def set_mqtt_client(client):
     global mqtt_client
     mqtt_client = client
 
-def publish_message(topic, message, retain=False):
-    """Publish a message to MQTT.
+def publish_message(topic, message, retain=False, force=False):
+    """Queue a message for MQTT; `drain_messages()` sends it.
+
+    Only the latest message per topic is kept, so a burst of updates (a dial
+    being turned, a string of HA commands) costs one send per topic. When it is
+    sent, a message identical to the last one sent on its topic is skipped unless
+    `force` is set.
 
     Args:
         topic: The MQTT topic to publish to
         message: The message to publish (will be converted to JSON if dict)
         retain: Whether to retain the message
+        force: Send even if unchanged since the last send
+    """
+    _pending[topic] = (message, retain, force)
+
+def forget_sent():
+    """Forget what was last sent, so everything goes out again (e.g. on reconnect)."""
+    _sent.clear()
+
+def drain_messages(budget=0.002):
+    """Serialize and send queued messages for at most `budget` seconds.
+
+    Messages stay queued while the client is disconnected or the socket still
+    holds the previous send. Returns True if the budget ran out with messages
+    still waiting to go.
     """
-    if mqtt_client is None:
-        print("Warning: MQTT client not initialized")
-        return
-
-    try:
-        if isinstance(message, dict):
-            message = json.dumps(message)
-        mqtt_client.publish(topic, message, retain=retain)
-        print(f"MQTT >> {topic}: {message}")
-    except Exception as e:
-        print(f"Error publishing MQTT message to {topic}: {e}")
-        print(f"Message content: {message}")
-        print(f"Retain flag: {retain}")
\ No newline at end of file
+    if mqtt_client is None or not mqtt_client.is_connected:
+        return False
+    start = time.monotonic()
+    while _pending:
+        if mqtt_client.backlog:
+            return False  # wait for the socket to take the last send
+        topic = next(iter(_pending))
+        message, retain, force = _pending.pop(topic)
+        trace.begin(trace.PUBLISH)
+        try:
+            if isinstance(message, dict):
+                message = json.dumps(message)
+            digest = hash(bytes(message) if isinstance(message, bytearray) else message)
+            if force or _sent.get(topic) != digest:
+                if mqtt_client.publish(topic, message, retain=retain):
+                    _sent[topic] = digest
+                    print(f"MQTT >> {topic}: {message}")
+                elif topic not in _pending:
+                    _pending[topic] = (message, retain, force)  # retry next pass
+                    return False
+        except Exception as e:
+            print(f"Error publishing MQTT message to {topic}: {e}")
+            print(f"Message content: {message}")
+            print(f"Retain flag: {retain}")
+            # Likely a dropped socket: keep it for after the reconnect, unless a
+            # newer message for the topic was queued meanwhile.
+            _pending.setdefault(topic, (message, retain, force))
+            return False
+        finally:
+            trace.end(trace.PUBLISH)
+        if time.monotonic() - start >= budget:
+            return bool(_pending)
+    return False
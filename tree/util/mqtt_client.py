@@ -0,0 +1,419 @@
+"""A small MQTT 3.1.1 client whose polling never waits on the socket.
+
+MiniMQTT's `loop(timeout)` reads with blocking socket calls: a poll with nothing
+waiting costs the full socket timeout, and a packet arriving in pieces blocks
+until the rest shows up. On one cooperative asyncio loop that time comes straight
+out of the render loop, which is why handle_mqtt used to stand aside during fades
+(and commands lagged behind every sprout and drain).
+
+Here the socket is never blocking. `poll(budget)` reads whatever bytes
+are already waiting into a fixed receive buffer, parses the complete packets in it
+and dispatches them, and returns. A packet that has only partly arrived stays in
+the buffer until the next poll. Each poll stops after `budget` seconds even if more
+data is waiting, and returns True so the caller can yield and come straight back.
+Its cost therefore depends on the bytes that arrived, not on a timeout.
+
+Outgoing packets are written without blocking too. Whatever the socket won't take
+yet is kept (up to `OUT_LIMIT` bytes) and flushed on the next poll.
+
+**Connecting** is non-blocking as well, so a broker restart never freezes the
+render loop. `start()` begins a connection attempt and each `poll()` advances it one
+step:
+
+    IDLE --start()/retry due--> CONNECTING --CONNECT sent--> HANDSHAKE --CONNACK--> CONNECTED
+      ^                                                                                  |
+      +------ any failure, timeout or lost connection: close, retry after a backoff ----+
+
+CONNECTING opens a non-blocking socket and starts the TCP connect. The CONNECT
+packet waits in the output buffer and is written as soon as the socket takes it.
+HANDSHAKE reads the CONNACK the same way `poll()` reads everything else. An attempt
+has `connect_timeout` seconds to reach CONNECTED. Failed attempts retry after 1s,
+then 2s, 4s and so on, up to `RETRY_MAX`. `on_connect` runs on CONNECTED. That is
+where the caller resubscribes and queues its announcements, which it should spread
+over later passes (code.py sends one per pass, and only once `backlog` has drained).
+The one step that can still block is DNS: `getaddrinfo` has no non-blocking form.
+It runs on the first attempt only and the result is cached. It costs nothing when
+the broker is an IP address.
+
+It covers what the tree uses: CONNECT with credentials and a will, SUBSCRIBE,
+PUBLISH (QoS 0 out, QoS 0/1 in), keep-alive pings and DISCONNECT, with the MiniMQTT
+callback signatures code.py already uses (`on_connect(client, userdata, flags, rc)`
+and `on_message(client, topic, message)`).
+"""
+
+import errno
+import random
+import struct
+import time
+
+OUT_LIMIT = 4096       # bytes of unsent output kept before publishes are dropped
+RX_SIZE = 2048         # receive buffer; larger inbound packets are skipped
+
+_CONNECT = 0x10
+_CONNACK = 0x20
+_PUBLISH = 0x30
+_PUBACK = 0x40
+_SUBSCRIBE = 0x82
+_SUBACK = 0x90
+_PINGREQ = b"\xc0\x00"
+_PINGRESP = 0xD0
+_DISCONNECT = b"\xe0\x00"
+
+RETRY_MAX = 30         # seconds between connection attempts, at most
+
+_WOULD_BLOCK = (errno.EAGAIN, getattr(errno, "EWOULDBLOCK", errno.EAGAIN), errno.ETIMEDOUT)
+# While the TCP connect is still in flight, reads and writes fail with these.
+_PENDING = _WOULD_BLOCK + (errno.EINPROGRESS, getattr(errno, "EALREADY", 114), errno.ENOTCONN)
+
+IDLE = 0
+CONNECTING = 1
+HANDSHAKE = 2
+CONNECTED = 3
+
+
+class MQTTError(Exception):
+    pass
+
+
+def _length(n):
+    """MQTT variable-length 'remaining length' encoding."""
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return out
+
+
+def _string(s):
+    if isinstance(s, str):
+        s = s.encode()
+    return struct.pack(">H", len(s)) + s
+
+
+class MQTTClient:
+    def __init__(self, broker, port=1883, username=None, password=None, socket_pool=None,
+                 client_id=None, keep_alive=60, connect_timeout=5):
+        self.broker = broker
+        self.port = port
+        self.username = username
+        self.password = password
+        self.pool = socket_pool
+        self.client_id = client_id or f"mr_tree-{random.randint(0, 0xFFFFFF):06x}"
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.on_connect = None
+        self.on_message = None
+        self.retained = False       # whether the message on_message has is a retained one
+        # Topics whose payloads are handed to on_message as a memoryview into the
+        # receive buffer (valid only during the call) instead of decoded text.
+        self.raw_topics = set()
+        self._will = None
+        self._sock = None
+        self._state = IDLE
+        self._addr = None
+        self._retry_at = None       # when the next connection attempt is due
+        self._deadline = 0.0        # when the current attempt gives up
+        self._backoff = 1
+        self._rx = bytearray(RX_SIZE)
+        self._rx_view = memoryview(self._rx)
+        self._rx_len = 0
+        self._skip = 0              # bytes left of an oversized packet being discarded
+        self._out = b""             # output the socket hasn't taken yet
+        self._pid = 0
+        self._last_sent = 0.0
+        self._ping_at = None        # when an unanswered PINGREQ went out
+
+    @property
+    def is_connected(self):
+        return self._state == CONNECTED
+
+    @property
+    def backlog(self):
+        """Bytes written but not yet taken by the socket."""
+        return len(self._out)
+
+    def will_set(self, topic, msg, retain=False, qos=0):
+        self._will = (topic, msg, retain, qos)
+
+    # ---- connection ---------------------------------------------------
+
+    def start(self):
+        """Begin connecting (or reconnecting) now; `poll()` carries it through."""
+        self._close()
+        self._retry_at = time.monotonic()
+
+    def _begin(self):
+        now = time.monotonic()
+        self._retry_at = None
+        self._deadline = now + self.connect_timeout
+        if self._addr is None:
+            # The one blocking step (there is no non-blocking DNS); cached after.
+            self._addr = self.pool.getaddrinfo(self.broker, self.port)[0][4]
+        sock = self.pool.socket(self.pool.AF_INET, self.pool.SOCK_STREAM)
+        sock.setblocking(False)
+        self._sock = sock
+        self._rx_len = 0
+        self._skip = 0
+        self._ping_at = None
+        self._state = CONNECTING
+        try:
+            sock.connect(self._addr)
+        except OSError as e:
+            if not (e.args and e.args[0] in _PENDING):
+                raise
+        self._out = self._connect_packet()
+
+    def _fail(self, reason):
+        """Drop the connection (or attempt) and schedule the next attempt."""
+        was = self._state
+        self._close()
+        if was == CONNECTED:
+            print(f"MQTT connection lost: {reason}")
+            self._backoff = 1
+        else:
+            print(f"MQTT connection attempt failed: {reason}")
+        print(f"MQTT retrying in {self._backoff}s")
+        self._retry_at = time.monotonic() + self._backoff
+        self._backoff = min(self._backoff * 2, RETRY_MAX)
+
+    def disconnect(self):
+        if self._state == CONNECTED:
+            try:
+                self._sock.send(_DISCONNECT)
+            except OSError:
+                pass
+        self._close()
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._state = IDLE
+        self._out = b""
+        self._retry_at = None
+
+    def _connect_packet(self):
+        flags = 0x02  # clean session
+        payload = _string(self.client_id)
+        if self._will:
+            topic, msg, retain, qos = self._will
+            flags |= 0x04 | (qos << 3) | (0x20 if retain else 0)
+            payload += _string(topic) + _string(msg)
+        if self.username is not None:
+            flags |= 0x80
+            payload += _string(self.username)
+        if self.password is not None:
+            flags |= 0x40
+            payload += _string(self.password)
+        variable = _string("MQTT") + bytes((4, flags)) + struct.pack(">H", self.keep_alive)
+        body = variable + payload
+        return bytes((_CONNECT,)) + _length(len(body)) + body
+
+    # ---- output ---------------------------------------------------------
+
+    def _send(self, packet):
+        """Queue `packet` and write as much of the queue as the socket takes now.
+
+        Returns False (and sends nothing) while not connected."""
+        if self._state != CONNECTED:
+            return False
+        if self._out:
+            if len(self._out) + len(packet) > OUT_LIMIT:
+                print(f"MQTT output backed up ({len(self._out)} bytes); dropping a {len(packet)} byte packet")
+                return False
+            self._out += packet
+        else:
+            self._out = packet
+        self._flush()
+        return True
+
+    def _flush(self):
+        if not self._out:
+            return
+        try:
+            n = self._sock.send(self._out)
+        except OSError as e:
+            if e.args and e.args[0] in (_PENDING if self._state == CONNECTING else _WOULD_BLOCK):
+                return
+            raise
+        if n:
+            self._last_sent = time.monotonic()
+        self._out = self._out[n:] if n < len(self._out) else b""
+
+    def _next_pid(self):
+        self._pid = self._pid % 0xFFFF + 1
+        return self._pid
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        if isinstance(msg, str):
+            msg = msg.encode()
+        elif not isinstance(msg, (bytes, bytearray)):
+            msg = str(msg).encode()
+        variable = _string(topic)
+        if qos:
+            variable += struct.pack(">H", self._next_pid())
+        first = _PUBLISH | (qos << 1) | (1 if retain else 0)
+        return self._send(bytes((first,)) + _length(len(variable) + len(msg)) + variable + msg)
+
+    def subscribe(self, topic, qos=0):
+        body = struct.pack(">H", self._next_pid()) + _string(topic) + bytes((qos,))
+        return self._send(bytes((_SUBSCRIBE,)) + _length(len(body)) + body)
+
+    # ---- input ----------------------------------------------------------
+
+    def poll(self, budget=0.002):
+        """Advance the connection and read and dispatch what has already arrived, for
+        at most `budget` seconds.
+
+        Returns True if it stopped with data still waiting (call again soon)."""
+        state = self._state
+        if state == IDLE:
+            if self._retry_at is not None and time.monotonic() >= self._retry_at:
+                try:
+                    self._begin()
+                except Exception as e:
+                    self._fail(e)
+            return False
+        try:
+            if state == CONNECTING:
+                self._flush()
+                if self._out:
+                    self._check_deadline()
+                    return False
+                self._state = HANDSHAKE  # CONNECT is out; the CONNACK comes next
+            else:
+                self._flush()
+            more = self._read(budget)
+            if self._state == HANDSHAKE:
+                self._check_deadline()
+            elif self._state == CONNECTED:
+                self._keep_alive()
+            return more
+        except Exception as e:
+            self._fail(e)
+            return False
+
+    def _read(self, budget):
+        start = time.monotonic()
+        while True:
+            free = RX_SIZE - self._rx_len
+            try:
+                n = self._sock.recv_into(self._rx_view[self._rx_len:], free)
+            except OSError as e:
+                if e.args and e.args[0] in _WOULD_BLOCK:
+                    return False
+                raise
+            if n == 0:
+                raise MQTTError("connection closed by broker")
+            self._rx_len += n
+            self._ping_at = None  # anything from the broker shows it's alive
+            self._parse()
+            if self._state == IDLE:
+                return False
+            if time.monotonic() - start >= budget:
+                return True
+
+    def _check_deadline(self):
+        if time.monotonic() > self._deadline:
+            raise MQTTError(f"no CONNACK within {self.connect_timeout}s")
+
+    def _keep_alive(self):
+        now = time.monotonic()
+        if self._ping_at is not None:
+            if now - self._ping_at > self.keep_alive:
+                raise MQTTError("no PINGRESP from broker")
+        elif now - self._last_sent >= self.keep_alive / 2:
+            self._ping_at = now
+            self._send(_PINGREQ)
+
+    def _parse(self):
+        rx = self._rx
+        pos = 0
+        end = self._rx_len
+        if self._skip:
+            dropped = min(self._skip, end)
+            self._skip -= dropped
+            pos = dropped
+        while end - pos >= 2:
+            # Fixed header: type byte, then 1-4 bytes of remaining length.
+            length = 0
+            shift = 0
+            k = pos + 1
+            complete = False
+            while k < end:
+                byte = rx[k]
+                k += 1
+                length |= (byte & 0x7F) << shift
+                if not byte & 0x80:
+                    complete = True
+                    break
+                shift += 7
+                if shift > 21:
+                    raise MQTTError("malformed packet length")
+            if not complete:
+                break  # the length itself hasn't fully arrived
+            total = k - pos + length
+            if total > RX_SIZE:
+                print(f"MQTT packet of {total} bytes is larger than the receive buffer; skipping it")
+                self._skip = total - (end - pos)
+                pos = end
+                break
+            if end - pos < total:
+                break
+            self._handle(rx[pos], k, k + length)
+            pos += total
+        if pos:
+            # Keep the unparsed tail at the start of the buffer.
+            remaining = end - pos
+            if remaining:
+                rx[0:remaining] = rx[pos:end]
+            self._rx_len = remaining
+
+    def _handle(self, first, start, stop):
+        rx = self._rx
+        kind = first & 0xF0
+        if self._state == HANDSHAKE:
+            if kind != _CONNACK:
+                raise MQTTError(f"expected CONNACK, got 0x{first:02x}")
+            flags, rc = rx[start], rx[start + 1]
+            if rc != 0:
+                raise MQTTError(f"broker refused connection (rc={rc})")
+            self._state = CONNECTED
+            self._backoff = 1
+            self._last_sent = time.monotonic()
+            print("MQTT connected")
+            if self.on_connect:
+                try:
+                    self.on_connect(self, None, flags, rc)
+                except Exception as e:
+                    print(f"Error in MQTT connect handler: {e}")
+        elif kind == _PUBLISH:
+            qos = (first >> 1) & 0x03
+            topic_len = (rx[start] << 8) | rx[start + 1]
+            k = start + 2
+            topic = str(rx[k:k + topic_len], "utf-8")
+            k += topic_len
+            if qos:
+                pid = (rx[k] << 8) | rx[k + 1]
+                k += 2
+                self._send(bytes((_PUBACK, 2, pid >> 8, pid & 0xFF)))
+            if self.on_message:
+                self.retained = bool(first & 0x01)
+                try:
+                    if topic in self.raw_topics:
+                        self.on_message(self, topic, self._rx_view[k:stop])
+                    else:
+                        self.on_message(self, topic, str(rx[k:stop], "utf-8"))
+                except Exception as e:
+                    print(f"Error in MQTT message handler: {e}")
+        elif kind == _SUBACK:
+            if rx[stop - 1] == 0x80:
+                print("MQTT subscription refused by broker")
+        # PINGRESP and PUBACK need nothing beyond having been read.
@@ -0,0 +1,134 @@
+"""The output stage: frame buffer bytes -> what goes down the wire.
+
+pixelbuf applies brightness itself: every write multiplies each channel by a float,
+and every brightness change rescales the whole buffer. `Output` takes that over. The
+strand's hardware brightness stays at 1.0 and brightness, the `cap` (Tree's
+MAX_BRIGHTNESS) and an optional gamma curve are folded into one 256-entry lookup
+table, rebuilt only when the brightness actually changes. `show(buf)` maps the
+frame through the table into a wire buffer and hands it to `neopixel_write` in one
+call. A brightness-only fade therefore costs one table rebuild plus one blit per
+frame, and the frame buffer always holds the true (unscaled) colors. When neither
+the table nor the dither setting changed since the last frame, only the pixels the
+caller marks dirty are re-mapped (the rest of the wire buffer is still valid).
+
+**Dithering.** Scaling to a low brightness (e.g. 0.06) leaves a channel only ~16
+distinct output levels, so a slow fade steps visibly. With `dither` on, each
+channel rounds its output up or down against a fixed per-pixel, per-channel
+threshold (a golden-ratio sequence), so neighbouring LEDs land on different levels
+and the eye averages them to a finer color than any single LED can show. The table
+is stored as the rounded-down level plus the fractional remainder, so this is the
+same single pass. The tree turns it on during pixel-owning transitions and for
+effects that set `dither = True` (slow color fades); everything else gets the exact,
+undithered mapping.
+"""
+
+from neopixel_write import neopixel_write
+
+# Golden-ratio increment gives a well-spread, low-discrepancy per-pixel dither
+# threshold sequence (no visible banding, unlike a linear ramp).
+_DITHER_STEP = 0.6180339887498949
+
+
+class Output:
+    def __init__(self, strand, cap=1.0, gamma=None, brightness=0.0):
+        self.strand = strand
+        self.pin = strand.pin
+        self.n = len(strand)
+        self.cap = cap
+        self.gamma = gamma
+        self.dither = False
+        self._shown_dither = None  # dither setting the wire buffer was built with
+        self._brightness = min(max(brightness, 0.0), cap)
+        self._stale = True
+        self._frac_stale = True
+        self._lut = bytearray(256)   # rounded-down output level per buffer value
+        self._frac = bytearray(256)  # remainder, 0..255, compared against a threshold
+        self._wire = bytearray(self.n * 3)
+        self._zeros = bytes(self.n * 3)
+        self._linear = True
+        # Per-pixel threshold (0..255); channels are offset so the dither noise stays
+        # neutral rather than tinting the color.
+        th = bytearray(self.n * 3)
+        for i in range(self.n):
+            t = (i * _DITHER_STEP) % 1.0
+            for c in range(3):
+                th[3 * i + c] = int(t * 256)
+                t += 0.333
+                if t > 1.0:
+                    t -= 1.0
+        self._threshold = th
+        strand.brightness = 1.0  # scaling happens here, not in pixelbuf
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def brightness(self):
+        return self._brightness
+
+    @brightness.setter
+    def brightness(self, value):
+        if value < 0.0:
+            value = 0.0
+        elif value > self.cap:
+            value = self.cap
+        if value != self._brightness:
+            self._brightness = value
+            self._stale = True
+
+    @property
+    def changed(self):
+        """Whether showing now would send different bytes for an unchanged buffer."""
+        return self._stale or self.dither != self._shown_dither
+
+    def set_gamma(self, gamma):
+        """None (or 1.0) for linear output, e.g. 2.2 for a perceptual curve."""
+        self.gamma = gamma
+        self._stale = True
+
+    def _build(self, with_frac):
+        b = self._brightness
+        gamma = self.gamma
+        lut, frac = self._lut, self._frac
+        linear = not gamma or gamma == 1.0
+        for v in range(256):
+            # Linear matches pixelbuf exactly: int(value * brightness).
+            d = v * b if linear else (v / 255) ** gamma * 255 * b
+            lo = int(d)
+            lut[v] = lo
+            if with_frac:
+                frac[v] = int((d - lo) * 256)
+        self._linear = linear
+        self._stale = False
+        self._frac_stale = not with_frac
+
+    def show(self, buf, lo=0, hi=None):
+        """Map pixels [lo, hi) of `buf` onto the wire and transmit the whole strand.
+
+        The span is only honored when nothing else changed; a new table or dither
+        setting re-maps every pixel."""
+        if self.changed:
+            lo, hi = 0, self.n
+        elif hi is None:
+            hi = self.n
+        if self._stale or (self.dither and self._frac_stale):
+            # The remainders are only needed to dither; skip them otherwise.
+            self._build(self.dither)
+        self._shown_dither = self.dither
+        b = self._brightness
+        wire = self._wire
+        start, stop = 3 * lo, 3 * hi
+        if b <= 0.0:
+            wire[:] = self._zeros
+        elif b >= 1.0 and self._linear:
+            wire[:] = buf
+        elif self.dither:
+            lut, frac, th = self._lut, self._frac, self._threshold
+            for k in range(start, stop):
+                v = buf[k]
+                wire[k] = lut[v] + 1 if frac[v] > th[k] else lut[v]
+        else:
+            lut = self._lut
+            for k in range(start, stop):
+                wire[k] = lut[buf[k]]
+        neopixel_write(self.pin, wire)
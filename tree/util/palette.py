@@ -0,0 +1,175 @@
+"""Precomputed color gradients, so effects index a table instead of doing color math.
+
+`colorsys.hsv_to_rgb` plus a list comprehension per LED per frame was the single
+largest per-frame CPU cost on the board, and every call allocated. A `Palette` is a
+fixed-size table of colors sampled once from a gradient; effects turn a 0..1
+position (a hue, a progress, a fade amount) into an integer index and read the
+color straight out of it.
+
+Colors are stored packed as 0xRRGGBB ints in an `array('L')`: ~1KB per 256-entry
+table, and reading one allocates nothing (CircuitPython small ints are immediate).
+NeoPixel accepts a packed int wherever it takes an (r, g, b) tuple, so a hot loop
+can assign `pixels[i] = colors[k]` directly; `unpack` splits one when the channels
+are needed (e.g. to scale it).
+
+In a hot loop, hoist the table and do the indexing inline:
+
+    colors, size = palette.colors, palette.size
+    for i in ...:
+        pixels[i] = colors[int(hue * size) % size]      # wrapping (hue wheel)
+        pixels[i] = colors[int(u * palette.last)]        # clamped ramp, u in 0..1
+
+`at(u)` does the same with bounds handling, `sample(u)` interpolates between
+neighbouring entries for the few places that need a smooth color rather than a
+quantized one, and `blend(other, t)` mixes two palettes into a new table.
+
+The shared tables (`hue_wheel()`, `timer_ramp()`, `blossom()`) are built on first
+use and cached for the life of the program.
+"""
+
+from array import array
+from colorsys import hsv_to_rgb
+
+SIZE = 256
+
+
+def pack(r, g, b):
+    return (int(r) << 16) | (int(g) << 8) | int(b)
+
+
+def unpack(c):
+    return ((c >> 16) & 0xFF, (c >> 8) & 0xFF, c & 0xFF)
+
+
+class Palette:
+    def __init__(self, colors, wrap=False):
+        """`colors`: packed 0xRRGGBB ints. `wrap`: positions past 1.0 wrap around
+        (a color wheel) instead of clamping to the last entry (a ramp)."""
+        self.colors = array('L', colors)
+        self.size = len(self.colors)
+        self.last = self.size - 1
+        self.wrap = wrap
+
+    @classmethod
+    def from_function(cls, fn, size=SIZE, wrap=False):
+        """Sample fn(u) -> (r, g, b) floats in 0..1 at `size` evenly spaced u.
+
+        A wrapping palette samples u in [0, 1) (the last entry is one step short of
+        the first); a ramp samples [0, 1] inclusive so both ends are exact.
+        """
+        div = size if wrap else max(1, size - 1)
+        colors = []
+        for k in range(size):
+            r, g, b = fn(k / div)
+            colors.append(pack(r * 255, g * 255, b * 255))
+        return cls(colors, wrap)
+
+    @classmethod
+    def from_stops(cls, stops, size=SIZE, wrap=False):
+        """Linear gradient through [(position 0..1, (r, g, b) 0-255), ...] stops."""
+        stops = sorted(stops)
+        div = size if wrap else max(1, size - 1)
+        colors = []
+        j = 0
+        for k in range(size):
+            u = k / div
+            while j < len(stops) - 2 and stops[j + 1][0] < u:
+                j += 1
+            (p0, a), (p1, b) = stops[j], stops[min(j + 1, len(stops) - 1)]
+            f = (u - p0) / (p1 - p0) if p1 > p0 else 0.0
+            f = min(max(f, 0.0), 1.0)
+            colors.append(pack(*(a[c] + (b[c] - a[c]) * f for c in range(3))))
+        return cls(colors, wrap)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, k):
+        return self.colors[k]
+
+    def index(self, u):
+        """Table index for position u (0..1; wraps or clamps per the palette)."""
+        if self.wrap:
+            return int(u * self.size) % self.size
+        if u <= 0.0:
+            return 0
+        if u >= 1.0:
+            return self.last
+        return int(u * self.last + 0.5)
+
+    def at(self, u):
+        """Packed color at position u."""
+        return self.colors[self.index(u)]
+
+    def sample(self, u):
+        """(r, g, b) at position u, interpolated between the neighbouring entries."""
+        if self.wrap:
+            x = (u % 1.0) * self.size
+        else:
+            x = min(max(u, 0.0), 1.0) * self.last
+        k = int(x)
+        f = x - k
+        a = self.colors[k % self.size]
+        b = self.colors[(k + 1) % self.size] if (self.wrap or k < self.last) else a
+        return (
+            int(((a >> 16) & 0xFF) * (1.0 - f) + ((b >> 16) & 0xFF) * f),
+            int(((a >> 8) & 0xFF) * (1.0 - f) + ((b >> 8) & 0xFF) * f),
+            int((a & 0xFF) * (1.0 - f) + (b & 0xFF) * f),
+        )
+
+    def blend(self, other, t):
+        """A new palette mixing this one (t=0) with `other` (t=1), entry by entry."""
+        if other.size != self.size:
+            raise ValueError("palettes must be the same size to blend")
+        s = 1.0 - t
+        colors = []
+        for a, b in zip(self.colors, other.colors):
+            colors.append(pack(
+                ((a >> 16) & 0xFF) * s + ((b >> 16) & 0xFF) * t,
+                ((a >> 8) & 0xFF) * s + ((b >> 8) & 0xFF) * t,
+                (a & 0xFF) * s + (b & 0xFF) * t,
+            ))
+        return Palette(colors, self.wrap)
+
+
+# ---- shared tables ---------------------------------------------------
+
+_cache = {}
+
+
+def hue_wheel():
+    """Full-saturation, full-value hue wheel; wraps (red at 0 and again at 1)."""
+    p = _cache.get('hue_wheel')
+    if p is None:
+        p = Palette.from_function(lambda h: hsv_to_rgb(h, 1.0, 1.0), wrap=True)
+        _cache['hue_wheel'] = p
+    return p
+
+
+def _timer_hue(progress):
+    # Remaining-time fraction -> hue: green (0.33) at 100% fading to yellow (0.17)
+    # at 50%, then to red (0.0) at 20%, and red below that.
+    if progress > 0.5:
+        return 0.17 + (progress - 0.5) * 2 * 0.16
+    if progress > 0.2:
+        return (progress - 0.2) / 0.3 * 0.17
+    return 0.0
+
+
+def timer_ramp():
+    """The timer's countdown color, indexed by remaining fraction: red at 0, green at 1."""
+    p = _cache.get('timer_ramp')
+    if p is None:
+        p = Palette.from_function(lambda u: hsv_to_rgb(_timer_hue(u), 1.0, 1.0))
+        _cache['timer_ramp'] = p
+    return p
+
+
+def blossom(white, pink):
+    """Cherry-blossom twinkle: `white` at 0 blending to `pink` at 1."""
+    key = ('blossom', white, pink)
+    p = _cache.get(key)
+    if p is None:
+        p = Palette.from_stops([(0.0, white), (1.0, pink)])
+        _cache[key] = p
+    return p
@@ -0,0 +1,156 @@
+"""The last applied state, kept in `microcontroller.nvm` to restore at boot.
+
+Without it the tree only learns its remembered look from the retained command HA
+re-sends on mr_tree/set once WiFi and the broker are up, so offline, or with a
+slow broker, it never gets there. code.py reads this record before WiFi and hands
+it to the boot sequence, which applies it when the startup rainbow finishes.
+
+The record also keeps a CRC of the last HA command applied, so HA's retained
+replay of that same command can be told apart from one it sent while the tree
+was down (`is_last_command()`).
+
+One 31-byte record at `offset`:
+
+    offset  field
+    0-1     b"MT"
+    2       LAYOUT (2)
+    3-13    the tree's state, a util/binproto.py record (power, color,
+            brightness, effect, speed, param, paused)
+    14-17   timer duration, seconds
+    18-21   timer remaining, seconds (paused timers only)
+    22      timer state: 0 idle, 1 active, 2 paused
+    23-26   CRC-32 of the last HA command's payload (0 for none)
+    27-30   CRC-32 of bytes 0-26
+
+A record that doesn't check out (blank or worn flash, another layout) is ignored.
+
+Flash wears with every write, and a dragged slider or a turned dial changes the
+state many times a second, so `update()` only builds the record in RAM and marks
+it dirty; `poll()` writes it when it differs from what was last written and at
+most once per `min_interval` seconds. The record goes into `nvm` in one slice
+assignment, which CircuitPython commits as one write.
+
+    store = StateStore(microcontroller.nvm)
+    restored = store.load(Tree.EFFECTS)      # (params, timer) or None
+    store.update(tree.state_into(buf), timer_state)   # on every change
+    store.note_command(payload)              # once an HA command is applied
+    store.poll()                             # from a task, every second or so
+"""
+
+import struct
+from binascii import crc32
+
+from util import binproto
+
+MAGIC = b"MT"
+LAYOUT = 2
+FORMAT = "<2sB11sIIBI"
+BODY_SIZE = struct.calcsize(FORMAT)
+SIZE = BODY_SIZE + 4
+
+MIN_INTERVAL_S = 10.0
+
+TIMER_STATES = ("idle", "active", "paused")
+
+
+class StateStore:
+    def __init__(self, nvm, offset=0, min_interval=MIN_INTERVAL_S):
+        self._nvm = nvm
+        self._offset = offset
+        self.min_interval = min_interval
+        self._buf = bytearray(SIZE)     # the record to write next
+        self._saved = bytearray(SIZE)   # what was last read or written
+        self._dirty = False
+        self._written_at = None
+        self._command = 0               # CRC of the last HA command applied
+        self.writes = 0
+
+    def load(self, effects):
+        """The stored state as (command params, timer), or None if there isn't one.
+
+        `params` is the field dict a command parses to (see binproto), so it goes
+        through handle_state_change() like any other; a timer effect carries its
+        duration in `effect_params`. `timer` is {"duration", "remaining", "state"}.
+        """
+        try:
+            data = bytes(self._nvm[self._offset:self._offset + SIZE])
+        except Exception as e:
+            print(f"Saved state unreadable: {e}")
+            return None
+        if (len(data) < SIZE or data[:2] != MAGIC or data[2] != LAYOUT
+                or struct.unpack_from("<I", data, BODY_SIZE)[0] != crc32(data[:BODY_SIZE])):
+            return None
+        _, _, record, duration, remaining, timer, command = struct.unpack_from(FORMAT, data, 0)
+        try:
+            params = binproto.decode_command(record, effects)
+        except ValueError as e:
+            print(f"Saved state ignored: {e}")
+            return None
+        self._saved[:] = data
+        self._command = command
+        if params.get("effect") == "timer":
+            params["effect_params"] = {"duration": duration}
+        state = TIMER_STATES[timer] if timer < len(TIMER_STATES) else "idle"
+        return params, {"duration": duration, "remaining": remaining, "state": state}
+
+    def update(self, record, timer=None):
+        """Note the current state: `record` from Tree.state_into(), `timer` the
+        Timer state dict (or None when no timer is loaded)."""
+        if timer is None:
+            duration = remaining = state = 0
+        else:
+            duration = int(timer["duration"])
+            state = TIMER_STATES.index(timer["state"]) if timer["state"] in TIMER_STATES else 0
+            remaining = int(timer["remaining"]) if state == 2 else 0
+        struct.pack_into(FORMAT, self._buf, 0, MAGIC, LAYOUT, bytes(record[:binproto.SIZE]),
+                         duration, remaining, state, self._command)
+        self._seal()
+
+    def note_command(self, payload):
+        """Note that the HA command `payload` (str or bytes) has been applied; it's
+        saved with the state on the next write."""
+        self._command = command_crc(payload)
+        if self._buf[:2] == MAGIC:
+            struct.pack_into("<I", self._buf, BODY_SIZE - 4, self._command)
+            self._seal()
+
+    def is_last_command(self, payload):
+        """Whether `payload` is the last HA command applied, here or (after a
+        restore) before the tree went down: a retained replay of it is no newer
+        than the state it left."""
+        return self._command != 0 and self._command == command_crc(payload)
+
+    def _seal(self):
+        struct.pack_into("<I", self._buf, BODY_SIZE, crc32(self._buf[:BODY_SIZE]))
+        self._dirty = self._buf != self._saved
+
+    def poll(self, now):
+        """Write the noted state if it changed and `min_interval` has passed since
+        the last write. Returns whether it wrote."""
+        if not self._dirty:
+            return False
+        if self._written_at is not None and now - self._written_at < self.min_interval:
+            return False
+        return self.flush(now)
+
+    def flush(self, now):
+        """Write the noted state now if it changed (before a reset, say)."""
+        if not self._dirty:
+            return False
+        try:
+            self._nvm[self._offset:self._offset + SIZE] = self._buf
+        except Exception as e:
+            print(f"Saving state failed: {e}")
+            return False
+        self._saved[:] = self._buf
+        self._dirty = False
+        self._written_at = now
+        self.writes += 1
+        return True
+
+
+def command_crc(payload):
+    """CRC-32 of an MQTT payload, as str (JSON topics) or bytes (raw topics)."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return crc32(payload)
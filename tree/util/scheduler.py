@@ -0,0 +1,120 @@
+"""Deadline-based frame pacing for the render loop.
+
+Sleeping a fixed interval after each frame makes the real period work + sleep, so
+the frame rate sags with an expensive effect and every MQTT/HTTP stall pushes all
+later frames back. `FrameScheduler` instead keeps an absolute deadline for the next
+frame: `wait()` measures how long the frame's render+show took, sleeps only for the
+slack left before the deadline, and advances the deadline by exactly one period. A
+fade or the timer therefore ticks at a steady cadence whichever effect is running.
+
+A frame that starts a little late runs immediately and the grid absorbs it. When
+the loop falls a whole period or more behind — a long effect, or a blocking MQTT
+or HTTP call — the missed slots are dropped on purpose and the deadline re-aligned,
+instead of firing a burst of back-to-back catch-up frames (the renderers are
+time-based, so a skipped frame loses nothing). Each dropped slot is counted.
+
+    sched = FrameScheduler(1 / 30)
+    while True:
+        sched.begin()
+        render_and_show()
+        sched.period = 1 / 60 if fading else 1 / 30
+        await sched.wait()
+
+`stats()` reports the achieved fps, the jitter (how late frames start against
+their deadlines, on average), the render work time (mean, p95, worst) and the dropped-frame count
+over the last `window` frames.
+"""
+
+import asyncio
+import time
+from array import array
+
+
+class FrameScheduler:
+    def __init__(self, period, window=64):
+        self._period_ns = int(period * 1e9)
+        self._deadline = None      # monotonic_ns of the next frame's start
+        self._start = None         # monotonic_ns the current frame began
+        self._last_start = None
+        self._window = window
+        self._target = None        # monotonic_ns the last wait() slept until
+        self._intervals = array('L', [0] * window)  # start-to-start, us
+        self._late = array('L', [0] * window)       # start after its deadline, us
+        self._work = array('L', [0] * window)       # render + show, us
+        self._count = 0
+        self.dropped = 0
+
+    @property
+    def period(self):
+        return self._period_ns / 1e9
+
+    @period.setter
+    def period(self, value):
+        ns = int(value * 1e9)
+        if ns != self._period_ns:
+            self._period_ns = ns
+            # Re-anchor on the new cadence from this frame's start, so switching
+            # from the slow idle rate doesn't leave a long-stale deadline behind.
+            if self._start is not None:
+                self._deadline = self._start + ns
+
+    def begin(self):
+        """Mark the start of a frame (call before rendering)."""
+        now = time.monotonic_ns()
+        if self._last_start is not None:
+            k = self._count % self._window
+            self._intervals[k] = min((now - self._last_start) // 1000, 0xFFFFFFFF)
+            self._late[k] = min(max(now - self._target, 0) // 1000, 0xFFFFFFFF)
+        self._last_start = now
+        self._start = now
+        if self._deadline is None:
+            self._deadline = now + self._period_ns
+
+    async def wait(self):
+        """Record the frame's work time and sleep until the next deadline."""
+        now = time.monotonic_ns()
+        if self._start is not None:
+            self._work[self._count % self._window] = min((now - self._start) // 1000, 0xFFFFFFFF)
+            self._count += 1
+        period = self._period_ns
+        deadline = self._deadline if self._deadline is not None else now + period
+        slack = deadline - now
+        if slack <= -period:
+            # A whole slot or more behind: drop the missed slots rather than
+            # rendering them back to back, and re-align to the grid.
+            missed = -slack // period
+            self.dropped += missed
+            deadline += missed * period
+            slack = deadline - now
+        self._target = deadline
+        self._deadline = deadline + period
+        # Late by less than a period: go straight on (but still yield), keeping
+        # the grid so the next frame's shorter wait absorbs the lateness.
+        await asyncio.sleep(slack / 1e9 if slack > 0 else 0)
+
+    def stats(self):
+        """fps, jitter (ms late vs deadline), average/p95/worst work time (ms) and
+        drops, over the last `window` frames."""
+        n = min(self._count, self._window)
+        intervals = [self._intervals[k] for k in range(n) if self._intervals[k]]
+        late = [self._late[k] for k in range(n) if self._intervals[k]]
+        work = [self._work[k] for k in range(n)]
+        result = {
+            "period_ms": round(self._period_ns / 1e6, 1),
+            "fps": 0.0,
+            "jitter_ms": 0.0,
+            "work_ms": 0.0,
+            "work_ms_p95": 0.0,
+            "work_ms_max": 0.0,
+            "dropped": self.dropped,
+        }
+        if intervals:
+            mean = sum(intervals) / len(intervals)
+            result["fps"] = round(1e6 / mean, 1) if mean else 0.0
+            result["jitter_ms"] = round(sum(late) / len(late) / 1000, 2)
+        if work:
+            result["work_ms"] = round(sum(work) / len(work) / 1000, 2)
+            work.sort()
+            result["work_ms_p95"] = round(work[min(len(work) - 1, len(work) * 95 // 100)] / 1000, 2)
+            result["work_ms_max"] = round(work[-1] / 1000, 2)
+        return result
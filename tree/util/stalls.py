@@ -0,0 +1,132 @@
+"""Event-loop stall detection, with the blocked time charged to the task that held it.
+
+Everything runs on one cooperative asyncio loop, so a single blocking call (a
+broker reconnect, a slow HTTP client in `server.poll()`, an I2C read in
+`Controller.poll()`) delays every other task, and the fade is where it shows. Two
+parts find the culprit:
+
+* `track(name, coro)` wraps a task's coroutine. The loop resumes a task by
+  calling its coroutine's `send()` / `throw()`; the wrapper times each of those
+  steps, i.e. each stretch the task ran without yielding.
+* `run()` is the lag monitor: a task that sleeps `interval` and measures how late
+  it wakes. Lateness over `threshold` is a stall, and it is charged to the longest
+  step any tracked task ran since the monitor's last wakeup ("untracked" if none
+  did — GC or the loop itself).
+
+    stalls = StallMonitor()
+    server_task = asyncio.create_task(stalls.track("server", handle_requests()))
+    stall_task = asyncio.create_task(stalls.run())
+
+`stats()` reports the stall count, the worst lag, and per task: stalls, total
+stalled ms and the worst single step.
+"""
+
+import asyncio
+import time
+
+
+class _Tracked:
+    """A coroutine stand-in that times each step of the coroutine it wraps.
+
+    It has the coroutine protocol (`send`, `throw`, `close`, `__await__`), which is
+    all asyncio's create_task needs, on the board and on the host."""
+
+    def __init__(self, monitor, name, coro):
+        self._monitor = monitor
+        self._name = name
+        self._coro = coro
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    def send(self, value):
+        start = time.monotonic_ns()
+        try:
+            return self._coro.send(value)
+        finally:
+            self._monitor._step(self._name, time.monotonic_ns() - start)
+
+    def throw(self, *args):
+        start = time.monotonic_ns()
+        try:
+            return self._coro.throw(*args)
+        finally:
+            self._monitor._step(self._name, time.monotonic_ns() - start)
+
+    def close(self):
+        return self._coro.close()
+
+
+class StallMonitor:
+    def __init__(self, interval=0.01, threshold=0.02):
+        self.interval = interval
+        self.threshold_ns = int(threshold * 1e9)
+        self.stalls = 0
+        self.lag_max_ns = 0
+        self._lag_recent_ns = 0    # worst lag since take_recent_lag()
+        self._tasks = {}           # name -> [stalls, stalled ns, worst step ns]
+        self._step_ns = 0          # longest step since the monitor last woke
+        self._step_name = None
+
+    def track(self, name, coro):
+        """Wrap `coro` (before create_task) so its steps are timed under `name`."""
+        if name not in self._tasks:
+            self._tasks[name] = [0, 0, 0]
+        return _Tracked(self, name, coro)
+
+    def _step(self, name, ns):
+        if ns > self._step_ns:
+            self._step_ns = ns
+            self._step_name = name
+        entry = self._tasks[name]
+        if ns > entry[2]:
+            entry[2] = ns
+
+    async def run(self):
+        """The lag monitor task."""
+        period_ns = int(self.interval * 1e9)
+        while True:
+            expected = time.monotonic_ns() + period_ns
+            self._step_ns = 0
+            self._step_name = None
+            await asyncio.sleep(self.interval)
+            lag = time.monotonic_ns() - expected
+            if lag > self.lag_max_ns:
+                self.lag_max_ns = lag
+            if lag > self._lag_recent_ns:
+                self._lag_recent_ns = lag
+            if lag > self.threshold_ns:
+                self.stalls += 1
+                name = self._step_name or "untracked"
+                entry = self._tasks.get(name)
+                if entry is None:
+                    entry = self._tasks[name] = [0, 0, 0]
+                entry[0] += 1
+                entry[1] += lag
+                print(f"Loop stall: {lag / 1e6:.1f}ms, {name} ran {self._step_ns / 1e6:.1f}ms")
+
+    def take_recent_lag(self):
+        """Worst lag since the last call, ns; starts a new window."""
+        lag, self._lag_recent_ns = self._lag_recent_ns, 0
+        return lag
+
+    def stats(self):
+        return {
+            "threshold_ms": round(self.threshold_ns / 1e6, 1),
+            "stalls": self.stalls,
+            "lag_ms_max": round(self.lag_max_ns / 1e6, 1),
+            "tasks": {
+                name: {
+                    "stalls": n,
+                    "stall_ms": round(total / 1e6, 1),
+                    "step_ms_max": round(worst / 1e6, 1),
+                }
+                for name, (n, total, worst) in self._tasks.items()
+            },
+        }
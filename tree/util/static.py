@@ -0,0 +1,62 @@
+"""Pre-gzipped static assets with strong ETags, and 304s for unchanged JSON.
+
+tools/build_static.py (run by deploy.sh) stores a gzipped copy of each static
+asset in `static/` with a manifest of ETags. `StaticAssets.response()` serves it:
+
+* a request whose If-None-Match carries the asset's ETag gets an empty 304;
+* a client that accepts gzip (every browser) gets the compressed copy, streamed
+  from flash by FileResponse with `Content-Encoding: gzip` — a fraction of the
+  bytes to send, and no decoding or text handling on the board;
+* anything else gets the plain file.
+
+Without a manifest (the build step didn't run) the plain file is served with no
+ETag, as before.
+
+`not_modified(request, etag)` is the same check for dynamic responses: the JSON
+endpoints compute a cheap ETag for their current state and return its 304 before
+building and serializing anything.
+"""
+
+import json
+
+from adafruit_httpserver import FileResponse, Response
+from adafruit_httpserver.status import Status
+
+NOT_MODIFIED_304 = Status(304, "Not Modified")
+STATIC_DIR = "static"   # relative to code.py, on the board and the host
+
+
+def not_modified(request, etag):
+    """A 304 response if the client already has `etag`, else None."""
+    if etag is not None and etag in (request.headers.get("If-None-Match") or ""):
+        return Response(request, "", status=NOT_MODIFIED_304, headers={"ETag": etag})
+    return None
+
+
+class StaticAssets:
+    def __init__(self, root=STATIC_DIR):
+        self.root = root
+        try:
+            with open(root + "/manifest.json", "r") as f:
+                self._manifest = json.load(f)
+        except (OSError, ValueError):
+            print("No prebuilt static assets (tools/build_static.py); serving them uncompressed")
+            self._manifest = {}
+
+    def response(self, request, name, content_type):
+        """The response for static asset `name` (a file next to code.py)."""
+        entry = self._manifest.get(name)
+        if entry is None:
+            return FileResponse(request, name, root_path=".", content_type=content_type)
+        gzipped = "gzip" in (request.headers.get("Accept-Encoding") or "")
+        etag = entry["etag_gzip"] if gzipped else entry["etag"]
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        # no-cache: the browser may keep it, but revalidates (cheaply, a 304) on use.
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+            return FileResponse(request, entry["gzip"], root_path=self.root,
+                                content_type=entry["type"], headers=headers)
+        return FileResponse(request, name, root_path=".", content_type=entry["type"], headers=headers)
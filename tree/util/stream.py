@@ -0,0 +1,184 @@
+"""Realtime pixel streaming over UDP (DDP), copied straight into the frame buffer.
+
+For music visualizers, xLights sequences, or anything else that computes the
+frames on a bigger machine: the host sends whole frames of RGB bytes and the tree
+just shows them. The wire format is DDP (Distributed Display Protocol, what WLED,
+xLights and LedFx speak), on UDP port 4048:
+
+    offset  field
+    0       flags      0x40 version 1, 0x01 PUSH, 0x02 query, 0x10 timecode
+    1       sequence   low 4 bits: 1-15 cycling, 0 = not used
+    2       data type  (ignored; the data is always 8-bit RGB here)
+    3       dest id    1 = the display
+    4-7     offset     big-endian byte offset into the frame
+    8-9     length     big-endian payload length in bytes
+    10      payload    (after a 4-byte timecode when flag 0x10 is set)
+
+A 100-LED frame is 300 bytes and fits in one packet, but a frame may also arrive in
+several packets at increasing offsets; each payload lands in the buffer at its
+offset, and the packet carrying PUSH (frame-sync) shows the frame. Per packet the
+work is one `recvfrom_into` a preallocated buffer and one slice copy of the payload
+into `FrameBuffer.buf` — no allocation and no per-pixel Python. Brightness, the cap
+and gamma still apply, in the output stage as for any frame.
+
+Sequence numbers, when the sender uses them, drop duplicates and packets that
+arrive after a later one (a stale frame would flicker backwards).
+
+The first packet takes the buffer from the animation (`Tree.start_stream()`), and
+`TIMEOUT_S` without one hands it back. A local change (a command, a dial) ends the
+stream too, and packets are then ignored until the sender has been quiet for
+`TIMEOUT_S`, so a sender that is still running doesn't immediately grab the tree
+back. Packets are ignored while the tree is off.
+
+    stream = StreamReceiver(pool, tree)
+    stream.start(str(wifi.radio.ipv4_address))
+    busy = stream.poll()       # from a task, often
+
+tools/ddp_send.py sends test patterns.
+"""
+
+import struct
+import time
+
+DDP_PORT = 4048
+HEADER = 10
+TIMECODE = 4
+TIMEOUT_S = 2.5
+MAX_PACKETS = 8         # packets handled per poll(), so a flood can't hog the loop
+
+VERSION_MASK = 0xC0
+VERSION_1 = 0x40
+FLAG_PUSH = 0x01
+FLAG_QUERY = 0x02
+FLAG_TIMECODE = 0x10
+DEST_DISPLAY = 1
+
+
+class StreamReceiver:
+    def __init__(self, pool, tree, port=DDP_PORT, timeout=TIMEOUT_S):
+        self._pool = pool
+        self._tree = tree
+        self.port = port
+        self._timeout_ns = int(timeout * 1e9)
+        self._sock = None
+        self._rx = bytearray(HEADER + TIMECODE + 3 * len(tree.string))
+        self._view = memoryview(self._rx)
+        self.active = False
+        self._preempted = False
+        self._last_ns = 0        # when the last packet arrived
+        self._seq = 0            # last accepted sequence number, 0 = none
+        self._lo = None          # byte span written since the last push
+        self._hi = 0
+        self.frames = 0
+        self.packets = 0
+        self.dropped = 0
+        self._fps_frames = 0
+        self._fps_since = time.monotonic_ns()
+        self.fps = 0.0
+
+    def start(self, host="0.0.0.0"):
+        """Bind the UDP port; until then `poll()` does nothing."""
+        try:
+            sock = self._pool.socket(self._pool.AF_INET, self._pool.SOCK_DGRAM)
+            sock.setblocking(False)
+            sock.bind((host, self.port))
+            self._sock = sock
+            print(f"Pixel stream listening on UDP {self.port}")
+        except Exception as e:
+            print(f"Pixel stream unavailable: {e}")
+
+    def preempt(self):
+        """Called by Tree when a local change takes the buffer back."""
+        if self.active:
+            print("Pixel stream preempted")
+        self.active = False
+        self._preempted = True
+        self._lo = None
+
+    def poll(self):
+        """Handle waiting packets. Returns True if any arrived."""
+        if self._sock is None:
+            return False
+        now = time.monotonic_ns()
+        got = False
+        for _ in range(MAX_PACKETS):
+            try:
+                n, _ = self._sock.recvfrom_into(self._rx)
+            except OSError:
+                break
+            got = True
+            quiet = now - self._last_ns > self._timeout_ns
+            self._last_ns = now
+            self._packet(n, quiet)
+        if not got and self.active and now - self._last_ns > self._timeout_ns:
+            print("Pixel stream timed out")
+            self.active = False
+            self._lo = None
+            self._tree.end_stream()
+        if now - self._fps_since >= 1_000_000_000:
+            self.fps = round(self._fps_frames * 1e9 / (now - self._fps_since), 1)
+            self._fps_frames = 0
+            self._fps_since = now
+        return got
+
+    def _packet(self, n, quiet):
+        rx = self._rx
+        flags = rx[0]
+        if n < HEADER or flags & VERSION_MASK != VERSION_1 or flags & FLAG_QUERY or rx[3] not in (0, DEST_DISPLAY):
+            self.dropped += 1
+            return
+        self.packets += 1
+        if self._preempted:
+            if not quiet:
+                return
+            self._preempted = False
+
+        seq = rx[1] & 0x0F
+        if seq:
+            if self._seq and not quiet:
+                ahead = (seq - self._seq) % 15  # 1-15 cycle
+                if ahead == 0 or ahead > 7:
+                    self.dropped += 1
+                    return
+            self._seq = seq
+
+        tree = self._tree
+        if not tree.is_on():
+            return
+        if not self.active:
+            self.active = True
+            self._seq = seq
+            tree.start_stream(self)
+            print("Pixel stream started")
+
+        offset, length = struct.unpack_from(">IH", rx, 4)
+        start = HEADER + TIMECODE if flags & FLAG_TIMECODE else HEADER
+        length = min(length, n - start)
+        buf = tree.string.buf
+        end = min(offset + length, len(buf))
+        if end > offset:
+            buf[offset:end] = self._view[start:start + end - offset]
+            if self._lo is None or offset < self._lo:
+                self._lo = offset
+            if end > self._hi:
+                self._hi = end
+
+        if flags & FLAG_PUSH:
+            string = tree.string
+            if self._lo is not None:
+                string.mark(self._lo // 3, (self._hi + 2) // 3)
+                self._lo = None
+                self._hi = 0
+            string.owner = self
+            string.show()
+            self.frames += 1
+            self._fps_frames += 1
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "fps": self.fps,
+            "frames": self.frames,
+            "packets": self.packets,
+            "dropped": self.dropped,
+        }
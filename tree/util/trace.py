@@ -0,0 +1,113 @@
+"""Trace points recorded into a fixed ring buffer, for finding who ate a frame.
+
+All the tree's work shares one cooperative asyncio loop, so a fade that "stepped"
+only says some task held the loop too long — not which. Wrapping the suspects in
+trace points records when each one ran:
+
+    trace.begin(trace.DRAW)
+    self.animation.animate(show=False)
+    trace.end(trace.DRAW)
+
+Each call appends one 8-byte record — `<BBHI`: point id, phase (begin/end/mark),
+a 16-bit argument, and the time in microseconds (wrapping 32-bit) — into a
+preallocated `bytearray` with `struct.pack_into`, so recording allocates nothing
+beyond the clock read. When tracing is off (the default) each call returns
+immediately. It is switched at runtime (`enable()`, or GET /trace/on and
+/trace/off), and GET /trace downloads the buffer as `dump()` bytes for
+tools/trace_view.py, which renders per-task timelines, duration histograms and the
+worst stalls.
+
+Dump format: header `<4sHHI` (b"MTRC", record count, names length, the time
+now in us), then `names` (b"id:name,..."), then the records oldest first.
+"""
+
+import struct
+import time
+
+CAPACITY = 2048          # records kept (16KB); the oldest are overwritten
+_RECORD = "<BBHI"
+_SIZE = 8
+
+BEGIN = 0
+END = 1
+MARK = 2
+
+# Trace point ids. Add new ones here (and to NAMES) so the dump is self-describing.
+FRAME = 1        # one Tree.animate() iteration (render + show)
+DRAW = 2         # the animation's draw
+SHOW = 3         # frame buffer -> strand
+TRANSITION = 4   # Transition.update()
+HTTP_POLL = 5    # server.poll()
+MQTT_LOOP = 6    # mqtt_client.poll()
+DIALS_POLL = 7   # Controller.poll()
+PUBLISH = 8      # one queued message serialized and sent (drain_messages)
+
+NAMES = {
+    FRAME: "frame",
+    DRAW: "draw",
+    SHOW: "show",
+    TRANSITION: "transition",
+    HTTP_POLL: "http_poll",
+    MQTT_LOOP: "mqtt_loop",
+    DIALS_POLL: "dials_poll",
+    PUBLISH: "publish",
+}
+
+_buf = bytearray(CAPACITY * _SIZE)
+_head = 0        # next record slot
+_count = 0       # records held (<= CAPACITY)
+_enabled = False
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def enabled():
+    return _enabled
+
+
+def clear():
+    global _head, _count
+    _head = 0
+    _count = 0
+
+
+def _record(point, phase, arg):
+    global _head, _count
+    struct.pack_into(_RECORD, _buf, _head * _SIZE, point, phase, arg & 0xFFFF,
+                     (time.monotonic_ns() // 1000) & 0xFFFFFFFF)
+    _head = (_head + 1) % CAPACITY
+    if _count < CAPACITY:
+        _count += 1
+
+
+def begin(point, arg=0):
+    if _enabled:
+        _record(point, BEGIN, arg)
+
+
+def end(point, arg=0):
+    if _enabled:
+        _record(point, END, arg)
+
+
+def mark(point, arg=0):
+    """A single instant (e.g. a message arrived), rather than a span."""
+    if _enabled:
+        _record(point, MARK, arg)
+
+
+def dump():
+    """The buffer as bytes (see the module docstring for the layout)."""
+    names = ",".join(f"{k}:{v}" for k, v in NAMES.items()).encode()
+    now = (time.monotonic_ns() // 1000) & 0xFFFFFFFF
+    out = bytearray(struct.pack("<4sHHI", b"MTRC", _count, len(names), now))
+    out += names
+    if _count < CAPACITY:
+        out += _buf[:_count * _SIZE]
+    else:
+        out += _buf[_head * _SIZE:]  # oldest records, up to the end of the ring
+        out += _buf[:_head * _SIZE]
+    return bytes(out)
@@ -2,7 +2,9 @@
 
 A `Transition` interpolates the physical NeoPixel output from a start state to a
 target state over a fixed duration. The render loop (`Tree.animate`) steps it once
-per frame via `update()`; when `update()` returns True the transition is complete.
+per frame via `update()`, which renders into the frame buffer (the loop shows it
+once, together with any live animation); when `update()` returns True the
+transition is complete.
 
 Two things can be interpolated, independently or together:
 - **Per-pixel color** (`owns_pixels=True`): each pixel eases from a start color to
@@ -20,22 +22,13 @@ Start/target color containers may be a single `(r, g, b)` tuple (uniform, cheap)
 are what `Tree.state()` reports to Home Assistant so HA sees the *target* immediately
 rather than an intermediate frame.
 
-**Dithering.** NeoPixel applies brightness as `output = int(value * brightness)`, so
-at a low brightness (e.g. 0.06) a channel only has ~16 distinct output levels — a
-crossfade of the whole strand shows those as a handful of visible steps regardless
-of frame rate. To hide that, a pixel-owning transition dithers: it decides per pixel
-whether to round each channel's output up or down using a fixed per-pixel threshold,
-so neighbouring LEDs land on different levels and the eye averages them to a finer
-color than any single LED can show. The final frame writes the exact target values so
-the buffer ends holding true colors for the rest of the system to read.
+Output brightness (and dithering, which a pixel-owning transition turns on while
+it runs so slow fades don't band at low brightness) are applied by the output
+stage, util/output.py; the buffer always holds the exact interpolated colors.
 """
 
 import time
 
-# Golden-ratio increment gives a well-spread, low-discrepancy per-pixel dither
-# threshold sequence (no visible banding, unlike a linear ramp).
-_DITHER_STEP = 0.6180339887498949
-
 
 def _ease(p):
     """Smoothstep easing: ease-in/ease-out, gentler than linear at the ends."""
@@ -63,17 +56,6 @@ class Transition:
         self.on_done = on_done
         self.done = False
         self.start_time = time.monotonic()
-        # Reused per-pixel write buffer. NeoPixel.__setitem__ copies the values
-        # out, so mutating and re-assigning one list avoids allocating a fresh
-        # tuple for all 100 pixels every frame (which would churn the GC and show
-        # up as visible stutter in the fade).
-        self._scratch = [0, 0, 0]
-        # Fixed per-pixel dither threshold (0..1). Only built for pixel-owning
-        # transitions, which are the ones that quantize visibly at low brightness.
-        if owns_pixels:
-            self._dither = [(i * _DITHER_STEP) % 1.0 for i in range(len(string))]
-        else:
-            self._dither = None
 
     def set_brightness_target(self, target_brightness):
         """Retarget the brightness ramp mid-flight (e.g. HA sends brightness after
@@ -94,8 +76,8 @@ class Transition:
         return container[i] if is_list else container
 
     def update(self):
-        """Advance to the current wall-clock time and write one frame. Returns True
-        when the transition has reached its target."""
+        """Advance to the current wall-clock time and render one frame (the caller
+        shows it). Returns True when the transition has reached its target."""
         if self.duration > 0:
             p = (time.monotonic() - self.start_time) / self.duration
         else:
@@ -111,13 +93,13 @@ class Transition:
             start, s_list = self.start_pixels, self._start_is_list
             target, t_list = self.target_pixels, self._target_is_list
             delays, spread = self.delays, self.spread
-            scratch = self._scratch
-            dither_tbl = self._dither
-            b = string.brightness
-            # Dither only mid-fade and only when brightness actually quantizes; the
-            # final frame writes exact target values so the buffer holds true colors.
-            do_dither = (not done) and b > 0.0
-            inv_b = (1.0 / b) if b > 0.0 else 0.0
+            # Channel bytes are written straight into the frame buffer: no per-pixel
+            # tuple, no pixelbuf __setitem__ (see util/framebuffer.py).
+            buf = string.buf
+            string.owner = self
+            string.mark_all()
+            # Dither only mid-fade; the final frame goes out exact.
+            string.output.dither = not done
             for i in range(len(string)):
                 if plain:
                     lp = p
@@ -128,47 +110,12 @@ class Transition:
                     elif lp > 1.0:
                         lp = 1.0
                 e = lp * lp * (3.0 - 2.0 * lp)
+                o = 3 * i
                 s = start[i] if s_list else start
                 t = target[i] if t_list else target
-                if done:
-                    scratch[0] = t[0]
-                    scratch[1] = t[1]
-                    scratch[2] = t[2]
-                elif do_dither:
-                    # Round each channel's physical output up or down against a
-                    # per-pixel/per-channel threshold, then store the buffer value
-                    # that lands on that output. Offset the threshold per channel so
-                    # the dither noise stays neutral rather than tinting the color.
-                    th = dither_tbl[i]
-                    v = s[0] + (t[0] - s[0]) * e
-                    d = v * b
-                    lo = int(d)
-                    o = lo + 1 if (d - lo) > th else lo
-                    q = int((o + 0.5) * inv_b)
-                    scratch[0] = 255 if q > 255 else q
-                    th1 = th + 0.333
-                    if th1 > 1.0:
-                        th1 -= 1.0
-                    v = s[1] + (t[1] - s[1]) * e
-                    d = v * b
-                    lo = int(d)
-                    o = lo + 1 if (d - lo) > th1 else lo
-                    q = int((o + 0.5) * inv_b)
-                    scratch[1] = 255 if q > 255 else q
-                    th2 = th + 0.667
-                    if th2 > 1.0:
-                        th2 -= 1.0
-                    v = s[2] + (t[2] - s[2]) * e
-                    d = v * b
-                    lo = int(d)
-                    o = lo + 1 if (d - lo) > th2 else lo
-                    q = int((o + 0.5) * inv_b)
-                    scratch[2] = 255 if q > 255 else q
-                else:
-                    scratch[0] = int(s[0] + (t[0] - s[0]) * e)
-                    scratch[1] = int(s[1] + (t[1] - s[1]) * e)
-                    scratch[2] = int(s[2] + (t[2] - s[2]) * e)
-                string[i] = scratch
+                buf[o] = int(s[0] + (t[0] - s[0]) * e)
+                buf[o + 1] = int(s[1] + (t[1] - s[1]) * e)
+                buf[o + 2] = int(s[2] + (t[2] - s[2]) * e)
 
         if self.start_brightness != self.target_brightness:
             e = _ease(p)
@@ -177,6 +124,5 @@ class Transition:
                 + (self.target_brightness - self.start_brightness) * e
             )
 
-        self.string.show()
         self.done = p >= 1.0
         return self.done
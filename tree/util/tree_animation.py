@@ -1,10 +1,48 @@
 from adafruit_led_animation.animation import Animation
 
 class TreeAnimation(Animation):
-  def __init__(self, pixel_object, coordinates, color, speed, name=None):
+  # Effects that fade colors slowly set this so the output stage dithers their
+  # frames (see util/output.py).
+  dither = False
+
+  def __init__(self, pixel_object, geometry, color, speed, name=None):
     super().__init__(pixel_object, speed, color, name=name)
-    self._coordinates = coordinates
+    self._geometry = geometry  # util.geometry.GeometryIndex, shared with the Tree
     self._bounds = self.bounds()
+    self._reported = False     # draw() reported its own dirty pixels this frame
+
+  def animate(self, show=True):
+    """Draw a frame, then show it only if something changed.
+
+    An effect may report what its draw() touched with `mark_dirty()` or
+    `frame_unchanged()`; one that reports nothing is assumed to have repainted
+    the whole strand.
+    """
+    self._reported = False
+    drew = super().animate(show=False)
+    if drew and not self._reported:
+      self.pixel_object.mark_all()
+    if show:
+      self.pixel_object.show()  # a no-op when nothing is dirty
+    return drew
+
+  def mark_dirty(self, lo=0, hi=None):
+    """Report that this frame changed pixels [lo, hi) (default: all of them)."""
+    self._reported = True
+    self.pixel_object.mark(lo, len(self.pixel_object) if hi is None else hi)
+
+  def frame_unchanged(self):
+    """Report that this frame left every pixel as it was."""
+    self._reported = True
+
+  def owns_frame(self):
+    """Whether the buffer still holds this effect's last frame. Claims it either
+    way; a False return means something else drew over it, so repaint it all."""
+    px = self.pixel_object
+    if px.owner is self:
+      return True
+    px.owner = self
+    return False
 
   @property
   def frozen(self):
@@ -12,14 +50,4 @@ class TreeAnimation(Animation):
     return self._paused
 
   def bounds(self):
-    x, y, z = [
-      [i[0] for i in self._coordinates],
-      [i[1] for i in self._coordinates],
-      [i[2] for i in self._coordinates]
-    ]
-
-    return [
-      [min(x), max(x)],
-      [min(y), max(y)],
-      [min(z), max(z)]
-    ]
\ No newline at end of file
+    return [list(b) for b in self._geometry.bounds]